@@ -0,0 +1,21 @@
+"""
+Reads the configuration file of the REST API.
+"""
+import functools
+import pathlib
+import tomllib
+import typing
+
+CONFIG_PATH = pathlib.Path(__file__).parent / "config.toml"
+
+
+@functools.cache
+def load_config() -> typing.Dict[str, typing.Any]:
+    """Return the parsed configuration file. The file is only read once."""
+    with open(CONFIG_PATH, "rb") as fh:
+        return tomllib.load(fh)
+
+
+def config_section(name: str) -> typing.Dict[str, typing.Any]:
+    """Return a section of the configuration file, or an empty dict if it is not configured."""
+    return load_config().get(name, {})
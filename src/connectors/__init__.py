@@ -2,11 +2,19 @@ import typing  # noqa:F401 (flake8 raises incorrect 'Module imported but unused'
 
 from .abstract.dataset_connector import DatasetConnector  # noqa:F401
 from .abstract.publication_connector import PublicationConnector  # noqa:F401
+from .cache import CachingDatasetConnector, DatasetCache  # noqa:F401
 from .example.example_dataset_connector import ExampleDatasetConnector
 from .example.example_publication_connector import ExamplePublicationConnector
 from .huggingface.huggingface_dataset_connector import HuggingFaceDatasetConnector
 from .node_names import NodeName  # noqa:F401
 from .openml.openml_dataset_connector import OpenMlDatasetConnector
+from .resilience import (  # noqa:F401
+    CircuitBreaker,
+    ResilientDatasetConnector,
+    is_node_failure,
+    resilient_connectors,
+)
+from .single_flight import SingleFlightDatasetConnector  # noqa:F401
 
 dataset_connectors = {
     c.node_name: c
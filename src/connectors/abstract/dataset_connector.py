@@ -1,14 +1,30 @@
 import abc
-from typing import Iterator
+import asyncio
+from typing import Any, AsyncIterator, Iterator, List, Tuple
 
 from pydantic_schemaorg.Dataset import Dataset
 
+from connectors import concurrency
 from connectors.node_names import NodeName
 from database.models import DatasetDescription
+from http_caching import etag
 
 
 class DatasetConnector(abc.ABC):
-    """For every node that offers datasets, this DatasetConnector should be implemented."""
+    """For every node that offers datasets, this DatasetConnector should be implemented.
+
+    Next to the blocking `fetch` and `fetch_all`, the connector offers asynchronous variants
+    (`fetch_async` and `fetch_all_async`). By default, these run the blocking variants in a worker
+    thread. Connectors that talk to a node over HTTP should override them with a natively
+    asynchronous implementation, so that waiting on the node does not occupy a thread.
+
+    `fetch_many_async` retrieves the metadata of many datasets at once. It makes a single call to
+    the bulk API of the node (`fetch_bulk_async`), if the node offers one, and then calls
+    `fetch_with_bulk_async` for each dataset with bounded concurrency. By default, that is just
+    `fetch_async`. Connectors of nodes that offer bulk APIs should override `has_bulk_api`,
+    `fetch_bulk_async` and `fetch_with_bulk_async`, so that wrappers (such as the rate limiting
+    in resilience.py) see every call to the node.
+    """
 
     @property
     def node_name(self) -> NodeName:
@@ -24,3 +40,44 @@ class DatasetConnector(abc.ABC):
     def fetch_all(self, limit: int | None) -> Iterator[DatasetDescription]:
         """Retrieve basic information of all datasets"""
         pass
+
+    async def fetch_async(self, dataset: DatasetDescription) -> Dataset:
+        """Retrieve extra metadata for this dataset, without blocking the event loop"""
+        return await asyncio.to_thread(self.fetch, dataset)
+
+    async def fetch_with_etag_async(self, dataset: DatasetDescription) -> Tuple[Dataset, str]:
+        """Retrieve extra metadata for this dataset, with the ETag of its JSON. Connectors that
+        cache the metadata return the ETag that they stored with it."""
+        dataset_meta = await self.fetch_async(dataset)
+        return dataset_meta, etag(dataset_meta.json())
+
+    @property
+    def has_bulk_api(self) -> bool:
+        """Whether `fetch_bulk_async` calls the node"""
+        return False
+
+    async def fetch_bulk_async(self, datasets: List[DatasetDescription]) -> Any:
+        """Retrieve, in a single call to the node, the metadata that it offers in bulk for these
+        datasets. The result is passed to `fetch_with_bulk_async`."""
+        return None
+
+    async def fetch_with_bulk_async(self, dataset: DatasetDescription, bulk: Any) -> Dataset:
+        """Retrieve extra metadata for this dataset, given the result of `fetch_bulk_async`"""
+        return await self.fetch_async(dataset)
+
+    async def fetch_many_async(
+        self, datasets: List[DatasetDescription], max_concurrency: int = 10
+    ) -> List[Dataset | BaseException]:
+        """Retrieve extra metadata for all these datasets, in the same order. If retrieving the
+        metadata of a dataset fails, its exception is returned in place of its metadata."""
+        bulk = await self.fetch_bulk_async(datasets) if self.has_bulk_api else None
+        return await concurrency.map_async(
+            lambda dataset: self.fetch_with_bulk_async(dataset, bulk), datasets, max_concurrency
+        )
+
+    async def fetch_all_async(self, limit: int | None) -> AsyncIterator[DatasetDescription]:
+        """Retrieve basic information of all datasets, without blocking the event loop"""
+        iterator = self.fetch_all(limit)
+        sentinel = object()
+        while (item := await asyncio.to_thread(next, iterator, sentinel)) is not sentinel:
+            yield item  # type: ignore
@@ -0,0 +1,49 @@
+from typing import Any, AsyncIterator, Iterator, List
+
+from pydantic_schemaorg.Dataset import Dataset
+
+from connectors.abstract.dataset_connector import DatasetConnector
+from connectors.node_names import NodeName
+from database.models import DatasetDescription
+
+
+class DatasetConnectorWrapper(DatasetConnector):
+    """
+    Adds behaviour (such as caching) around another DatasetConnector. By default, every call is
+    delegated to the wrapped connector, subclasses override the calls they are interested in.
+    Only `fetch_with_etag_async` is not delegated, but calls the `fetch_async` of the wrapper.
+    """
+
+    def __init__(self, connector: DatasetConnector):
+        self.connector = connector
+
+    @property
+    def node_name(self) -> NodeName:
+        return self.connector.node_name
+
+    def fetch(self, dataset: DatasetDescription) -> Dataset:
+        return self.connector.fetch(dataset)
+
+    def fetch_all(self, limit: int | None) -> Iterator[DatasetDescription]:
+        return self.connector.fetch_all(limit)
+
+    async def fetch_async(self, dataset: DatasetDescription) -> Dataset:
+        return await self.connector.fetch_async(dataset)
+
+    @property
+    def has_bulk_api(self) -> bool:
+        return self.connector.has_bulk_api
+
+    async def fetch_bulk_async(self, datasets: List[DatasetDescription]) -> Any:
+        return await self.connector.fetch_bulk_async(datasets)
+
+    async def fetch_with_bulk_async(self, dataset: DatasetDescription, bulk: Any) -> Dataset:
+        return await self.connector.fetch_with_bulk_async(dataset, bulk)
+
+    async def fetch_many_async(
+        self, datasets: List[DatasetDescription], max_concurrency: int = 10
+    ) -> List[Dataset | BaseException]:
+        return await self.connector.fetch_many_async(datasets, max_concurrency)
+
+    def fetch_all_async(self, limit: int | None) -> AsyncIterator[DatasetDescription]:
+        return self.connector.fetch_all_async(limit)
@@ -0,0 +1,449 @@
+"""
+A read-through cache in front of DatasetConnector.fetch.
+
+Fetching the metadata of a dataset means one or more calls to the node (OpenML, HuggingFace,
+...), which dominates the latency of the detail endpoints. Most traffic goes to a small set of
+datasets, so we keep the fetched metadata around, keyed by (node, node_specific_identifier).
+
+The cache consists of two tiers:
+ * an in-process LRU tier, bounded in size and with a time-to-live per entry;
+ * an optional on-disk tier (a SQLite file), which is shared by all uvicorn workers on a host.
+   Its entries are stored as JSON, so that whoever can write the file cannot make the workers
+   execute code. The directory is created accessible by its owner only.
+
+Nodes are asked over and over for datasets that they do not have (anymore), e.g., by crawlers
+following stale links. Such 404s are cached as well, with a shorter time-to-live of their own, so
+that repeated lookups of known-missing datasets do not call the node.
+
+While a node is degraded (it fails, or its circuit breaker is open, see resilience.py), the last
+metadata fetched from it is served even if its time-to-live is over: entries are kept for an
+additional stale_ttl for this purpose. They are refreshed as soon as the node recovers.
+
+Note that invalidating an entry only removes it from the in-process tier of the worker that
+handles the invalidation (and from the shared on-disk tier). The other workers keep serving
+their copy until its time-to-live is over.
+
+The on-disk tier means SQLite queries and (de)serialization, so the asynchronous methods of the
+CachingDatasetConnector use it from a worker thread, to not block the event loop.
+"""
+import asyncio
+import collections
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import typing
+
+from fastapi import HTTPException
+from pydantic_schemaorg.Dataset import Dataset
+
+import metrics
+from connectors.abstract.dataset_connector import DatasetConnector
+from connectors.abstract.dataset_connector_wrapper import DatasetConnectorWrapper
+from connectors.resilience import is_node_failure
+from database.models import DatasetDescription
+from http_caching import etag
+
+T = typing.TypeVar("T")
+CacheKey = typing.Tuple[str, str]  # (node, node_specific_identifier)
+Entry = typing.Tuple[typing.Any, float]  # (value, expires_at)
+
+
+class MemoryCacheTier:
+    """Thread-safe LRU cache, in which each entry expires at a given (epoch) time."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()  # type: collections.OrderedDict[CacheKey, Entry]
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey, now: float) -> Entry | None:
+        """Return the (value, expires_at) of this key, or None if it is absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: CacheKey, value: typing.Any, expires_at: float):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: CacheKey):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCacheTier:
+    """
+    Cache stored in a SQLite file, so that it can be shared between processes. Values are stored
+    as the text returned by `encode`, and read back using `decode`. Each thread uses its own
+    SQLite connection.
+
+    The directory is created accessible by its owner only, and the file readable and writable
+    by its owner only. A directory that any user can write to is refused.
+    """
+
+    PURGE_EVERY_N_PUTS = 100
+
+    def __init__(
+        self,
+        path: pathlib.Path | str,
+        encode: typing.Callable[[typing.Any], str] = json.dumps,
+        decode: typing.Callable[[str], typing.Any] = json.loads,
+    ):
+        self.path = pathlib.Path(path)
+        self.encode = encode
+        self.decode = decode
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if self.path.parent.stat().st_mode & 0o002:
+            raise ValueError(
+                f"The cache directory {self.path.parent} is writable by all users. Please "
+                f"configure a directory that only the server can write to."
+            )
+        os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+        self._local = threading.local()
+        self._n_puts = 0
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "node TEXT NOT NULL, identifier TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, PRIMARY KEY (node, identifier))"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: CacheKey, now: float) -> Entry | None:
+        """Return the (value, expires_at) of this key, or None if it is absent or expired."""
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value, expires_at FROM entries "
+                "WHERE node = ? AND identifier = ? AND expires_at > ?",
+                (*key, now),
+            )
+            .fetchone()
+        )
+        if row is None or not isinstance(row[0], str):
+            return None  # E.g., an entry written by an older version, which used pickle
+        try:
+            return self.decode(row[0]), row[1]
+        except (ValueError, KeyError):
+            return None
+
+    def put(self, key: CacheKey, value: typing.Any, expires_at: float):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (node, identifier, value, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (*key, self.encode(value), expires_at),
+            )
+            self._n_puts += 1
+            if self._n_puts % self.PURGE_EVERY_N_PUTS == 0:
+                connection.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+
+    def invalidate(self, key: CacheKey):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM entries WHERE node = ? AND identifier = ?", key)
+
+
+class DatasetCache:
+    """
+    Tiered cache for the results of DatasetConnector.fetch, keyed by (node,
+    node_specific_identifier).
+
+    Params
+    ------
+    max_size, int: maximum number of entries in the in-process tier.
+    ttl, float: time-to-live of an entry in seconds, for nodes without a specific ttl.
+    ttl_per_node, dict: time-to-live in seconds for specific nodes.
+    negative_ttl, float: time-to-live in seconds of the "not found" results of a node.
+    stale_ttl, float: seconds after its time-to-live during which an entry may still be served
+      while the node is degraded (see get_stale).
+    directory, optional: directory of the on-disk tier. If None, only the in-process tier is used.
+    clock: function returning the current (epoch) time. Can be replaced for testing.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 3600,
+        ttl_per_node: typing.Dict[str, float] | None = None,
+        negative_ttl: float = 300,
+        stale_ttl: float = 86400,
+        directory: pathlib.Path | str | None = None,
+        clock: typing.Callable[[], float] = time.time,
+    ):
+        self.default_ttl = ttl
+        self.ttl_per_node = ttl_per_node or {}
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self.memory = MemoryCacheTier(max_size)
+        self.disk = None  # type: DiskCacheTier | None
+        if directory is not None:
+            self.disk = DiskCacheTier(
+                pathlib.Path(directory) / "cache.db", encode=_encode_entry, decode=_decode_entry
+            )
+
+    @classmethod
+    def from_config(cls, config: typing.Dict[str, typing.Any]) -> "DatasetCache":
+        """Create the cache from the [cache] section of the configuration file."""
+        return cls(
+            max_size=config.get("max_size", 1024),
+            ttl=config.get("ttl", 3600),
+            ttl_per_node=config.get("ttl_per_node", {}),
+            negative_ttl=config.get("negative_ttl", 300),
+            stale_ttl=config.get("stale_ttl", 86400),
+            directory=config.get("directory", None),
+        )
+
+    def ttl(self, node: str) -> float:
+        return self.ttl_per_node.get(node, self.default_ttl)
+
+    def _lookup(self, key: CacheKey) -> typing.Tuple[typing.Any, float] | None:
+        """The (value, fresh_until) of this key, if the entry is not expired in the tiers."""
+        now = self.clock()
+        entry = self.memory.get(key, now)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key, now)
+            if entry is not None:
+                self.memory.put(key, *entry)
+        return None if entry is None else entry[0]
+
+    def get(self, node: str, identifier: str) -> typing.Any | None:
+        """Return the cached value, or None if there is no valid entry."""
+        found = self._lookup((node, identifier))
+        if found is None or found[1] <= self.clock():
+            return None
+        return found[0]
+
+    def get_stale(self, node: str, identifier: str) -> typing.Any | None:
+        """Return the cached value, even if its time-to-live is over (but not its stale_ttl)."""
+        found = self._lookup((node, identifier))
+        return None if found is None else found[0]
+
+    def put(
+        self,
+        node: str,
+        identifier: str,
+        value: typing.Any,
+        ttl: float | None = None,
+        stale_ttl: float | None = None,
+    ):
+        """Store the value, for the given time-to-live or else the time-to-live of the node. The
+        tiers keep the entry for another stale_ttl (see get_stale)."""
+        key = (node, identifier)
+        fresh_until = self.clock() + (self.ttl(node) if ttl is None else ttl)
+        expires_at = fresh_until + (self.stale_ttl if stale_ttl is None else stale_ttl)
+        self.memory.put(key, (value, fresh_until), expires_at)
+        if self.disk is not None:
+            self.disk.put(key, (value, fresh_until), expires_at)
+
+    def invalidate(self, node: str, identifier: str):
+        key = (node, identifier)
+        self.memory.invalidate(key)
+        if self.disk is not None:
+            self.disk.invalidate(key)
+
+
+class CachedDataset(typing.NamedTuple):
+    """The metadata of a dataset, with the ETag of its serialization."""
+
+    dataset: Dataset
+    etag: str
+
+
+class CachedNotFound(typing.NamedTuple):
+    """A dataset that the node does not have, with the detail of its 404."""
+
+    detail: str
+
+
+def _encode_entry(entry: typing.Tuple[typing.Any, float]) -> str:
+    """The (value, fresh_until) of the DatasetCache as JSON. Values other than CachedDataset and
+    CachedNotFound should be JSON serializable."""
+    value, fresh_until = entry
+    if isinstance(value, CachedDataset):
+        encoded = {"dataset": value.dataset.json(), "etag": value.etag}
+    elif isinstance(value, CachedNotFound):
+        encoded = {"not_found": value.detail}
+    else:
+        encoded = {"value": value}
+    return json.dumps({**encoded, "fresh_until": fresh_until})
+
+
+def _decode_entry(text: str) -> typing.Tuple[typing.Any, float]:
+    """The (value, fresh_until) encoded by _encode_entry"""
+    encoded = json.loads(text)
+    value = None  # type: typing.Any
+    if "dataset" in encoded:
+        value = CachedDataset(Dataset.parse_raw(encoded["dataset"]), encoded["etag"])
+    elif "not_found" in encoded:
+        value = CachedNotFound(encoded["not_found"])
+    else:
+        value = encoded["value"]
+    return value, encoded["fresh_until"]
+
+
+class CachingDatasetConnector(DatasetConnectorWrapper):
+    """Serves DatasetConnector.fetch from the DatasetCache, fetching and storing on a miss. A 404
+    of the node is stored as well, and raised again on a hit. If fetching fails because the node
+    is degraded, the stale metadata is served instead, if any."""
+
+    def __init__(self, connector: DatasetConnector, cache: DatasetCache):
+        super().__init__(connector)
+        self.cache = cache
+
+    def _get(self, dataset: DatasetDescription) -> CachedDataset | None:
+        """The cached metadata, or None on a miss. Raises the 404 of a cached "not found"."""
+        node = self.node_name.value
+        cached = self.cache.get(node, dataset.node_specific_identifier)
+        if isinstance(cached, CachedNotFound):
+            metrics.dataset_cache_lookups.labels(node, "not_found").inc()
+            raise HTTPException(status_code=404, detail=cached.detail)
+        if isinstance(cached, CachedDataset):
+            metrics.dataset_cache_lookups.labels(node, "hit").inc()
+            return cached
+        metrics.dataset_cache_lookups.labels(node, "miss").inc()
+        return None
+
+    def _put(
+        self, dataset: DatasetDescription, result: Dataset | BaseException
+    ) -> CachedDataset | None:
+        """Store the metadata, or the error if it is a 404. Other errors are not stored. Returns
+        the stored metadata, with its ETag."""
+        identifier = dataset.node_specific_identifier
+        if isinstance(result, HTTPException) and result.status_code == 404:
+            not_found = CachedNotFound(result.detail)
+            self.cache.put(
+                self.node_name.value,
+                identifier,
+                not_found,
+                ttl=self.cache.negative_ttl,
+                stale_ttl=0,
+            )
+        elif not isinstance(result, BaseException):
+            cached = CachedDataset(result, etag(result.json()))
+            self.cache.put(self.node_name.value, identifier, cached)
+            return cached
+        return None
+
+    def _stale(self, dataset: DatasetDescription, error: BaseException) -> CachedDataset | None:
+        """The stale metadata if the error means that the node is degraded."""
+        if is_node_failure(error):
+            stale = self.cache.get_stale(self.node_name.value, dataset.node_specific_identifier)
+            if isinstance(stale, CachedDataset):
+                metrics.dataset_cache_stale.labels(self.node_name.value).inc()
+                return stale
+        return None
+
+    def _put_or_stale(
+        self, dataset: DatasetDescription, result: Dataset | BaseException
+    ) -> CachedDataset | BaseException:
+        """Store the result, and return it, or else the stale metadata if the node is degraded,
+        or else the error."""
+        stored = self._put(dataset, result)
+        if stored is not None:
+            return stored
+        error = typing.cast(BaseException, result)
+        stale = self._stale(dataset, error)
+        return error if stale is None else stale
+
+    def fetch(self, dataset: DatasetDescription) -> Dataset:
+        cached = self._get(dataset)
+        if cached is not None:
+            return cached.dataset
+        try:
+            result = self.connector.fetch(dataset)
+        except Exception as e:
+            fetched = self._put_or_stale(dataset, e)
+            if fetched is e:
+                raise
+            return typing.cast(CachedDataset, fetched).dataset
+        self._put(dataset, result)
+        return result
+
+    async def _off_the_loop(self, function: typing.Callable[..., T], *args) -> T:
+        """Call the function, in a worker thread if it may use the on-disk tier."""
+        if self.cache.disk is None:
+            return function(*args)
+        return await asyncio.to_thread(function, *args)
+
+    async def fetch_async(self, dataset: DatasetDescription) -> Dataset:
+        return (await self.fetch_with_etag_async(dataset)).dataset
+
+    async def fetch_with_etag_async(self, dataset: DatasetDescription) -> CachedDataset:
+        """The cached metadata with its cached ETag, so that a conditional GET can be answered
+        without fetching or serializing the metadata."""
+        cached = await self._off_the_loop(self._get, dataset)
+        if cached is not None:
+            return cached
+        try:
+            result = await self.connector.fetch_async(dataset)  # type: Dataset | BaseException
+        except Exception as e:
+            result = e
+        fetched = await self._off_the_loop(self._put_or_stale, dataset, result)
+        if isinstance(fetched, BaseException):
+            raise fetched
+        return fetched
+
+    async def fetch_many_async(
+        self, datasets: typing.List[DatasetDescription], max_concurrency: int = 10
+    ) -> typing.List[Dataset | BaseException]:
+        """Serve the cached datasets, and fetch only the others in bulk."""
+        results = await self._off_the_loop(self._get_many, datasets)
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            fetched = await self.connector.fetch_many_async(
+                [datasets[i] for i in misses], max_concurrency
+            )
+            stored = await self._off_the_loop(
+                self._put_many, [datasets[i] for i in misses], fetched
+            )
+            for i, result in zip(misses, stored):
+                results[i] = result
+        return typing.cast(typing.List[Dataset | BaseException], results)
+
+    def _get_many(
+        self, datasets: typing.List[DatasetDescription]
+    ) -> typing.List[Dataset | BaseException | None]:
+        """The cached metadata, or cached 404, of each dataset, or None on a miss."""
+        results = []  # type: typing.List[Dataset | BaseException | None]
+        for dataset in datasets:
+            try:
+                cached = self._get(dataset)
+            except HTTPException as e:
+                results.append(e)
+            else:
+                results.append(None if cached is None else cached.dataset)
+        return results
+
+    def _put_many(
+        self,
+        datasets: typing.List[DatasetDescription],
+        results: typing.List[Dataset | BaseException],
+    ) -> typing.List[Dataset | BaseException]:
+        fetched = [self._put_or_stale(d, result) for d, result in zip(datasets, results)]
+        return [f.dataset if isinstance(f, CachedDataset) else f for f in fetched]
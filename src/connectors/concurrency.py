@@ -0,0 +1,76 @@
+"""
+Helpers to make independent upstream calls concurrently, both from blocking code (using a
+thread pool) and from asynchronous code.
+
+Errors are handled as if the calls were made one after the other: if one or more calls fail,
+the exception of the first failing call (in argument order) is raised. This way, a connector
+reports the same error regardless of which upstream call happened to finish first.
+"""
+import asyncio
+import collections
+import typing
+from concurrent.futures import Future, ThreadPoolExecutor
+
+T = typing.TypeVar("T")
+R = typing.TypeVar("R")
+
+_executor = ThreadPoolExecutor(thread_name_prefix="connector-request")
+
+
+def gather(*calls: typing.Callable[[], T]) -> typing.List[T]:
+    """Run the blocking calls concurrently, and return their results in argument order."""
+    futures = [_executor.submit(call) for call in calls]
+    exceptions = [future.exception() for future in futures]
+    for exception in exceptions:
+        if exception is not None:
+            raise exception
+    return [future.result() for future in futures]
+
+
+async def gather_async(*awaitables: typing.Awaitable[T]) -> typing.List[T]:
+    """Await the awaitables concurrently, and return their results in argument order."""
+    results = await asyncio.gather(*awaitables, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return typing.cast(typing.List[T], results)
+
+
+async def map_async(
+    function: typing.Callable[[T], typing.Awaitable[R]],
+    items: typing.Iterable[T],
+    max_concurrency: int,
+) -> typing.List[R | BaseException]:
+    """
+    Apply the asynchronous function to all items, with at most `max_concurrency` calls running at
+    the same time. The results are returned in the order of the items. Contrary to the other
+    helpers, a failing call does not raise: its exception is returned in place of its result.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def call(item: T) -> R:
+        async with semaphore:
+            return await function(item)
+
+    return await asyncio.gather(*(call(item) for item in items), return_exceptions=True)
+
+
+def map_ordered(
+    function: typing.Callable[[T], R], items: typing.Iterable[T], max_concurrency: int
+) -> typing.Iterator[R]:
+    """
+    Apply the function to all items, with at most `max_concurrency` calls running at the same
+    time. The results are yielded in the order of the items. The items are consumed lazily: only
+    a window of 2 * max_concurrency calls is submitted ahead of the results that are yielded.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="connector-map")
+    futures: typing.Deque[Future[R]] = collections.deque()
+    try:
+        for item in items:
+            futures.append(executor.submit(function, item))
+            if len(futures) >= 2 * max_concurrency:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,150 @@
+"""
+The HTTP client that the connectors use to talk to the nodes.
+
+All connectors share a single requests.Session, so that connections are kept alive and reused
+across requests, instead of paying a TCP and TLS handshake for every upstream call. The Session
+keeps a connection pool per host, and idempotent GET requests are retried with exponential
+backoff. The settings are read from the [http] section of the configuration file.
+
+The asynchronous connector methods use an httpx.AsyncClient instead, with the same retry
+behaviour. Because the connections of an AsyncClient are bound to an event loop, there is one
+AsyncClient per event loop (in production: one per worker).
+
+The latency, status codes and errors of all requests are observed (see metrics.py).
+"""
+import asyncio
+import threading
+import time
+import typing
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+from config import config_section
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None  # type: requests.Session | None
+_session_lock = threading.Lock()
+_async_clients = (
+    weakref.WeakKeyDictionary()
+)  # type: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]
+
+
+def create_session(config: typing.Dict[str, typing.Any]) -> requests.Session:
+    """Create a Session with pooled, retrying connections, configured by the [http] section."""
+    retry = Retry(
+        total=config.get("max_retries", 3),
+        backoff_factor=config.get("backoff_factor", 0.5),
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,  # Return the last response, so that connectors can report it
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.get("pool_connections", 10),
+        pool_maxsize=config.get("pool_maxsize", 20),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def session() -> requests.Session:
+    """Return the Session shared by all connectors, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session(config_section("http"))
+    return _session
+
+
+def timeout() -> typing.Tuple[float, float]:
+    """The (connect, read) timeout of requests to the nodes, in seconds."""
+    config = config_section("http")
+    return config.get("connect_timeout", 5), config.get("read_timeout", 30)
+
+
+def get(url: str, params: typing.Dict[str, typing.Any] | None = None) -> requests.Response:
+    """Perform a GET request using the shared Session."""
+    start = time.perf_counter()
+    try:
+        response = session().get(url, params=params, timeout=timeout())
+    except Exception as e:
+        _observe(url, start, error=e)
+        raise
+    _observe(url, start, status_code=response.status_code)
+    return response
+
+
+def _observe(
+    url: str, start: float, status_code: int | None = None, error: Exception | None = None
+):
+    node, endpoint = metrics.upstream_labels(url)
+    metrics.upstream_request_duration.labels(node, endpoint).observe(time.perf_counter() - start)
+    if error is not None:
+        metrics.upstream_errors.labels(node, endpoint, type(error).__name__).inc()
+    else:
+        metrics.upstream_responses.labels(node, endpoint, str(status_code)).inc()
+
+
+def create_async_client(config: typing.Dict[str, typing.Any]) -> httpx.AsyncClient:
+    """Create an AsyncClient with pooled connections, configured by the [http] section."""
+    limits = httpx.Limits(
+        max_connections=config.get("async_max_connections", 1000),
+        max_keepalive_connections=config.get("async_max_keepalive_connections", 100),
+    )
+    transport = httpx.AsyncHTTPTransport(
+        limits=limits,
+        retries=config.get("max_retries", 3),  # Only retries failed connection attempts
+    )
+    connect_timeout, read_timeout = timeout()
+    return httpx.AsyncClient(
+        transport=transport, timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+    )
+
+
+def async_client() -> httpx.AsyncClient:
+    """Return the AsyncClient of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop, None)
+    if client is None:
+        client = create_async_client(config_section("http"))
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Close the AsyncClient of the running event loop, if there is one."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def get_async(url: str, params: typing.Dict[str, typing.Any] | None = None) -> httpx.Response:
+    """
+    Perform a GET request using the AsyncClient of the running event loop. Just as with the
+    blocking Session, responses with a RETRY_STATUS_CODE are retried with exponential backoff.
+    """
+    config = config_section("http")
+    max_retries = config.get("max_retries", 3)
+    backoff_factor = config.get("backoff_factor", 0.5)
+    start = time.perf_counter()
+    try:
+        response = await async_client().get(url, params=params)
+        for attempt in range(max_retries):
+            if response.status_code not in RETRY_STATUS_CODES:
+                break
+            await asyncio.sleep(backoff_factor * 2**attempt)
+            response = await async_client().get(url, params=params)
+    except Exception as e:
+        _observe(url, start, error=e)
+        raise
+    _observe(url, start, status_code=response.status_code)
+    return response
@@ -1,5 +1,6 @@
 import typing
 
+import httpx
 import requests
 from fastapi import HTTPException
 from pydantic import Extra
@@ -8,12 +9,19 @@ from pydantic_schemaorg.DataDownload import DataDownload
 from pydantic_schemaorg.Dataset import Dataset
 from pydantic_schemaorg.QuantitativeValue import QuantitativeValue
 
-from connectors import DatasetConnector
+import metrics
+from config import config_section
+from connectors import DatasetConnector, concurrency, http_session
+from connectors.node_names import NodeName
+from connectors.rate_limiter import RateLimiter
 from database.models import DatasetDescription
 
 for obj in (DataCatalog, DataDownload, Dataset, QuantitativeValue):
     obj.Config.extra = Extra.forbid  # Throw exception on unrecognized fields
 
+HUGGINGFACE_URL = "https://datasets-server.huggingface.co"
+metrics.register_node_url(NodeName.huggingface.value, HUGGINGFACE_URL)
+
 
 class HuggingFaceDatasetConnector(DatasetConnector):
     ID_DELIMITER = "|"  # The node_specific_identifier for HuggingFace consists of 3 or 4
@@ -28,9 +36,25 @@ class HuggingFaceDatasetConnector(DatasetConnector):
         """
         Perform a GET request and raise an exception if the response code is not OK.
         """
-        response = requests.get(url, params=params)
+        response = http_session.get(url, params=params)
+        return HuggingFaceDatasetConnector._response_json(response, error_msg)
+
+    @staticmethod
+    async def _get_async(
+        url: str, error_msg: str, params: typing.Dict[str, typing.Any] | None = None
+    ) -> typing.Dict[str, typing.Any]:
+        """
+        Perform an asynchronous GET request and raise an exception if the response code is not OK.
+        """
+        response = await http_session.get_async(url, params=params)
+        return HuggingFaceDatasetConnector._response_json(response, error_msg)
+
+    @staticmethod
+    def _response_json(
+        response: requests.Response | httpx.Response, error_msg: str
+    ) -> typing.Dict[str, typing.Any]:
         response_json = response.json()
-        if not response.ok:
+        if response.status_code >= 400:
             msg = response_json["error"]
             raise HTTPException(
                 status_code=response.status_code,
@@ -39,6 +63,50 @@ class HuggingFaceDatasetConnector(DatasetConnector):
         return response_json
 
     def fetch(self, dataset: DatasetDescription) -> Dataset:
+        dataset_name, config, split = HuggingFaceDatasetConnector._parse_identifier(dataset)
+        # The split information and the parquet file information are independent, so they are
+        # fetched concurrently.
+        split_info, file_info = concurrency.gather(
+            lambda: HuggingFaceDatasetConnector._fetch_item(
+                url=f"{HUGGINGFACE_URL}/splits",
+                items_name="splits",
+                dataset_name=dataset_name,
+                config=config,
+                split=split,
+            ),
+            lambda: HuggingFaceDatasetConnector._fetch_item(
+                url=f"{HUGGINGFACE_URL}/parquet",
+                items_name="parquet_files",
+                dataset_name=dataset_name,
+                config=config,
+                split=split,
+            ),
+        )
+        return HuggingFaceDatasetConnector._as_schema_org(dataset, split_info, file_info)
+
+    async def fetch_async(self, dataset: DatasetDescription) -> Dataset:
+        dataset_name, config, split = HuggingFaceDatasetConnector._parse_identifier(dataset)
+        split_info, file_info = await concurrency.gather_async(
+            HuggingFaceDatasetConnector._fetch_item_async(
+                url=f"{HUGGINGFACE_URL}/splits",
+                items_name="splits",
+                dataset_name=dataset_name,
+                config=config,
+                split=split,
+            ),
+            HuggingFaceDatasetConnector._fetch_item_async(
+                url=f"{HUGGINGFACE_URL}/parquet",
+                items_name="parquet_files",
+                dataset_name=dataset_name,
+                config=config,
+                split=split,
+            ),
+        )
+        return HuggingFaceDatasetConnector._as_schema_org(dataset, split_info, file_info)
+
+    @staticmethod
+    def _parse_identifier(dataset: DatasetDescription) -> typing.Tuple[str, str, str]:
+        """Split the node_specific_identifier into the dataset name, config and split"""
         id_splitted = dataset.node_specific_identifier.split("|")
         if len(id_splitted) not in (3, 4):
             msg = (
@@ -52,22 +120,14 @@ class HuggingFaceDatasetConnector(DatasetConnector):
         dataset_name = "/".join(id_splitted[:-2])
         config = id_splitted[-2]
         split = id_splitted[-1]
+        return dataset_name, config, split
 
-        split_info = HuggingFaceDatasetConnector._fetch_item(
-            url="https://datasets-server.huggingface.co/splits",
-            items_name="splits",
-            dataset_name=dataset_name,
-            config=config,
-            split=split,
-        )
-        file_info = HuggingFaceDatasetConnector._fetch_item(
-            url="https://datasets-server.huggingface.co/parquet",
-            items_name="parquet_files",
-            dataset_name=dataset_name,
-            config=config,
-            split=split,
-        )
-
+    @staticmethod
+    def _as_schema_org(
+        dataset: DatasetDescription,
+        split_info: typing.Dict[str, typing.Any],
+        file_info: typing.Dict[str, typing.Any],
+    ) -> Dataset:
         # TODO: decide our output format for datasets.
         #  If we want extra information, e.g. the number of features, this works:
         # url = "https://datasets-server.huggingface.co/first-rows"
@@ -91,6 +151,31 @@ class HuggingFaceDatasetConnector(DatasetConnector):
         params = {"dataset": dataset_name}
         error_msg = f"Error while fetching {items_name} from HuggingFace"
         response_json = HuggingFaceDatasetConnector._get(url, error_msg, params=params)
+        return HuggingFaceDatasetConnector._select_item(
+            response_json, items_name, dataset_name, config, split
+        )
+
+    @staticmethod
+    async def _fetch_item_async(
+        url: str, items_name: str, dataset_name: str, config: str, split: str
+    ):
+        """Asynchronously fetching a single item (split information, or parquet file information)"""
+        params = {"dataset": dataset_name}
+        error_msg = f"Error while fetching {items_name} from HuggingFace"
+        response_json = await HuggingFaceDatasetConnector._get_async(url, error_msg, params=params)
+        return HuggingFaceDatasetConnector._select_item(
+            response_json, items_name, dataset_name, config, split
+        )
+
+    @staticmethod
+    def _select_item(
+        response_json: typing.Dict[str, typing.Any],
+        items_name: str,
+        dataset_name: str,
+        config: str,
+        split: str,
+    ):
+        """Select the item of this config and split from the items in the response"""
         items = [
             file
             for file in response_json[items_name]
@@ -105,13 +190,30 @@ class HuggingFaceDatasetConnector(DatasetConnector):
         return items[0]
 
     def fetch_all(self, limit: int | None) -> typing.Iterator[DatasetDescription]:
-        if limit is None or limit > 10:
-            limit = 25  # it's slow...
-        url = "https://datasets-server.huggingface.co/valid"
+        """
+        Yield the datasets of the first `limit` dataset names (or all, if limit is None). For each
+        name, the splits are fetched separately. These calls are made concurrently and rate
+        limited, as configured in the [huggingface] section of the configuration file.
+        """
+        url = f"{HUGGINGFACE_URL}/valid"
         error_msg = "Error while fetching all data from HuggingFace"
         response_json = HuggingFaceDatasetConnector._get(url, error_msg)
-        for dataset_name in response_json["valid"][:limit]:
-            yield from self._yield_datasets_with_name(dataset_name)
+        config = config_section("huggingface")
+        rate_limiter = RateLimiter(
+            rate=config.get("harvest_requests_per_second", 10),
+            burst=config.get("harvest_concurrency", 8),
+        )
+
+        def datasets_with_name(dataset_name: str) -> typing.List[DatasetDescription]:
+            rate_limiter.acquire()
+            return list(self._yield_datasets_with_name(dataset_name))
+
+        for datasets in concurrency.map_ordered(
+            datasets_with_name,
+            response_json["valid"][:limit],
+            max_concurrency=config.get("harvest_concurrency", 8),
+        ):
+            yield from datasets
 
     def _yield_datasets_with_name(self, dataset_name: str) -> typing.Iterator[DatasetDescription]:
         """Yield a DataSet for each (config, split) combination with this name."""
@@ -120,7 +222,7 @@ class HuggingFaceDatasetConnector(DatasetConnector):
                 f"The huggingface name '{dataset_name}' contains a '{self.ID_DELIMITER}', which we "
                 f"use as delimiter."
             )
-        url = "https://datasets-server.huggingface.co/splits"
+        url = f"{HUGGINGFACE_URL}/splits"
         params = {"dataset": dataset_name}
         error_msg = "Error while fetching splits from HuggingFace"
         try:
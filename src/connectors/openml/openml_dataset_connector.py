@@ -2,8 +2,10 @@
 This module knows how to load an OpenML object based on its AIoD implementation,
 and how to convert the OpenML response to some agreed AIoD format.
 """
-from typing import Iterator
+import typing
+from typing import AsyncIterator, Iterator
 
+import httpx
 import requests
 from fastapi import HTTPException
 from pydantic import Extra
@@ -12,73 +14,82 @@ from pydantic_schemaorg.DataDownload import DataDownload
 from pydantic_schemaorg.Dataset import Dataset
 from pydantic_schemaorg.QuantitativeValue import QuantitativeValue
 
+import metrics
+from connectors import concurrency, http_session
 from connectors.abstract.dataset_connector import DatasetConnector
+from connectors.node_names import NodeName
 from database.models import DatasetDescription
 
 for obj in (DataCatalog, DataDownload, Dataset, QuantitativeValue):
     obj.Config.extra = Extra.forbid  # Throw exception on unrecognized fields
 
+OPENML_URL = "https://www.openml.org/api/v1/json"
+metrics.register_node_url(NodeName.openml.value, OPENML_URL)
+DATA_LIST_MAX_IDENTIFIERS = 100  # The number of data_ids per call to the data list, limiting the
+# length of the url
+
+Response = requests.Response | httpx.Response
+
 
 class OpenMlDatasetConnector(DatasetConnector):
     def fetch(self, dataset: DatasetDescription) -> Dataset:
         identifier = dataset.node_specific_identifier
-        url_data = f"https://www.openml.org/api/v1/json/data/{identifier}"
-        response = requests.get(url_data)
-        if not response.ok:
-            code = response.status_code
-            if code == 412 and response.json()["error"]["message"] == "Unknown dataset":
-                code = 404
-            msg = response.json()["error"]["message"]
-            raise HTTPException(
-                status_code=code,
-                detail=f"Error while fetching data from OpenML: '{msg}'",
-            )
-        dataset_json = response.json()["data_set_description"]
-
         # Here we can format the response into some standardized way, maybe this includes some
-        # dataset characteristics. These need to be retrieved separately from OpenML:
-        url_qualities = f"https://www.openml.org/api/v1/json/data/qualities/{identifier}"
-        response = requests.get(url_qualities)
-        if not response.ok:
-            msg = response.json()["error"]["message"]
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Error while fetching data qualities from OpenML: '{msg}'",
-            )
+        # dataset characteristics. These need to be retrieved separately from OpenML. Both calls
+        # are independent, so they are made concurrently.
+        dataset_json, qualities_json = concurrency.gather(
+            lambda: _data_json(http_session.get(f"{OPENML_URL}/data/{identifier}")),
+            lambda: _qualities_json(http_session.get(f"{OPENML_URL}/data/qualities/{identifier}")),
+        )
+        return _as_schema_org(dataset, dataset_json, qualities_json)
+
+    async def fetch_async(self, dataset: DatasetDescription) -> Dataset:
+        identifier = dataset.node_specific_identifier
+        dataset_json, qualities_json = await concurrency.gather_async(
+            _fetch_data_json_async(identifier), _fetch_qualities_json_async(identifier)
+        )
+        return _as_schema_org(dataset, dataset_json, qualities_json)
+
+    @property
+    def has_bulk_api(self) -> bool:
+        return True
 
-        qualities_json = {
-            quality["name"]: quality["value"]
-            for quality in response.json()["data_qualities"]["quality"]
-        }
-
-        # TODO: should we add those qualities as well? Schema.org does not have a place for it.
-        # number_of_features=_as_int(qualities_json["NumberOfFeatures"]),
-        # number_of_classes=_as_int(qualities_json["NumberOfClasses"]),
-
-        result = Dataset(
-            name=dataset_json["name"],
-            url=url_data,
-            description=dataset_json["description"],
-            dateCreated=dataset_json["upload_date"],
-            identifier=dataset.node_specific_identifier,
-            distribution=DataDownload(
-                contentUrl=dataset_json["url"], encodingFormat=dataset_json["format"]
-            ),
-            size=QuantitativeValue(value=_as_int(qualities_json["NumberOfInstances"])),
-            isAccessibleForFree=True,
-            includedInDataCatalog=DataCatalog(name="OpenML"),
+    async def fetch_bulk_async(
+        self, datasets: typing.List[DatasetDescription]
+    ) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """
+        The qualities of many datasets are retrieved at once, using OpenML's data list filtered
+        on data_id. The descriptions are only available per dataset, so these calls are made
+        separately (see fetch_with_bulk_async).
+        """
+        return await _fetch_qualities_of_many_async(
+            [dataset.node_specific_identifier for dataset in datasets]
         )
-        if "language" in dataset_json:
-            setattr(result, "inLanguage", dataset_json["language"])
-        return result
+
+    async def fetch_with_bulk_async(
+        self,
+        dataset: DatasetDescription,
+        bulk: typing.Dict[str, typing.Dict[str, typing.Any]] | None,
+    ) -> Dataset:
+        """If the data list did not contain the dataset, its qualities are fetched separately."""
+        identifier = dataset.node_specific_identifier
+        if bulk is None or identifier not in bulk:
+            return await self.fetch_async(dataset)
+        dataset_json = await _fetch_data_json_async(identifier)
+        return _as_schema_org(dataset, dataset_json, bulk[identifier])
 
     def fetch_all(self, limit=None) -> Iterator[DatasetDescription]:
-        url = "https://www.openml.org/api/v1/json/data/list"
-        if limit is not None:
-            url = f"{url}/limit/{limit}"
-        response = requests.get(url)
+        response = http_session.get(_url_data_list(limit))
+        yield from self._dataset_descriptions(response)
+
+    async def fetch_all_async(self, limit=None) -> AsyncIterator[DatasetDescription]:
+        response = await http_session.get_async(_url_data_list(limit))
+        for dataset_description in self._dataset_descriptions(response):
+            yield dataset_description
+
+    def _dataset_descriptions(self, response: Response) -> Iterator[DatasetDescription]:
         response_json = response.json()
-        if not response.ok:
+        if response.status_code >= 400:
             msg = response_json["error"]["message"]
             raise HTTPException(
                 status_code=response.status_code,
@@ -92,6 +103,104 @@ class OpenMlDatasetConnector(DatasetConnector):
             )
 
 
+def _url_data_list(limit: int | None) -> str:
+    url = f"{OPENML_URL}/data/list"
+    if limit is not None:
+        url = f"{url}/limit/{limit}"
+    return url
+
+
+async def _fetch_qualities_of_many_async(
+    identifiers: typing.List[str],
+) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+    """The qualities, by name, of the datasets in the data list, by identifier. Datasets that are
+    not in the data list are absent."""
+    numeric_identifiers = [identifier for identifier in identifiers if identifier.isdigit()]
+    chunks = []
+    for start in range(0, len(numeric_identifiers), DATA_LIST_MAX_IDENTIFIERS):
+        end = start + DATA_LIST_MAX_IDENTIFIERS
+        chunks.append(numeric_identifiers[start:end])
+    responses = await concurrency.gather_async(
+        *(
+            http_session.get_async(f"{OPENML_URL}/data/list/data_id/{','.join(chunk)}/status/all")
+            for chunk in chunks
+        )
+    )
+    qualities = {}
+    for response in responses:
+        if response.status_code >= 400:
+            continue  # E.g., none of the datasets exist. Their qualities are fetched separately.
+        for dataset_json in response.json()["data"]["dataset"]:
+            qualities[str(dataset_json["did"])] = {
+                quality["name"]: quality["value"] for quality in dataset_json.get("quality", [])
+            }
+    return qualities
+
+
+async def _fetch_data_json_async(identifier: str) -> typing.Dict[str, typing.Any]:
+    return _data_json(await http_session.get_async(f"{OPENML_URL}/data/{identifier}"))
+
+
+async def _fetch_qualities_json_async(identifier: str) -> typing.Dict[str, typing.Any]:
+    return _qualities_json(
+        await http_session.get_async(f"{OPENML_URL}/data/qualities/{identifier}")
+    )
+
+
+def _data_json(response: Response) -> typing.Dict[str, typing.Any]:
+    """The data_set_description of the response of OpenML's data endpoint"""
+    if response.status_code >= 400:
+        code = response.status_code
+        if code == 412 and response.json()["error"]["message"] == "Unknown dataset":
+            code = 404
+        msg = response.json()["error"]["message"]
+        raise HTTPException(
+            status_code=code,
+            detail=f"Error while fetching data from OpenML: '{msg}'",
+        )
+    return response.json()["data_set_description"]
+
+
+def _qualities_json(response: Response) -> typing.Dict[str, typing.Any]:
+    """The qualities, by name, of the response of OpenML's data qualities endpoint"""
+    if response.status_code >= 400:
+        msg = response.json()["error"]["message"]
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Error while fetching data qualities from OpenML: '{msg}'",
+        )
+    return {
+        quality["name"]: quality["value"]
+        for quality in response.json()["data_qualities"]["quality"]
+    }
+
+
+def _as_schema_org(
+    dataset: DatasetDescription,
+    dataset_json: typing.Dict[str, typing.Any],
+    qualities_json: typing.Dict[str, typing.Any],
+) -> Dataset:
+    # TODO: should we add those qualities as well? Schema.org does not have a place for it.
+    # number_of_features=_as_int(qualities_json["NumberOfFeatures"]),
+    # number_of_classes=_as_int(qualities_json["NumberOfClasses"]),
+    result = Dataset(
+        name=dataset_json["name"],
+        url=f"{OPENML_URL}/data/{dataset.node_specific_identifier}",
+        description=dataset_json["description"],
+        dateCreated=dataset_json["upload_date"],
+        identifier=dataset.node_specific_identifier,
+        distribution=DataDownload(
+            contentUrl=dataset_json["url"], encodingFormat=dataset_json["format"]
+        ),
+        size=QuantitativeValue(value=_as_int(qualities_json["NumberOfInstances"])),
+        isAccessibleForFree=True,
+        includedInDataCatalog=DataCatalog(name="OpenML"),
+    )
+    if "language" in dataset_json:
+        setattr(result, "inLanguage", dataset_json["language"])
+    return result
+
+
 def _as_int(v: str) -> int:
     as_float = float(v)
     if not as_float.is_integer():
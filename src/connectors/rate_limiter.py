@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+import typing
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket, limiting the number of calls per second.
+
+    Both blocking callers (`acquire`) and asynchronous callers (`acquire_async`, which does not
+    block the event loop while waiting) take tokens from the same bucket.
+
+    The bucket holds at most `burst` tokens and is refilled with `rate` tokens per second. Every
+    call to `acquire` takes a token, sleeping until one is available. Callers that have to wait
+    reserve their token up front, so they are served in order of arrival.
+
+    If `max_wait` is given, callers that would have to wait longer than `max_wait` seconds do not
+    take a token and do not wait at all, so that callers do not pile up while the calls arrive
+    faster than the rate for a long time.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: typing.Callable[[], float] = time.monotonic,
+        sleep: typing.Callable[[float], typing.Any] = time.sleep,
+        max_wait: float | None = None,
+    ):
+        if rate <= 0:
+            raise ValueError(f"The rate should be positive, but was {rate}.")
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.max_wait = max_wait
+        self._tokens = float(burst)
+        self._last_refill = clock()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float | None:
+        """Take a token, and return the number of seconds to wait before it may be used. Returns
+        None, without taking a token, if that would take longer than max_wait."""
+        with self._lock:
+            now = self.clock()
+            elapsed = now - self._last_refill
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+            wait = 0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if self.max_wait is not None and wait > self.max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def acquire(self) -> bool:
+        """Take a token, sleeping until it is available. Returns False, immediately, if that
+        would take longer than max_wait."""
+        wait = self._reserve()
+        if wait is None:
+            return False
+        if wait > 0:
+            self.sleep(wait)
+        return True
+
+    async def acquire_async(self) -> bool:
+        """Take a token, awaiting until it is available. Returns False, immediately, if that
+        would take longer than max_wait."""
+        wait = self._reserve()
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
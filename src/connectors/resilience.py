@@ -0,0 +1,253 @@
+"""
+Protection of the API against nodes that are slow or down.
+
+A node that fails (or takes very long) for every request would otherwise occupy a worker, or an
+upstream connection, for every request for its datasets, until the whole API stops responding.
+Per node, the calls to the connector therefore pass:
+ * a circuit breaker, which trips when too many of the recent calls failed or were slow. While
+   it is open, calls fail immediately with a 503, without calling the node. After a while, a
+   single trial call is let through (half-open), which closes the breaker if it succeeds;
+ * a token bucket (see rate_limiter.py), which limits the number of calls per second to the node.
+   Calls that would have to wait too long for the bucket fail immediately with a 503, so that
+   they do not pile up while the node is asked for more than its limit.
+
+While a node is degraded, the cache serves the last metadata it fetched successfully, even if
+its time-to-live is over (see connectors/cache.py).
+"""
+import collections
+import threading
+import time
+import typing
+
+from fastapi import HTTPException
+from pydantic_schemaorg.Dataset import Dataset
+
+from connectors.abstract.dataset_connector import DatasetConnector
+from connectors.abstract.dataset_connector_wrapper import DatasetConnectorWrapper
+from connectors.rate_limiter import RateLimiter
+from database.models import DatasetDescription
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+T = typing.TypeVar("T")
+
+
+def is_node_failure(error: BaseException) -> bool:
+    """Whether this error means that the node is degraded, rather than, e.g., that it does not
+    have the dataset. Errors other than HTTPExceptions are failures to reach the node."""
+    if isinstance(error, HTTPException):
+        return error.status_code >= 500 or error.status_code == 429
+    return isinstance(error, Exception)
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker, tripping on the rate of failed or slow calls.
+
+    Params
+    ------
+    failure_rate_threshold, float: the breaker opens when this fraction of the calls in the
+      window failed or was slow.
+    slow_call_seconds, float: calls taking longer count as failed.
+    window_size, int: the number of most recent calls that are considered.
+    minimum_calls, int: the breaker does not open before this many calls are in the window.
+    open_seconds, float: how long the breaker stays open before letting a trial call through.
+    clock: function returning a monotonic time in seconds. Can be replaced for testing.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 10,
+        window_size: int = 20,
+        minimum_calls: int = 5,
+        open_seconds: float = 30,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self._window = collections.deque(maxlen=window_size)  # type: typing.Deque[bool]
+        self._opened_at = 0.0
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: typing.Dict[str, typing.Any]) -> "CircuitBreaker":
+        """Create the breaker from the [resilience] section of the configuration file."""
+        return cls(
+            failure_rate_threshold=config.get("failure_rate_threshold", 0.5),
+            slow_call_seconds=config.get("slow_call_seconds", 10),
+            window_size=config.get("window_size", 20),
+            minimum_calls=config.get("minimum_calls", 5),
+            open_seconds=config.get("open_seconds", 30),
+        )
+
+    def allow(self) -> bool:
+        """Whether a call may be made now. If so, its outcome should be recorded."""
+        with self._lock:
+            if self.state == OPEN and self.clock() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._trial_in_progress:
+                    return False
+                self._trial_in_progress = True
+                return True
+            return self.state == CLOSED
+
+    def record(self, seconds: float, failed: bool):
+        """Record the outcome of an allowed call, which took this many seconds."""
+        failed = failed or seconds >= self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_in_progress = False
+                if failed:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._window.clear()
+                return
+            self._window.append(failed)
+            if len(self._window) >= self.minimum_calls:
+                if self._failure_rate() >= self.failure_rate_threshold:
+                    self._open()
+
+    def cancel(self):
+        """Record that an allowed call was not made after all."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_in_progress = False
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self.clock()
+        self._window.clear()
+
+    def _failure_rate(self) -> float:
+        return sum(self._window) / len(self._window) if self._window else 0.0
+
+    def status(self) -> typing.Dict[str, typing.Any]:
+        """The state of the breaker, for monitoring."""
+        with self._lock:
+            status = {
+                "state": self.state,
+                "calls": len(self._window),
+                "failure_rate": self._failure_rate(),
+            }  # type: typing.Dict[str, typing.Any]
+            if self.state != CLOSED:
+                status["seconds_open"] = self.clock() - self._opened_at
+            return status
+
+
+class ResilientDatasetConnector(DatasetConnectorWrapper):
+    """Passes the calls to the node through the circuit breaker and the rate limiter of the
+    node. Raises a 503 while the breaker is open, or if the call would have to wait longer than
+    the max_wait of the rate limiter."""
+
+    def __init__(
+        self,
+        connector: DatasetConnector,
+        breaker: CircuitBreaker,
+        rate_limiter: RateLimiter | None = None,
+    ):
+        super().__init__(connector)
+        self.breaker = breaker
+        self.rate_limiter = rate_limiter
+
+    def _unavailable(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail=f"Node '{self.node_name.value}' is unavailable, please try again later.",
+        )
+
+    def _overloaded(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail=f"Too many requests to node '{self.node_name.value}', please try again later.",
+        )
+
+    def _admit(self):
+        if not self.breaker.allow():
+            raise self._unavailable()
+        if self.rate_limiter is not None and not self.rate_limiter.acquire():
+            self.breaker.cancel()
+            raise self._overloaded()
+
+    async def _admit_async(self):
+        if not self.breaker.allow():
+            raise self._unavailable()
+        if self.rate_limiter is not None and not await self.rate_limiter.acquire_async():
+            self.breaker.cancel()
+            raise self._overloaded()
+
+    def fetch(self, dataset: DatasetDescription) -> Dataset:
+        self._admit()
+        start = time.monotonic()
+        try:
+            result = self.connector.fetch(dataset)
+        except BaseException as e:
+            self.breaker.record(time.monotonic() - start, failed=is_node_failure(e))
+            raise
+        self.breaker.record(time.monotonic() - start, failed=False)
+        return result
+
+    async def _call_async(
+        self, function: typing.Callable[..., typing.Awaitable[T]], *args: typing.Any
+    ) -> T:
+        await self._admit_async()
+        start = time.monotonic()
+        try:
+            result = await function(*args)
+        except BaseException as e:
+            self.breaker.record(time.monotonic() - start, failed=is_node_failure(e))
+            raise
+        self.breaker.record(time.monotonic() - start, failed=False)
+        return result
+
+    async def fetch_async(self, dataset: DatasetDescription) -> Dataset:
+        return await self._call_async(self.connector.fetch_async, dataset)
+
+    async def fetch_bulk_async(self, datasets: typing.List[DatasetDescription]) -> typing.Any:
+        return await self._call_async(self.connector.fetch_bulk_async, datasets)
+
+    async def fetch_with_bulk_async(self, dataset: DatasetDescription, bulk: typing.Any) -> Dataset:
+        return await self._call_async(self.connector.fetch_with_bulk_async, dataset, bulk)
+
+    async def fetch_many_async(
+        self, datasets: typing.List[DatasetDescription], max_concurrency: int = 10
+    ) -> typing.List[Dataset | BaseException]:
+        """The call to the bulk API of the node, if any, and the call for each dataset pass the
+        breaker and the rate limiter separately. If the bulk call fails, its error is returned
+        for every dataset."""
+        try:
+            return await DatasetConnector.fetch_many_async(self, datasets, max_concurrency)
+        except Exception as e:
+            return [e for _ in datasets]
+
+
+def resilient_connectors(
+    dataset_connectors: typing.Dict[typing.Any, DatasetConnector],
+    config: typing.Dict[str, typing.Any],
+) -> typing.Dict[typing.Any, ResilientDatasetConnector]:
+    """Wrap each connector with a breaker and rate limiter of its own, configured by the
+    [resilience] section of the configuration file. Settings in [resilience.per_node.<node>]
+    take precedence over the general settings."""
+    wrapped = {}
+    for node, connector in dataset_connectors.items():
+        node_config = {**config, **config.get("per_node", {}).get(connector.node_name.value, {})}
+        rate = node_config.get("requests_per_second", None)
+        rate_limiter = None
+        if rate is not None:
+            rate_limiter = RateLimiter(
+                rate=rate,
+                burst=node_config.get("burst", 1),
+                max_wait=node_config.get("max_wait_seconds", 2),
+            )
+        breaker = CircuitBreaker.from_config(node_config)
+        wrapped[node] = ResilientDatasetConnector(connector, breaker, rate_limiter)
+    return wrapped
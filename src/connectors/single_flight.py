@@ -0,0 +1,106 @@
+"""
+Coalescing of concurrent fetches of the same dataset.
+
+When many clients request a popular dataset at the same time, and it is not cached (yet), each
+request would call the node. Instead, the first caller fetches the metadata, and concurrent
+callers for the same (node, node_specific_identifier) wait for that call, sharing its result or
+its error. Once the call is finished, the next caller fetches again (or is served by the cache,
+see connectors/cache.py).
+
+The blocking and the asynchronous code paths each coalesce the calls that they make: callers of
+`fetch` share a thread, callers of `fetch_async` (or of `fetch_with_etag_async`) share a task of
+the event loop.
+"""
+import asyncio
+import threading
+import typing
+
+from pydantic_schemaorg.Dataset import Dataset
+
+from connectors.abstract.dataset_connector import DatasetConnector
+from connectors.abstract.dataset_connector_wrapper import DatasetConnectorWrapper
+from database.models import DatasetDescription
+
+T = typing.TypeVar("T")
+CallKey = typing.Tuple[str, str]  # (node, node_specific_identifier)
+TaskKey = typing.Tuple[str, str, str]  # (method, node, node_specific_identifier)
+
+
+class _Call:
+    """A fetch in flight in a thread, which other threads can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None  # type: Dataset | None
+        self.error = None  # type: BaseException | None
+
+
+class SingleFlightDatasetConnector(DatasetConnectorWrapper):
+    """Shares a single call of DatasetConnector.fetch (or fetch_async, or fetch_with_etag_async)
+    between concurrent callers for the same dataset."""
+
+    def __init__(self, connector: DatasetConnector):
+        super().__init__(connector)
+        self._lock = threading.Lock()
+        self._calls = {}  # type: typing.Dict[CallKey, _Call]
+        self._tasks = {}  # type: typing.Dict[TaskKey, asyncio.Task]
+
+    def _key(self, dataset: DatasetDescription) -> CallKey:
+        return self.node_name.value, dataset.node_specific_identifier
+
+    def fetch(self, dataset: DatasetDescription) -> Dataset:
+        key = self._key(dataset)
+        with self._lock:
+            call = self._calls.get(key, None)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+        call = typing.cast(_Call, call)
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return typing.cast(Dataset, call.result)
+        try:
+            call.result = self.connector.fetch(dataset)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def fetch_async(self, dataset: DatasetDescription) -> Dataset:
+        return await self._shared("fetch_async", dataset, self.connector.fetch_async)
+
+    async def fetch_with_etag_async(
+        self, dataset: DatasetDescription
+    ) -> typing.Tuple[Dataset, str]:
+        return await self._shared(
+            "fetch_with_etag_async", dataset, self.connector.fetch_with_etag_async
+        )
+
+    async def _shared(
+        self,
+        method: str,
+        dataset: DatasetDescription,
+        function: typing.Callable[[DatasetDescription], typing.Awaitable[T]],
+    ) -> T:
+        """The result of the task calling function(dataset), shared by the concurrent callers of
+        this method for the same dataset."""
+        key = (method, *self._key(dataset))
+        task = self._tasks.get(key, None)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(function(dataset))
+            self._tasks[key] = task
+            task.add_done_callback(lambda finished: self._forget(key, finished))
+        # Shielded, so that a caller that is cancelled does not cancel the call of the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key: TaskKey, task: asyncio.Task):
+        if self._tasks.get(key, None) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved, even if all callers were cancelled
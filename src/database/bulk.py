@@ -0,0 +1,242 @@
+"""
+Creating, updating, deleting and linking many rows at once, for the bulk endpoints.
+
+All changes of a request are made in a single transaction, using a statement per kind of change
+that is executed with many parameter sets (executemany). Instead of relying on the database to
+reject conflicting rows one by one, the conflicts are determined upfront with a few queries, so
+that the result of each item can be reported.
+
+The result of each item is a dict with a "status_code", and either the "id" of the row or the
+"detail" of the error, similar to the response of the endpoints for single rows.
+"""
+import typing
+from typing import Any, Dict, List, Tuple, cast
+
+from sqlalchemy import Table, bindparam, delete, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from .materialized import delete_metadata
+from .models import Base, DatasetDescription, Publication, dataset_publication_relationship
+from .utils import QUERY_BATCH_SIZE, batches, unique_key
+
+Key = Tuple[Any, ...]  # The values of the unique constraint of a row
+Result = Dict[str, Any]
+
+
+def _ok(status_code: int, identifier: int) -> Result:
+    return {"status_code": status_code, "id": identifier}
+
+
+def _error(status_code: int, detail: str) -> Result:
+    return {"status_code": status_code, "detail": detail}
+
+
+def _existing_keys(session: Session, table: Table, ids: typing.Iterable[int]) -> Dict[int, Key]:
+    """The unique key of the rows with these ids, by id, for the rows that exist."""
+    key_columns = [table.c[name] for name in unique_key(table)]
+    keys = {}
+    for batch in batches(set(ids), QUERY_BATCH_SIZE):
+        query = select(table.c.id, *key_columns).where(table.c.id.in_(batch))
+        keys.update({row[0]: tuple(row[1:]) for row in session.execute(query)})
+    return keys
+
+
+def _existing_ids(session: Session, table: Table, keys: typing.Iterable[Key]) -> Dict[Key, int]:
+    """The id of the rows with these unique keys, by key, for the rows that exist."""
+    key_columns = [table.c[name] for name in unique_key(table)]
+    ids = {}
+    for batch in batches(set(keys), QUERY_BATCH_SIZE):
+        query = select(table.c.id, *key_columns).where(tuple_(*key_columns).in_(batch))
+        ids.update({tuple(row[1:]): row[0] for row in session.execute(query)})
+    return ids
+
+
+def bulk_write(
+    session: Session,
+    model: typing.Type[Base],
+    create: List[Dict[str, Any]],
+    update_: List[Dict[str, Any]],
+    delete_: List[int],
+) -> Tuple[Dict[str, List[Result]], List[Key]]:
+    """
+    Delete, update and create rows of this model, in that order, without committing.
+
+    Params
+    ------
+    create, list of dicts: the column values of the new rows.
+    update_, list of dicts: the column values of existing rows, including their "id".
+    delete_, list of ints: the ids of the rows to delete.
+
+    Returns
+    -------
+    The results of the items, by kind of change, in the order of the items, and the unique keys
+    that were changed (the keys of the deleted rows, and the old and new keys of the updated rows).
+    """
+    table = cast(Table, model.__table__)
+    key_names = unique_key(table)
+    name = table.name[:-1]  # E.g., "dataset" for the "datasets" table
+    results = {
+        "delete": [],
+        "update": [],
+        "create": [],
+    }  # type: Dict[str, List[Result]]
+    changed_keys = []  # type: List[Key]
+
+    old_keys = _existing_keys(session, table, delete_ + [item["id"] for item in update_])
+    new_keys = [tuple(item[k] for k in key_names) for item in update_ + create]
+    existing_ids = _existing_ids(session, table, new_keys)
+
+    deleted = {}  # type: Dict[int, Key]
+    for identifier in delete_:
+        if identifier not in old_keys or identifier in deleted:
+            results["delete"].append(_error(404, f"{name.capitalize()} '{identifier}' not found."))
+        else:
+            deleted[identifier] = old_keys[identifier]
+            results["delete"].append(_ok(200, identifier))
+
+    claimed = set()  # type: typing.Set[Key]
+
+    def conflict(key: Key, identifier: int | None) -> Result | None:
+        """An error if another row has, or will have, this unique key"""
+        existing_id = existing_ids.get(key, None)
+        if existing_id is not None and existing_id != identifier and existing_id not in deleted:
+            return _error(
+                409,
+                f"There already exists a {name} with the same {' and '.join(key_names)}, "
+                f"with id={existing_id}.",
+            )
+        if key in claimed:
+            return _error(
+                409,
+                f"Another {name} in this request has the same {' and '.join(key_names)}.",
+            )
+        return None
+
+    updated = []  # type: List[Dict[str, Any]]
+    for item in update_:
+        identifier = item["id"]
+        key = tuple(item[k] for k in key_names)
+        if identifier not in old_keys or identifier in deleted:
+            results["update"].append(_error(404, f"{name.capitalize()} '{identifier}' not found."))
+        elif (error := conflict(key, identifier)) is not None:
+            results["update"].append(error)
+        else:
+            claimed.add(key)
+            updated.append(item)
+            changed_keys.extend([old_keys[identifier], key])
+            results["update"].append(_ok(200, identifier))
+
+    created = []  # type: List[Dict[str, Any]]
+    create_results = []  # type: List[Result | Key]
+    for item in create:
+        key = tuple(item[k] for k in key_names)
+        if (error := conflict(key, None)) is not None:
+            create_results.append(error)
+        else:
+            claimed.add(key)
+            created.append(item)
+            create_results.append(key)
+
+    if model is DatasetDescription and (deleted or updated):
+        # The stored metadata of updated datasets may belong to their old node or identifier
+        delete_metadata(session, list(deleted) + [item["id"] for item in updated])
+    if deleted:
+        changed_keys.extend(deleted.values())
+        for column in dataset_publication_relationship.c:
+            if column.references(table.c.id):
+                session.execute(
+                    delete(dataset_publication_relationship).where(column.in_(list(deleted)))
+                )
+        session.execute(delete(table).where(table.c.id.in_(list(deleted))))
+    if updated:
+        columns = [column.key for column in table.c if column.key != "id"]
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values({column: bindparam(f"b_{column}") for column in columns})
+        )
+        session.execute(
+            statement,
+            [{f"b_{key}": value for key, value in item.items()} for item in updated],
+        )
+    created_ids = {}  # type: Dict[Key, int]
+    if created:
+        rows = [{k: v for k, v in item.items() if k != "id"} for item in created]
+        session.execute(insert(table), rows)
+        created_ids = _existing_ids(
+            session, table, [key for key in create_results if isinstance(key, tuple)]
+        )
+    for result in create_results:
+        if isinstance(result, tuple):
+            results["create"].append(_ok(201, created_ids[result]))
+        else:
+            results["create"].append(result)
+    return results, changed_keys
+
+
+def bulk_link(
+    session: Session, link: List[Tuple[int, int]], unlink: List[Tuple[int, int]]
+) -> Dict[str, List[Result]]:
+    """
+    Unlink and link datasets and publications, in that order, without committing.
+
+    Params
+    ------
+    link, list of (dataset_id, publication_id): the links to add.
+    unlink, list of (dataset_id, publication_id): the links to remove.
+
+    Returns
+    -------
+    The results of the items, by kind of change, in the order of the items.
+    """
+    table = dataset_publication_relationship
+    dataset_ids = set()  # type: typing.Set[int]
+    for batch in batches({dataset_id for dataset_id, _ in link}, QUERY_BATCH_SIZE):
+        query = select(DatasetDescription.id).where(DatasetDescription.id.in_(batch))
+        dataset_ids.update(session.scalars(query))
+    publication_ids = set()  # type: typing.Set[int]
+    for batch in batches({publication_id for _, publication_id in link}, QUERY_BATCH_SIZE):
+        query = select(Publication.id).where(Publication.id.in_(batch))
+        publication_ids.update(session.scalars(query))
+    linked = set()  # type: typing.Set[Tuple[int, int]]
+    for pairs in batches(set(link + unlink), QUERY_BATCH_SIZE):
+        query = select(table.c.dataset_id, table.c.publication_id).where(
+            tuple_(table.c.dataset_id, table.c.publication_id).in_(pairs)
+        )
+        linked.update((row[0], row[1]) for row in session.execute(query))
+
+    results = {"unlink": [], "link": []}  # type: Dict[str, List[Result]]
+    to_unlink = []  # type: List[Tuple[int, int]]
+    for dataset_id, publication_id in unlink:
+        if (dataset_id, publication_id) not in linked:
+            detail = f"Dataset {dataset_id} is not linked to publication {publication_id}."
+            results["unlink"].append(_error(404, detail))
+        else:
+            linked.remove((dataset_id, publication_id))
+            to_unlink.append((dataset_id, publication_id))
+            results["unlink"].append({"status_code": 200})
+    to_link = []  # type: List[Tuple[int, int]]
+    for dataset_id, publication_id in link:
+        if dataset_id not in dataset_ids:
+            results["link"].append(_error(404, f"Dataset '{dataset_id}' not found."))
+        elif publication_id not in publication_ids:
+            results["link"].append(_error(404, f"Publication '{publication_id}' not found."))
+        elif (dataset_id, publication_id) in linked:
+            detail = f"Dataset {dataset_id} is already linked to publication {publication_id}."
+            results["link"].append(_error(409, detail))
+        else:
+            linked.add((dataset_id, publication_id))
+            to_link.append((dataset_id, publication_id))
+            results["link"].append({"status_code": 201})
+
+    if to_unlink:
+        statement = delete(table).where(
+            table.c.dataset_id == bindparam("b_dataset_id"),
+            table.c.publication_id == bindparam("b_publication_id"),
+        )
+        session.execute(
+            statement, [{"b_dataset_id": d, "b_publication_id": p} for d, p in to_unlink]
+        )
+    if to_link:
+        session.execute(insert(table), [{"dataset_id": d, "publication_id": p} for d, p in to_link])
+    return results
@@ -0,0 +1,187 @@
+"""
+The metadata that the dataset connectors fetch from the nodes, materialized in the database.
+
+Fetching the schema.org metadata of a dataset takes one or more calls to its node, while the
+metadata changes rarely. The dataset_metadata table therefore stores the JSON of the fetched
+Dataset, compressed using zlib, together with the time at which it was fetched. The detail
+endpoints serve a stored document while it is fresh, using a single lookup by primary key,
+and without rebuilding the pydantic model. Older documents are fetched from the node again.
+
+The harvester fills and refreshes the table (see refresh_metadata), after synchronizing the
+datasets with the nodes.
+"""
+import asyncio
+import datetime
+import typing
+import zlib
+from typing import List
+
+from pydantic_schemaorg.Dataset import Dataset
+from sqlalchemy import Engine, and_, delete, or_, select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+from connectors import DatasetConnector, http_session
+from http_caching import etag
+from .models import DatasetDescription, DatasetMetadata
+from .setup import Progress
+from .utils import QUERY_BATCH_SIZE, batches, utcnow
+
+
+class StoredMetadata(typing.NamedTuple):
+    """A stored document, decompressed: the JSON of the Dataset."""
+
+    json: bytes
+    etag: str
+    fetched_at: datetime.datetime
+
+
+class MetadataStore:
+    """
+    Stores and loads the metadata of datasets in the dataset_metadata table.
+
+    Params
+    ------
+    max_age, float: seconds after fetching during which a document is fresh (see is_fresh).
+    clock: function returning the current (naive UTC) time. Can be replaced for testing.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        max_age: float = 604800,
+        clock: typing.Callable[[], datetime.datetime] = utcnow,
+    ):
+        self.engine = engine
+        self.max_age = datetime.timedelta(seconds=max_age)
+        self.clock = clock
+
+    @classmethod
+    def from_config(cls, engine: Engine, config: typing.Dict[str, typing.Any]) -> "MetadataStore":
+        """Create the store from the [materialized_metadata] section of the configuration."""
+        return cls(engine, max_age=config.get("max_age_seconds", 604800))
+
+    def is_fresh(self, stored: StoredMetadata) -> bool:
+        """Whether the document may be served, rather than fetching the metadata again."""
+        return self.clock() - stored.fetched_at < self.max_age
+
+    def load(self, dataset_id: int) -> StoredMetadata | None:
+        """The stored document of this dataset, if any."""
+        query = select(DatasetMetadata.document, DatasetMetadata.etag, DatasetMetadata.fetched_at)
+        with Session(self.engine) as session:
+            row = session.execute(query.where(DatasetMetadata.dataset_id == dataset_id)).first()
+        if row is None:
+            return None
+        return StoredMetadata(zlib.decompress(row.document), row.etag, row.fetched_at)
+
+    def store(self, datasets: typing.Dict[int, Dataset]):
+        """Store the metadata of these datasets, by dataset id, replacing their documents."""
+        fetched_at = self.clock()
+        rows = []
+        for dataset_id, dataset in datasets.items():
+            json = dataset.json()
+            rows.append(
+                {
+                    "dataset_id": dataset_id,
+                    "document": zlib.compress(json.encode()),
+                    "etag": etag(json),
+                    "fetched_at": fetched_at,
+                }
+            )
+        if not rows:
+            return
+        table = DatasetMetadata.__table__  # type: ignore
+        with Session(self.engine) as session:
+            dialect = session.get_bind().dialect.name
+            if dialect == "mysql":
+                statement = mysql.insert(table)
+                statement = statement.on_duplicate_key_update(
+                    {name: statement.inserted[name] for name in ("document", "etag", "fetched_at")}
+                )
+            elif dialect == "sqlite":
+                statement = sqlite.insert(table).prefix_with("OR REPLACE")
+            else:
+                raise NotImplementedError(f"Storing metadata is not implemented for {dialect}.")
+            session.execute(statement, rows)
+            session.commit()
+
+
+def delete_metadata(session: Session, dataset_ids: typing.Iterable[int]):
+    """Delete the stored documents of these datasets, without committing. Necessary before
+    deleting the datasets, or after changing their node or node_specific_identifier."""
+    for batch in batches(set(dataset_ids), QUERY_BATCH_SIZE):
+        session.execute(delete(DatasetMetadata).where(DatasetMetadata.dataset_id.in_(batch)))
+
+
+def refresh_metadata(
+    store: MetadataStore,
+    connectors: List[DatasetConnector],
+    refresh_after: float,
+    batch_size: int = 100,
+    max_concurrency: int = 10,
+    progress: Progress | None = None,
+):
+    """
+    Fetch and store the metadata of the datasets of these connectors whose document is missing,
+    or at least `refresh_after` seconds old. The metadata of a batch of datasets is fetched at once
+    (see DatasetConnector.fetch_many_async). Datasets whose metadata cannot be fetched keep
+    their old document, if any.
+
+    All batches are fetched in a single event loop, so that they share the connections of its
+    AsyncClient (see http_session.async_client), which is closed afterwards. The connectors should
+    be the ones of resilient_connectors, to respect the rate limits and breakers of the nodes.
+
+    If given, `progress` is called after every batch with the number of documents stored so far.
+    """
+    asyncio.run(
+        _refresh_metadata(store, connectors, refresh_after, batch_size, max_concurrency, progress)
+    )
+
+
+async def _refresh_metadata(
+    store: MetadataStore,
+    connectors: List[DatasetConnector],
+    refresh_after: float,
+    batch_size: int,
+    max_concurrency: int,
+    progress: Progress | None,
+):
+    threshold = store.clock() - datetime.timedelta(seconds=refresh_after)
+    n_stored = 0
+    try:
+        for connector in connectors:
+            last_id = 0
+            while True:
+                query = (
+                    select(DatasetDescription)
+                    .outerjoin(DatasetMetadata, DatasetMetadata.dataset_id == DatasetDescription.id)
+                    .where(
+                        and_(
+                            DatasetDescription.node == connector.node_name.value,
+                            DatasetDescription.id > last_id,
+                            or_(
+                                DatasetMetadata.fetched_at.is_(None),
+                                DatasetMetadata.fetched_at <= threshold,
+                            ),
+                        )
+                    )
+                    .order_by(DatasetDescription.id)
+                    .limit(batch_size)
+                )
+                with Session(store.engine) as session:
+                    datasets = list(session.scalars(query))
+                if not datasets:
+                    break
+                last_id = datasets[-1].id
+                results = await connector.fetch_many_async(datasets, max_concurrency)
+                fetched = {
+                    dataset.id: result
+                    for dataset, result in zip(datasets, results)
+                    if not isinstance(result, BaseException)
+                }
+                store.store(fetched)
+                n_stored += len(fetched)
+                if progress is not None:
+                    progress(DatasetMetadata.__tablename__, n_stored)
+    finally:
+        await http_session.close_async_client()
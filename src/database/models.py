@@ -7,10 +7,29 @@ See also:
 Note: because we use MySQL in the demo, we need to explicitly set maximum string lengths.
 """
 import dataclasses
+import datetime
 import typing  # noqa:F401 (flake8 raises incorrect 'Module imported but unused' error)
 
-from sqlalchemy import ForeignKey, Table, Column, String, UniqueConstraint
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, MappedAsDataclass, relationship
+from sqlalchemy import (
+    DDL,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    LargeBinary,
+    String,
+    Table,
+    UniqueConstraint,
+    event,
+)
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    mapped_column,
+    MappedAsDataclass,
+    class_mapper,
+    relationship,
+)
 
 
 class Base(DeclarativeBase, MappedAsDataclass):
@@ -33,31 +52,72 @@ class Base(DeclarativeBase, MappedAsDataclass):
           When maximum depth is reached, any further references will simply be omitted.
           E.g., for depth=1 a Dataset will include Publications in its JSON, but not the
           Publications' Datasets.
+
+        Relationships that are not loaded are omitted as well, so that serializing never
+        triggers a (lazy) query. Load the relationships that should be included beforehand, e.g.,
+        using `select(...).options(selectinload(...))`.
         """
+        return _serializer(type(self))(self, depth)
+
+    @classmethod
+    def column_names(cls) -> typing.List[str]:
+        """The names of the fields that are columns, in the order in which to_dict serializes
+        them. A dict of these names and a row of the corresponding columns equals
+        to_dict(depth=0)."""
+        return _serializer(cls).column_names
+
+
+class _Serializer:
+    """
+    Serializes the instances of a single mapped class (see Base.to_dict). Which fields are
+    columns and which are relationships is determined once per class, rather than by inspecting
+    the values of every instance.
+    """
+
+    def __init__(self, cls: type):
+        uselist = {
+            relationship.key: relationship.uselist
+            for relationship in class_mapper(cls).relationships
+        }
+        # (name, None) for columns, (name, uselist) for relationships
+        self.fields = [
+            (field.name, uselist.get(field.name, None)) for field in dataclasses.fields(cls)
+        ]  # type: typing.List[typing.Tuple[str, bool | None]]
+        self.column_names = [name for name, uselist in self.fields if uselist is None]
+
+    def __call__(self, instance: Base, depth: int) -> dict:
         d = {}  # type: typing.Dict[str, typing.Any]
-        for field in dataclasses.fields(self):
-            value = getattr(self, field.name)
-            if isinstance(value, Base):
-                if depth > 0:
-                    d[field.name] = value.to_dict(depth=depth - 1)
-            elif isinstance(value, (list, set)):
-                if all(isinstance(item, Base) for item in value):
-                    if depth > 0:
-                        d[field.name] = type(value)(item.to_dict(depth - 1) for item in value)
-                elif not all(isinstance(item, type(next(iter(value)))) for item in value):
-                    raise NotImplementedError("Serializing mixed-type lists is not supported.")
+        loaded = instance.__dict__
+        for name, uselist in self.fields:
+            if uselist is None:
+                d[name] = loaded[name] if name in loaded else getattr(instance, name)
+            elif depth > 0 and name in loaded:
+                value = loaded[name]
+                if uselist:
+                    d[name] = [item.to_dict(depth - 1) for item in value]
                 else:
-                    d[field.name] = value
-            else:
-                d[field.name] = value
+                    d[name] = None if value is None else value.to_dict(depth - 1)
         return d
 
 
+_serializers = {}  # type: typing.Dict[type, _Serializer]
+
+
+def _serializer(cls: type) -> _Serializer:
+    serializer = _serializers.get(cls, None)
+    if serializer is None:
+        serializer = _serializers[cls] = _Serializer(cls)
+    return serializer
+
+
+# The primary key serves loading the publications of a dataset, the reverse index serves loading
+# the datasets of a publication. Both contain all columns, so the table itself is never read.
 dataset_publication_relationship = Table(
     "dataset_publication",
     Base.metadata,
-    Column("publication_id", ForeignKey("publications.id")),
-    Column("dataset_id", ForeignKey("datasets.id")),
+    Column("dataset_id", ForeignKey("datasets.id"), primary_key=True),
+    Column("publication_id", ForeignKey("publications.id"), primary_key=True),
+    Index("dataset_publication_publication_id_dataset_id", "publication_id", "dataset_id"),
 )
 
 
@@ -71,6 +131,9 @@ class DatasetDescription(Base):
             "node_specific_identifier",
             name="dataset_unique_node_node_specific_identifier",
         ),
+        # Serves listing the datasets of a node in order of id (see get_node_datasets)
+        Index("dataset_node_id", "node", "id"),
+        Index("dataset_name_fulltext", "name", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
     )
     name: Mapped[str] = mapped_column(String(150), nullable=False)
     node: Mapped[str] = mapped_column(String(30), nullable=False)
@@ -93,6 +156,9 @@ class Publication(Base):
             "url",
             name="publications_unique_title_url",
         ),
+        Index("publication_title_fulltext", "title", mysql_prefix="FULLTEXT").ddl_if(
+            dialect="mysql"
+        ),
     )
     title: Mapped[str] = mapped_column(String(250), nullable=False)
     url: Mapped[str] = mapped_column(String(250), nullable=False)
@@ -102,3 +168,63 @@ class Publication(Base):
         back_populates="publications",
         secondary=dataset_publication_relationship,
     )
+
+
+class DatasetMetadata(Base):
+    """The metadata of a dataset as fetched from its node: the zlib-compressed JSON of the
+    schema.org Dataset (see database/materialized.py)."""
+
+    __tablename__ = "dataset_metadata"
+    dataset_id: Mapped[int] = mapped_column(ForeignKey("datasets.id"), primary_key=True)
+    # MySQL picks a MEDIUMBLOB for this length, a plain BLOB is limited to 64KB
+    document: Mapped[bytes] = mapped_column(LargeBinary(16 * 1024 * 1024), nullable=False)
+    etag: Mapped[str] = mapped_column(String(40), nullable=False)
+    fetched_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+
+class HarvestRun(Base):
+    """A run of the harvester, which populates the database using the connectors."""
+
+    __tablename__ = "harvest_runs"
+    started_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, index=True)
+    state: Mapped[str] = mapped_column(String(20), nullable=False)  # running, finished or failed
+    finished_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, default=None)
+    error: Mapped[str | None] = mapped_column(String(500), default=None)
+    id: Mapped[int] = mapped_column(init=False, primary_key=True)
+
+
+# The columns that can be searched (see database/search.py), by table. MySQL offers FULLTEXT
+# indexes (see __table_args__). SQLite, used in the tests, offers FTS5 tables instead: a table
+# <table>_fts indexes the column of the external content table, and is kept in sync by triggers.
+FULL_TEXT_COLUMNS = {"datasets": "name", "publications": "title"}
+
+
+def _sqlite_full_text_ddl(table: str, column: str) -> typing.List[DDL]:
+    fts = f"{table}_fts"
+    delete = f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});"
+    insert = f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});"
+    return [
+        DDL(f"CREATE VIRTUAL TABLE {fts} USING fts5({column}, content={table}, content_rowid=id)"),
+        DDL(f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END"),
+        DDL(f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END"),
+        DDL(
+            f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {column} ON {table} "
+            f"BEGIN {delete} {insert} END"
+        ),
+    ]
+
+
+for _table, _column in FULL_TEXT_COLUMNS.items():
+    for _ddl in _sqlite_full_text_ddl(_table, _column):
+        event.listen(
+            Base.metadata.tables[_table], "after_create", _ddl.execute_if(dialect="sqlite")
+        )
+    event.listen(
+        Base.metadata.tables[_table],
+        "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {_table}_fts").execute_if(dialect="sqlite"),
+    )
+
+# Compile the serializers at import time, rather than while handling the first request
+for _mapper in Base.registry.mappers:
+    _serializers[_mapper.class_] = _Serializer(_mapper.class_)
@@ -0,0 +1,42 @@
+"""
+Full-text search over the columns in FULL_TEXT_COLUMNS, using the full-text index of the
+database: a FULLTEXT index for MySQL, or an FTS5 table for SQLite (see database/models.py).
+
+Both rank the rows by relevance. MySQL searches in natural language mode, for SQLite a row
+matches if it contains any of the words of the search query, ranked using bm25.
+"""
+import typing
+
+from sqlalchemy import ColumnClause  # noqa:F401 (used in a type comment)
+from sqlalchemy import Select, Table, column, func, literal_column, select, table
+from sqlalchemy.dialects.mysql import match
+
+from .models import FULL_TEXT_COLUMNS, Base
+
+
+def search_query(dialect: str, model: typing.Type[Base], text: str) -> Select:
+    """The query selecting the columns (see Base.column_names) of the rows matching the text,
+    ordered by relevance. The text should contain at least one word."""
+    content = typing.cast(Table, model.__table__)
+    searched = content.c[FULL_TEXT_COLUMNS[content.name]]
+    columns = [content.c[name] for name in model.column_names()]
+    if dialect == "mysql":
+        relevance = match(searched, against=text).in_natural_language_mode()
+        return select(*columns).where(relevance).order_by(relevance.desc(), content.c.id)
+    if dialect == "sqlite":
+        fts = table(f"{content.name}_fts", column("rowid"))
+        # FTS5 uses the name of the table as hidden column
+        fts_name = literal_column(fts.name)  # type: ColumnClause[typing.Any]
+        return (
+            select(*columns)
+            .join_from(content, fts, fts.c.rowid == content.c.id)
+            .where(fts_name.op("MATCH")(_fts5_query(text)))
+            .order_by(func.bm25(fts_name), content.c.id)
+        )
+    raise NotImplementedError(f"Full-text search is not implemented for {dialect}.")
+
+
+def _fts5_query(text: str) -> str:
+    """An FTS5 query matching any of the words, each quoted so that they are not interpreted as
+    FTS5 syntax."""
+    return " OR ".join('"' + word.replace('"', '""') + '"' for word in text.split())
@@ -1,14 +1,34 @@
 """
 Utility functions for initializing the database and tables through SQLAlchemy.
 """
+import hashlib
 import itertools
-from typing import List
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Type, cast
 
-from sqlalchemy import Engine, text, create_engine, select
+from sqlalchemy import (
+    Engine,
+    Table,
+    text,
+    create_engine,
+    select,
+    insert,
+    true,
+    tuple_,
+)
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import Executable
 from sqlalchemy.orm import Session
 
 from connectors import DatasetConnector, PublicationConnector
-from .models import Base, DatasetDescription, Publication
+from .models import Base, DatasetDescription, Publication, dataset_publication_relationship
+from .utils import batches, unique_key
+
+logger = logging.getLogger(__name__)
+
+Progress = Callable[[str, int], None]  # Called with a table name and number of rows processed
 
 
 def connect_to_database(
@@ -25,6 +45,9 @@ def connect_to_database(
     delete_first: drop the database before creating it again, to start with an empty database.
         IMPORTANT: Using `delete_first` means ALL data in that database will be lost permanently.
 
+    The statements are not echoed: their logging is configured by the level of the
+    "sqlalchemy.engine" logger (see logging_setup.py).
+
     Returns
     -------
     engine: Engine SQLAlchemy Engine configured with a database connection
@@ -32,7 +55,7 @@ def connect_to_database(
 
     if delete_first or create_if_not_exists:
         drop_or_create_database(url, delete_first)
-    engine = create_engine(url, echo=True)
+    engine = create_engine(url)
 
     with engine.connect() as connection:
         Base.metadata.create_all(connection, checkfirst=True)
@@ -42,7 +65,7 @@ def connect_to_database(
 
 def drop_or_create_database(url: str, delete_first: bool):
     server, database = url.rsplit("/", 1)
-    engine = create_engine(server, echo=True)
+    engine = create_engine(server)
     with engine.connect() as connection:
         if delete_first:
             connection.execute(text(f"DROP DATABASE IF EXISTS {database}"))
@@ -57,44 +80,196 @@ def populate_database(
     publications_connectors: List[PublicationConnector] | None = None,
     limit_datasets: int | None = None,
     limit_publications: int | None = None,
+    batch_size: int = 1000,
+    progress: Progress | None = None,
 ):
-    """Add some data to the Dataset and Publication tables."""
+    """Add some data to the Dataset and Publication tables.
 
-    if dataset_connectors is None:
-        datasets_iterable = iter(())
-    else:
-        datasets_iterable = itertools.chain(
-            *[c.fetch_all(limit=limit_datasets) for c in dataset_connectors]
-        )
-    if publications_connectors is None:
-        publications_iterable = iter(())
-    else:
-        publications_iterable = itertools.chain(
-            *[c.fetch_all(limit=limit_publications) for c in publications_connectors]
-        )
+    The connectors are consumed lazily. Their results are written in batches of `batch_size` rows
+    using bulk INSERT statements, so that the memory usage does not grow with the size of the
+    catalogues. Each batch is committed separately. If a batch contains a row that cannot be
+    inserted (e.g., because it violates a unique constraint), the batch is retried row by row
+    and only the offending rows are skipped.
 
-    datasets = list(datasets_iterable)
-    publications = list(publications_iterable)
-    # For now, we cannot make use of generators, because we have to link the datasets with the
-    # publications. This is a temporary setup though, so it makes sense to let the fetch_all()
-    # return an iterator for future benefits.
-    _link_datasets_with_publications(datasets, publications)
+    If given, `progress` is called after every batch with the table name and the number of rows
+    of that table processed so far.
+    """
     with Session(engine) as session:
         data_exists = (
             session.scalars(select(Publication)).first()
             or session.scalars(select(DatasetDescription)).first()
         )
-        if only_if_empty and data_exists:
-            return
+    if only_if_empty and data_exists:
+        return
 
-        session.add_all(datasets)
-        session.add_all(publications)
-        session.commit()
+    if publications_connectors is not None:
+        publications_iterable = itertools.chain.from_iterable(
+            c.fetch_all(limit=limit_publications) for c in publications_connectors
+        )
+        _insert_inbatches(engine, Publication, publications_iterable, batch_size, progress)
+    if dataset_connectors is not None:
+        datasets_iterable = itertools.chain.from_iterable(
+            c.fetch_all(limit=limit_datasets) for c in dataset_connectors
+        )
+        _insert_inbatches(engine, DatasetDescription, datasets_iterable, batch_size, progress)
+    _link_datasets_with_publications(engine)
+
+
+def sync_database(
+    engine: Engine,
+    dataset_connectors: List[DatasetConnector] | None = None,
+    publications_connectors: List[PublicationConnector] | None = None,
+    limit_datasets: int | None = None,
+    limit_publications: int | None = None,
+    batch_size: int = 1000,
+    progress: Progress | None = None,
+):
+    """Synchronize the Dataset and Publication tables with the connectors.
+
+    Unlike populate_database, this also works on a database that already contains data. Rows
+    are matched on their unique constraint (e.g., node and node_specific_identifier for
+    datasets). Only rows that are new, or whose content hash differs from the stored row, are
+    upserted. Unchanged rows, the ids of existing rows and the links between datasets and
+    publications are left alone. Rows that no longer exist on the node are not removed.
+
+    If given, `progress` is called after every batch with the table name and the number of rows
+    of that table processed so far.
+    """
+    if publications_connectors is not None:
+        publications_iterable = itertools.chain.from_iterable(
+            c.fetch_all(limit=limit_publications) for c in publications_connectors
+        )
+        _upsert_inbatches(engine, Publication, publications_iterable, batch_size, progress)
+    if dataset_connectors is not None:
+        datasets_iterable = itertools.chain.from_iterable(
+            c.fetch_all(limit=limit_datasets) for c in dataset_connectors
+        )
+        _upsert_inbatches(engine, DatasetDescription, datasets_iterable, batch_size, progress)
+    _link_datasets_with_publications(engine)
 
 
-def _link_datasets_with_publications(datasets, publications):
+def _upsert_inbatches(
+    engine: Engine,
+    model: Type[Base],
+    instances: Iterable[Base],
+    batch_size: int,
+    progress: Progress | None = None,
+) -> int:
+    """Upsert the instances that are new or changed, in batches of batch_size instances.
+    Returns the number of rows upserted."""
+    table = cast(Table, model.__table__)
+    key_columns = unique_key(table)
+    content_columns = [
+        c.key for c in table.columns if not c.primary_key and c.key not in key_columns
+    ]
+    columns = key_columns + content_columns
+    n_upserted = n_processed = 0
+    for i_batch, batch in enumerate(batches(instances, batch_size)):
+        rows = [{column: getattr(instance, column) for column in columns} for instance in batch]
+        with engine.begin() as connection:
+            stored_keys = tuple_(*(table.c[column] for column in key_columns)).in_(
+                [tuple(row[column] for column in key_columns) for row in rows]
+            )
+            query = select(*(table.c[column] for column in columns)).where(stored_keys)
+            n_keys = len(key_columns)
+            stored_hashes = {
+                tuple(stored[:n_keys]): _content_hash(stored[n_keys:])
+                for stored in connection.execute(query)
+            }
+            changed = [
+                row
+                for row in rows
+                if stored_hashes.get(tuple(row[column] for column in key_columns))
+                != _content_hash([row[column] for column in content_columns])
+            ]
+            if changed:
+                connection.execute(_upsert_statement(engine, table, content_columns), changed)
+        n_upserted += len(changed)
+        n_processed += len(rows)
+        if progress is not None:
+            progress(table.name, n_processed)
+        logger.info(
+            f"Synchronized batch {i_batch + 1} of {table.name}: {len(changed)} of {len(rows)} "
+            f"rows new or changed ({n_upserted} rows upserted in total)."
+        )
+    return n_upserted
+
+
+def _content_hash(values: Sequence[Any]) -> str:
+    return hashlib.sha256(json.dumps(list(values), default=str).encode()).hexdigest()
+
+
+def _upsert_statement(engine: Engine, table: Table, update_columns: List[str]) -> Executable:
+    """An INSERT statement that updates the update_columns if a row with the same unique key
+    already exists."""
+    if engine.dialect.name == "mysql":
+        mysql_statement = mysql.insert(table)
+        if not update_columns:
+            return mysql_statement.prefix_with("IGNORE")
+        return mysql_statement.on_duplicate_key_update(
+            {column: mysql_statement.inserted[column] for column in update_columns}
+        )
+    if engine.dialect.name == "sqlite":
+        sqlite_statement = sqlite.insert(table)
+        if not update_columns:
+            return sqlite_statement.on_conflict_do_nothing()
+        return sqlite_statement.on_conflict_do_update(
+            index_elements=unique_key(table),
+            set_={column: sqlite_statement.excluded[column] for column in update_columns},
+        )
+    raise NotImplementedError(f"Upserting is not implemented for {engine.dialect.name}.")
+
+
+def _insert_inbatches(
+    engine: Engine,
+    model: Type[Base],
+    instances: Iterable[Base],
+    batch_size: int,
+    progress: Progress | None = None,
+) -> int:
+    """Insert the instances using bulk INSERTs of batch_size rows. Returns the number of rows
+    inserted."""
+    table = cast(Table, model.__table__)
+    columns = [c.key for c in table.columns if not c.primary_key]
+    n_inserted = n_processed = 0
+    for i_batch, batch in enumerate(batches(instances, batch_size)):
+        rows = [{column: getattr(instance, column) for column in columns} for instance in batch]
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(table), rows)
+            n_inserted_batch = len(rows)
+        except IntegrityError:
+            n_inserted_batch = _insert_row_by_row(engine, table, rows)
+        n_inserted += n_inserted_batch
+        n_processed += len(rows)
+        if progress is not None:
+            progress(table.name, n_processed)
+        logger.info(
+            f"Inserted batch {i_batch + 1} into {table.name}: {n_inserted_batch} of {len(rows)} "
+            f"rows ({n_inserted} rows in total)."
+        )
+    return n_inserted
+
+
+def _insert_row_by_row(engine: Engine, table: Table, rows: List[Dict[str, Any]]) -> int:
+    """Insert the rows one at a time, skipping rows that cannot be inserted."""
+    n_inserted = 0
+    for row in rows:
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(table), row)
+            n_inserted += 1
+        except IntegrityError as e:
+            logger.warning(f"Skipped row {row} of {table.name}: {e.orig}")
+    return n_inserted
+
+
+def _link_datasets_with_publications(engine: Engine):
     """Linking some publications with some datasets. Temporary function to show the
-    possibilities."""
+    possibilities.
+
+    The links are made with INSERT ... SELECT statements, so that the datasets do not have to be
+    loaded into memory. Existing links are left alone."""
     # fmt: off
     benchmark_dataset_ids = [
         181, 1111, 1596, 1457, 40981, 40983, 23517, 1489, 31, 40982, 41138, 41163, 41164, 41143,
@@ -105,16 +280,34 @@ def _link_datasets_with_publications(datasets, publications):
         43072
     ]
     # fmt: on
-    benchmark_datasets = [
-        d
-        for d in datasets
-        if d.node == "openml" and int(d.node_specific_identifier) in benchmark_dataset_ids
-    ]
-    benchmark_publications = [p for p in publications if p.title == "AMLB: an AutoML Benchmark"]
     higgs_title = "Searching for exotic particles in high-energy physics with deep learning"
-    higgs_publication = [p for p in publications if p.title == higgs_title]
-    for publication in higgs_publication:
-        publication.datasets = [d for d in datasets if d.node == "openml" and d.name == "Higgs"]
-    for publication in benchmark_publications:
-        publication.datasets = benchmark_datasets
-    return datasets, publications
+    links = [
+        (
+            "AMLB: an AutoML Benchmark",
+            DatasetDescription.node_specific_identifier.in_(
+                [str(i) for i in benchmark_dataset_ids]
+            ),
+        ),
+        (higgs_title, DatasetDescription.name == "Higgs"),
+    ]
+    with engine.begin() as connection:
+        for publication_title, dataset_condition in links:
+            already_linked = (
+                select(dataset_publication_relationship)
+                .where(dataset_publication_relationship.c.publication_id == Publication.id)
+                .where(dataset_publication_relationship.c.dataset_id == DatasetDescription.id)
+                .exists()
+            )
+            to_link = (
+                select(Publication.id, DatasetDescription.id)
+                .select_from(Publication)
+                .join(DatasetDescription, true())  # Every combination that matches the conditions
+                .where(Publication.title == publication_title)
+                .where(DatasetDescription.node == "openml")
+                .where(dataset_condition)
+                .where(~already_linked)
+            )
+            statement = insert(dataset_publication_relationship).from_select(
+                ["publication_id", "dataset_id"], to_link
+            )
+            connection.execute(statement)
@@ -0,0 +1,32 @@
+"""
+Helpers shared by the modules that read and write the database in batches.
+"""
+import datetime
+import itertools
+from typing import Iterable, Iterator, List, TypeVar
+
+from sqlalchemy import Table, UniqueConstraint
+
+T = TypeVar("T")
+
+QUERY_BATCH_SIZE = 500  # The number of values in a single IN clause
+
+
+def utcnow() -> datetime.datetime:
+    """The current time in UTC, without timezone, as stored in the DateTime columns."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def batches(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """The items of the iterable in lists of (at most) size items, consumed lazily."""
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def unique_key(table: Table) -> List[str]:
+    """The columns of the (first) unique constraint of the table"""
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            return [column.key for column in constraint.columns]
+    raise ValueError(f"Table {table.name} does not have a unique constraint.")
@@ -0,0 +1,245 @@
+"""
+Periodically populates the database using the dataset and publication connectors.
+
+Harvesting the nodes can take a long time, so it should not delay the start of the REST API.
+The HarvestScheduler runs the harvest in a background thread, while the API serves the current
+contents of the database. The runs are stored in the harvest_runs table, so that a restart of
+the API (e.g., because of `--reload`) does not trigger a new harvest before the interval is over.
+
+The harvester can also be run as a separate process, which is recommended when the API is run
+with multiple workers (every worker would otherwise run its own harvester):
+
+    python harvester.py --populate-datasets openml huggingface --populate-publications example
+"""
+import argparse
+import datetime
+import logging
+import threading
+import typing
+from typing import List
+
+from sqlalchemy import Engine, select
+from sqlalchemy.orm import Session
+
+import connectors
+import logging_setup
+from config import config_section
+from connectors import DatasetConnector, NodeName, PublicationConnector
+from database.materialized import MetadataStore, refresh_metadata
+from database.models import HarvestRun
+from database.setup import populate_database, sync_database
+from database.utils import utcnow
+
+logger = logging.getLogger(__name__)
+
+
+class HarvestScheduler:
+    """
+    Runs the connectors every `interval` seconds in a background thread.
+
+    Params
+    ------
+    mode, str: "sync" to upsert new and changed rows on every run (see sync_database), or
+        "only-if-empty" to only populate an empty database (see populate_database).
+    metadata_store, optional: if given, every run also stores the metadata of the datasets whose
+        stored metadata is missing or at least `refresh_metadata_after` seconds old (see
+        database/materialized.py). The dataset_connectors should then be wrapped by
+        resilient_connectors, so that the refresh respects the rate limits of the nodes.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        dataset_connectors: List[DatasetConnector],
+        publication_connectors: List[PublicationConnector],
+        interval: float = 86400,
+        mode: str = "sync",
+        limit_datasets: int | None = None,
+        limit_publications: int | None = None,
+        metadata_store: MetadataStore | None = None,
+        refresh_metadata_after: float = 86400,
+    ):
+        if mode not in ("sync", "only-if-empty"):
+            raise ValueError(f"Unknown harvest mode '{mode}'.")
+        self.engine = engine
+        self.dataset_connectors = dataset_connectors
+        self.publication_connectors = publication_connectors
+        self.interval = interval
+        self.mode = mode
+        self.limit_datasets = limit_datasets
+        self.limit_publications = limit_publications
+        self.metadata_store = metadata_store
+        self.refresh_metadata_after = refresh_metadata_after
+        self._stop = threading.Event()
+        self._thread = None  # type: threading.Thread | None
+        self._lock = threading.Lock()
+        self._status = {"state": "stopped"}  # type: typing.Dict[str, typing.Any]
+
+    def status(self) -> typing.Dict[str, typing.Any]:
+        """The current state, the progress of the current run and the result of the last run."""
+        with self._lock:
+            status = dict(self._status)
+            if "rows_processed" in status:
+                status["rows_processed"] = dict(status["rows_processed"])
+            return status
+
+    def _update_status(self, **kwargs):
+        with self._lock:
+            self._status.update(kwargs)
+
+    def _progress(self, table: str, n_rows: int):
+        with self._lock:
+            self._status["rows_processed"][table] = n_rows
+
+    def seconds_until_next_run(self) -> float:
+        """Seconds until the next run is due, based on the start of the last run."""
+        with Session(self.engine) as session:
+            last_start = session.scalar(
+                select(HarvestRun.started_at).order_by(HarvestRun.started_at.desc()).limit(1)
+            )
+        if last_start is None:
+            return 0
+        next_start = last_start + datetime.timedelta(seconds=self.interval)
+        return max(0.0, (next_start - utcnow()).total_seconds())
+
+    def run_once(self):
+        """Run all connectors once, recording the run in the database."""
+        run = HarvestRun(started_at=utcnow(), state="running")
+        with Session(self.engine, expire_on_commit=False) as session:
+            session.add(run)
+            session.commit()
+        self._update_status(state="running", started_at=run.started_at, rows_processed={})
+        logger.info(f"Harvest {run.id} started.")
+        try:
+            kwargs = dict(
+                dataset_connectors=self.dataset_connectors,
+                publications_connectors=self.publication_connectors,
+                limit_datasets=self.limit_datasets,
+                limit_publications=self.limit_publications,
+                progress=self._progress,
+            )  # type: typing.Dict[str, typing.Any]
+            if self.mode == "sync":
+                sync_database(self.engine, **kwargs)
+            else:
+                populate_database(self.engine, only_if_empty=True, **kwargs)
+            if self.metadata_store is not None:
+                refresh_metadata(
+                    self.metadata_store,
+                    self.dataset_connectors,
+                    self.refresh_metadata_after,
+                    progress=self._progress,
+                )
+            run.state = "finished"
+            logger.info(f"Harvest {run.id} finished.")
+        except Exception as e:
+            run.state = "failed"
+            run.error = str(e)[:500]
+            logger.exception(f"Harvest {run.id} failed.")
+        run.finished_at = utcnow()
+        with Session(self.engine) as session:
+            session.merge(run)
+            session.commit()
+        self._update_status(state="waiting", last_run=run.to_dict(depth=0))
+
+    def _run_periodically(self):
+        wait = self.seconds_until_next_run()
+        while True:
+            next_run_at = utcnow() + datetime.timedelta(seconds=wait)
+            self._update_status(state="waiting", next_run_at=next_run_at)
+            if self._stop.wait(wait):
+                break
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Could not record the harvest in the database.")
+            wait = self.interval
+        self._update_status(state="stopped")
+
+    def start(self):
+        """Start harvesting in a background thread. Returns immediately."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run_periodically, name="harvester", daemon=True
+        )
+        self._thread.start()
+
+    def wait(self):
+        """Block until the background thread is stopped."""
+        while self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=1)
+
+    def stop(self, timeout: float | None = None):
+        """Stop the background thread. A run that is in progress is finished first."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Please refer to the README.")
+    parser.add_argument(
+        "--populate-mode",
+        default="sync",
+        choices=["only-if-empty", "sync"],
+        help="Determines how the database is populated, see the README.",
+    )
+    parser.add_argument(
+        "--populate-datasets",
+        default=[],
+        nargs="+",
+        choices=[n.name for n in NodeName if n in connectors.dataset_connectors],
+        help="Zero, one or more nodes with which the datasets should get populated.",
+    )
+    parser.add_argument(
+        "--populate-publications",
+        default=[],
+        nargs="+",
+        choices=[n.name for n in NodeName if n in connectors.publication_connectors],
+        help="Zero, one or more nodes with which the publications should get populated.",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Run the harvest once and exit, instead of periodically.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Run the harvester as a separate process."""
+    # Not on module level, to avoid circular imports
+    from main import _engine, _metadata_store, _resilient_dataset_connectors
+
+    logging_setup.configure_logging(config_section("logging"))
+    args = _parse_args()
+    harvest_config = config_section("harvest")
+    metadata_config = config_section("materialized_metadata")
+    engine = _engine(rebuild_db="no")
+    resilient_dataset_connectors = _resilient_dataset_connectors()
+    scheduler = HarvestScheduler(
+        engine,
+        dataset_connectors=[
+            resilient_dataset_connectors[NodeName(n)] for n in args.populate_datasets
+        ],
+        publication_connectors=[
+            connectors.publication_connectors[n] for n in args.populate_publications
+        ],
+        interval=harvest_config.get("interval_seconds", 86400),
+        mode=args.populate_mode,
+        metadata_store=_metadata_store(engine),
+        refresh_metadata_after=metadata_config.get("refresh_after_seconds", 86400),
+    )
+    if args.once:
+        scheduler.run_once()
+    else:
+        scheduler.start()
+        try:
+            scheduler.wait()
+        except KeyboardInterrupt:
+            scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Conditional GET support: ETags, If-None-Match and Cache-Control headers.
+
+An ETag identifies a version of a response body. It is derived from the data the body is built
+from (e.g., the row tuples of a list page, or the cached metadata of a connector), so that a
+request with a matching If-None-Match header can be answered with a 304 Not Modified before
+the body is serialized, or before the connector is called.
+"""
+import hashlib
+
+from config import config_section
+
+
+def etag(data: bytes | str) -> str:
+    """A (strong) ETag for a body derived from this data."""
+    if isinstance(data, str):
+        data = data.encode()
+    return '"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, current_etag: str) -> bool:
+    """Whether the If-None-Match header matches the ETag, using the weak comparison (RFC 9110)."""
+    if if_none_match is None:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == current_etag.removeprefix("W/"):
+            return True
+    return False
+
+
+def cache_control(route: str) -> str | None:
+    """The Cache-Control header of this route (the name of the endpoint function), as
+    configured in the [cache_control] section of the configuration file."""
+    return config_section("cache_control").get(route, None)
@@ -0,0 +1,99 @@
+"""
+Logging that does not block the requests, configured by the [logging] section of config.toml.
+
+Writing a log record to a stream takes a system call, and possibly has to wait for a slow
+terminal or log collector. Every logger therefore writes to a QueueHandler, which only puts the
+record on a queue, and a QueueListener writes the records to stderr from a thread of its own.
+
+SQL statements are not echoed by the engines (`echo=True` writes every statement synchronously,
+using a handler of its own). The level of the "sqlalchemy.engine" logger is set by `sql_echo`
+instead: "INFO" logs every statement, "DEBUG" also the rows, and "WARNING" neither.
+
+Statements taking longer than `slow_query_seconds` are logged by the "slow_query" logger (see
+log_slow_queries), as a JSON object with the duration, the statement, its bound parameters and
+the route template of the request that executed it.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+import typing
+
+from sqlalchemy import Engine, event
+
+from metrics import current_route
+
+FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+MAX_PARAMETERS_LENGTH = 1000
+
+slow_query_logger = logging.getLogger("slow_query")
+_listener = None  # type: logging.handlers.QueueListener | None
+
+
+def configure_logging(config: typing.Dict[str, typing.Any]) -> logging.handlers.QueueListener:
+    """Route the records of all loggers, including those of uvicorn, through a queue to stderr.
+    Calling it again replaces the previous configuration."""
+    global _listener
+    stop_logging()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(FORMAT))
+    log_queue = queue.SimpleQueue()  # type: queue.SimpleQueue
+    _listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, respect_handler_level=True
+    )
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(config.get("level", "INFO"))
+    for name in ("uvicorn", "uvicorn.access"):
+        # uvicorn writes to handlers of its own, on the thread of the event loop
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+    logging.getLogger("sqlalchemy.engine").setLevel(config.get("sql_echo", "WARNING"))
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def stop_logging():
+    """Write the records that are still queued, and stop the thread writing them."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_slow_queries(engine: Engine, config: typing.Dict[str, typing.Any]):
+    """
+    Log the statements of this engine that take at least `slow_query_seconds`, as configured by
+    the [logging] section.
+
+    Of the slow statements, the fraction `slow_query_sample_rate` is logged, to bound the volume
+    of the log while the database is overloaded. The bound parameters, which may contain personal
+    data, are only logged if `slow_query_parameters` is true, truncated to 1000 characters.
+    """
+    threshold = config.get("slow_query_seconds", 0.5)
+    sample_rate = config.get("slow_query_sample_rate", 1.0)
+    log_parameters = config.get("slow_query_parameters", False)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.slow_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context.slow_query_start
+        if duration < threshold or random.random() >= sample_rate:
+            return
+        entry = {
+            "duration_ms": round(duration * 1000, 3),
+            "route": current_route(),
+            "statement": statement,
+            "executemany": executemany,
+        }  # type: typing.Dict[str, typing.Any]
+        if log_parameters:
+            entry["parameters"] = repr(parameters)[:MAX_PARAMETERS_LENGTH]
+        slow_query_logger.warning(json.dumps(entry))
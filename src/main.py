@@ -5,23 +5,58 @@ Note: order matters for overloaded paths
 (https://fastapi.tiangolo.com/tutorial/path-params/#order-matters).
 """
 import argparse
-import tomllib
-import traceback
-from typing import Dict
+import asyncio
+import base64
+import json
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Sequence
 
+import prometheus_client
 import uvicorn
-from fastapi import Depends, FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import Body, Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST
 from pydantic import BaseModel
-from sqlalchemy import select, Engine, and_, delete, update
+from sqlalchemy import Select, select, Engine, and_, delete, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, class_mapper, selectinload
+from starlette.concurrency import run_in_threadpool
 
 import connectors
+import logging_setup
+import metrics
 import schemas
-from connectors import NodeName
-from database.models import DatasetDescription, Publication
-from database.setup import connect_to_database, populate_database
+from config import config_section
+from connectors import (
+    CachingDatasetConnector,
+    DatasetCache,
+    DatasetConnector,
+    NodeName,
+    ResilientDatasetConnector,
+    SingleFlightDatasetConnector,
+    http_session,
+    is_node_failure,
+    resilient_connectors,
+)
+from database.models import Base, DatasetDescription, Publication
+from database.bulk import bulk_link, bulk_write
+from database.materialized import MetadataStore, StoredMetadata, delete_metadata
+from database.search import search_query
+from database.setup import connect_to_database
+from harvester import HarvestScheduler
+from http_caching import cache_control, etag, etag_matches
+from response_formats import (
+    JSON,
+    NDJSON,
+    RowValues,
+    binary_formats,
+    encode_page,
+    encode_stream,
+    negotiate,
+)
+
+logger = logging.getLogger(__name__)
 
 
 def _parse_args() -> argparse.Namespace:
@@ -33,6 +68,13 @@ def _parse_args() -> argparse.Namespace:
         choices=["no", "only-if-empty", "always"],
         help="Determines if the database is recreated.",
     )
+    parser.add_argument(
+        "--populate-mode",
+        default="only-if-empty",
+        choices=["only-if-empty", "sync"],
+        help="Determines how the database is populated: only if it is empty, or by synchronizing "
+        "it with the nodes, upserting only the datasets and publications that are new or changed.",
+    )
     parser.add_argument(
         "--populate-datasets",
         default=[],
@@ -73,9 +115,7 @@ def _engine(rebuild_db: str) -> Engine:
     Return a SqlAlchemy engine, backed by the MySql connection as configured in the configuration
     file.
     """
-    with open("config.toml", "rb") as fh:
-        config = tomllib.load(fh)
-    db_config = config.get("database", {})
+    db_config = config_section("database")
     username = db_config.get("name", "root")
     password = db_config.get("password", "ok")
     host = db_config.get("host", "demodb")
@@ -85,7 +125,9 @@ def _engine(rebuild_db: str) -> Engine:
     db_url = f"mysql://{username}:{password}@{host}:{port}/{database}"
 
     delete_before_create = rebuild_db == "always"
-    return connect_to_database(db_url, delete_first=delete_before_create)
+    engine = connect_to_database(db_url, delete_first=delete_before_create)
+    logging_setup.log_slow_queries(engine, config_section("logging"))
+    return engine
 
 
 def _connector_from_node_name(connector_type: str, connector_dict: Dict, node_name: str):
@@ -105,7 +147,7 @@ def _connector_from_node_name(connector_type: str, connector_dict: Dict, node_na
     return connector
 
 
-def _retrieve_dataset(session, identifier, node=None) -> DatasetDescription:
+def _retrieve_dataset(session, identifier, node=None, options=()) -> DatasetDescription:
     if node is None:
         query = select(DatasetDescription).where(DatasetDescription.id == identifier)
     else:
@@ -115,7 +157,7 @@ def _retrieve_dataset(session, identifier, node=None) -> DatasetDescription:
                 DatasetDescription.node == node,
             )
         )
-    dataset = session.scalars(query).first()
+    dataset = session.scalars(query.options(*options)).first()
     if not dataset:
         if node is None:
             msg = f"Dataset '{identifier}' not found in the database."
@@ -125,8 +167,8 @@ def _retrieve_dataset(session, identifier, node=None) -> DatasetDescription:
     return dataset
 
 
-def _retrieve_publication(session, identifier) -> Publication:
-    query = select(Publication).where(Publication.id == identifier)
+def _retrieve_publication(session, identifier, options=()) -> Publication:
+    query = select(Publication).where(Publication.id == identifier).options(*options)
     publication = session.scalars(query).first()
     if not publication:
         raise HTTPException(
@@ -136,14 +178,15 @@ def _retrieve_publication(session, identifier) -> Publication:
     return publication
 
 
-def _wrap_as_http_exception(exception: Exception) -> HTTPException:
+def _wrap_as_http_exception(exception: BaseException) -> HTTPException:
     if isinstance(exception, HTTPException):
         return exception
 
     # This is an unexpected error. A mistake on our part. End users should not be informed about
     # details of problems they are not expected to fix, so we give a generic response and log the
     # error.
-    traceback.print_exc()
+    # Not necessarily called from an except block (see _batch_item), so pass the exception.
+    logger.error("Unexpected exception while processing a request.", exc_info=exception)
     return HTTPException(
         status_code=500,
         detail=(
@@ -152,8 +195,325 @@ def _wrap_as_http_exception(exception: Exception) -> HTTPException:
     )
 
 
-def add_routes(app: FastAPI, engine: Engine, url_prefix=""):
-    """Add routes to the FastAPI application"""
+def _expand(model: type, expand: list[str] | None, default: list[str] | None = None) -> list:
+    """The loader options that load the relationships to expand, with one query each.
+
+    Params
+    ------
+    expand, list[str] | None: relationship names, possibly comma-separated, as given in the
+        `expand` query parameter. If None, the default is used.
+    default, list[str] | None: relationship names to expand if the parameter is absent. If None,
+        all relationships are expanded.
+    """
+    relationships = [relationship.key for relationship in class_mapper(model).relationships]
+    if expand is None:
+        names = relationships if default is None else default
+    else:
+        names = [name for value in expand for name in value.split(",") if name]
+    unknown = [name for name in names if name not in relationships]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot expand {', '.join(unknown)}. Possible values: {relationships}",
+        )
+    return [selectinload(getattr(model, name)) for name in names]
+
+
+def _encode_cursor(last_id: int) -> str:
+    """An opaque cursor pointing just after the row with this primary key."""
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"]
+        if not isinstance(last_id, int):
+            raise ValueError
+        return last_id
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail=f"Invalid cursor '{cursor}'.")
+
+
+def _paginate(query: Select, id_column, pagination) -> Select:
+    """Order the query by primary key and select a single page.
+
+    With a cursor, the page starts after the last row of the previous page (keyset pagination),
+    which the database finds through the primary key index, instead of scanning and discarding
+    `offset` rows.
+    """
+    query = query.order_by(id_column).limit(pagination.limit)
+    if pagination.cursor is None:
+        return query.offset(pagination.offset)
+    if pagination.offset:
+        raise HTTPException(
+            status_code=400, detail="Use either offset or cursor pagination, not both."
+        )
+    return query.where(id_column > _decode_cursor(pagination.cursor))
+
+
+def _set_next_cursor(response: Response, rows: list[dict], pagination):
+    """Return the cursor of the next page in the X-Next-Cursor header, if there may be one."""
+    if rows and len(rows) == pagination.limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1]["id"])
+
+
+def _conditional_response(
+    request: Request, route: str, current_etag: str, content: Callable[[], Response]
+) -> Response:
+    """The response created by `content`, or a 304 Not Modified if the client already has the
+    version identified by the ETag. Both carry the ETag and the configured Cache-Control."""
+    headers = {"ETag": current_etag}
+    cache_control_header = cache_control(route)
+    if cache_control_header is not None:
+        headers["Cache-Control"] = cache_control_header
+    if etag_matches(request.headers.get("if-none-match", None), current_etag):
+        return Response(status_code=304, headers=headers)
+    response = content()
+    response.headers.update(headers)
+    return response
+
+
+def _row_values(instance: Base) -> tuple:
+    """The values of the columns of the instance, and of the instances of its loaded
+    relationships, as plain tuples. Changes whenever instance.to_dict(depth=1) changes, but is
+    cheaper to compute, so that it can identify the version of the instance (see ETag)."""
+    model = type(instance)
+    values = tuple(getattr(instance, name) for name in model.column_names())
+    loaded = instance.__dict__
+    related = tuple(
+        (
+            relationship.key,
+            [
+                tuple(getattr(item, name) for name in type(item).column_names())
+                for item in loaded[relationship.key]
+            ],
+        )
+        for relationship in model.__mapper__.relationships
+        if relationship.key in loaded
+    )
+    return values, related
+
+
+async def _dataset_meta_response(
+    request: Request,
+    route: str,
+    connector: DatasetConnector,
+    dataset: DatasetDescription,
+    metadata_store: MetadataStore | None = None,
+) -> Response:
+    """The metadata of the dataset, as fetched by the connector. If the connector caches the
+    metadata, a matching If-None-Match is answered without fetching or serializing it.
+
+    If a metadata_store is given, its document of the dataset is served while it is fresh (or
+    while the node is degraded), and the metadata is stored after fetching it.
+    """
+    stored = None
+    if metadata_store is not None:
+        stored = await run_in_threadpool(metadata_store.load, dataset.id)
+        if stored is not None and metadata_store.is_fresh(stored):
+            return _stored_metadata_response(request, route, stored)
+    try:
+        dataset_meta, current_etag = await connector.fetch_with_etag_async(dataset)
+    except Exception as e:
+        if stored is not None and is_node_failure(e):
+            return _stored_metadata_response(request, route, stored)
+        raise
+    if metadata_store is not None:
+        await run_in_threadpool(metadata_store.store, {dataset.id: dataset_meta})
+    return _conditional_response(
+        request,
+        route,
+        current_etag,
+        lambda: JSONResponse(jsonable_encoder(dataset_meta.dict())),
+    )
+
+
+def _stored_metadata_response(request: Request, route: str, stored: StoredMetadata) -> Response:
+    """The stored JSON of the metadata, served as is."""
+    return _conditional_response(
+        request,
+        route,
+        stored.etag,
+        lambda: Response(stored.json, media_type="application/json"),
+    )
+
+
+def _list_response(
+    session: Session,
+    model: type[DatasetDescription] | type[Publication],
+    conditions: list,
+    expand: list[str],
+    pagination,
+    request: Request,
+    route: str,
+) -> Response:
+    """Serialize a single page of the rows of this model that satisfy the conditions.
+
+    Without relationships to expand, only the columns are selected and each row tuple is
+    serialized directly, without the overhead of loading ORM instances. The response body is
+    only encoded if the client does not have this version of the page already (see ETag), in
+    the format that the Accept header prefers (see response_formats.py).
+    """
+    media_type = negotiate(request.headers.get("accept", None), [JSON] + binary_formats())
+    options = _expand(model, expand)
+    if options:
+        query = _paginate(select(model).where(*conditions), model.id, pagination)
+        tuples = None
+        rows = [item.to_dict(depth=1) for item in session.scalars(query.options(*options))]
+        current_etag = etag(media_type + repr(rows))
+    else:
+        names = model.column_names()
+        columns = [getattr(model, name) for name in names]
+        query = _paginate(select(*columns).where(*conditions), model.id, pagination)
+        tuples = session.execute(query).all()
+        current_etag = etag(media_type + repr(tuples))
+        rows = [dict(zip(names, row)) for row in tuples]
+    response = _conditional_response(
+        request,
+        route,
+        current_etag,
+        lambda: Response(encode_page(media_type, model, tuples, rows), media_type=media_type),
+    )
+    response.headers["Vary"] = "Accept"
+    _set_next_cursor(response, rows, pagination)
+    return response
+
+
+def _search_response(session: Session, model: type[Base], text: str, pagination) -> ORJSONResponse:
+    """Serialize a single page of the rows of this model that match the text, most relevant
+    first."""
+    if pagination.cursor is not None:
+        raise HTTPException(
+            status_code=400, detail="Search results are ranked, use offset pagination instead."
+        )
+    if not text.split():
+        return ORJSONResponse([])
+    query = search_query(session.get_bind().dialect.name, model, text)
+    query = query.offset(pagination.offset).limit(pagination.limit)
+    names = model.column_names()
+    return ORJSONResponse([dict(zip(names, row)) for row in session.execute(query)])
+
+
+def _export_partitions(
+    engine: Engine,
+    model: type[DatasetDescription] | type[Publication],
+    conditions: list,
+    yield_per: int,
+) -> Iterator[Sequence[RowValues]]:
+    """Yield the rows of this model that satisfy the conditions (the tuples of the columns, see
+    Base.column_names), in order of id.
+
+    The rows are fetched using a server-side cursor, `yield_per` rows at a time, so that the
+    memory use does not depend on the number of rows. Each batch of rows is yielded as a single
+    partition, which response_formats.encode_stream encodes as a single chunk.
+    """
+    columns = [getattr(model, name) for name in model.column_names()]
+    query = select(*columns).where(*conditions).order_by(model.id)
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=yield_per).execute(query)
+        yield from result.partitions()
+
+
+def _batch_item(identifier: int, result: Any) -> dict:
+    """An item of the response of the batch endpoint, for the retrieved metadata or the error."""
+    if isinstance(result, BaseException):
+        error = _wrap_as_http_exception(result)
+        return {
+            "identifier": identifier,
+            "error": {"status_code": error.status_code, "detail": error.detail},
+        }
+    return {"identifier": identifier, "dataset": result.dict()}
+
+
+def _check_bulk_size(*items: list):
+    max_items = config_section("batch").get("max_bulk_items", 10000)
+    if sum(len(i) for i in items) > max_items:
+        raise HTTPException(
+            status_code=400, detail=f"At most {max_items} items can be changed at once."
+        )
+
+
+def _check_ids(items: list):
+    """Raise an error if an item to update does not have an id"""
+    if any(item.id is None for item in items):
+        raise HTTPException(status_code=400, detail="Every item to update should have an id.")
+
+
+def _dataset_cache() -> DatasetCache | None:
+    """Return the DatasetCache as configured in the configuration file, or None if disabled."""
+    cache_config = config_section("cache")
+    if not cache_config.get("enabled", False):
+        return None
+    return DatasetCache.from_config(cache_config)
+
+
+def _metadata_store(engine: Engine) -> MetadataStore | None:
+    """Return the MetadataStore as configured in the configuration file, or None if disabled."""
+    store_config = config_section("materialized_metadata")
+    if not store_config.get("enabled", False):
+        return None
+    return MetadataStore.from_config(engine, store_config)
+
+
+def _resilient_dataset_connectors() -> Dict[NodeName, ResilientDatasetConnector]:
+    return resilient_connectors(connectors.dataset_connectors, config_section("resilience"))
+
+
+def add_routes(
+    app: FastAPI,
+    engine: Engine,
+    url_prefix="",
+    dataset_cache: DatasetCache | None = None,
+    harvest_scheduler: HarvestScheduler | None = None,
+    metadata_store: MetadataStore | None = None,
+    resilient_dataset_connectors: Dict[NodeName, ResilientDatasetConnector] | None = None,
+):
+    """Add routes to the FastAPI application.
+
+    If a dataset_cache is given, the metadata fetched by the dataset connectors is cached. If a
+    metadata_store is given, the detail endpoints of datasets serve its stored metadata while it
+    is fresh. If a harvest_scheduler is given, its status is reported by the /harvest endpoint.
+
+    Concurrent fetches of the same dataset (that is not cached) share a single call to the node,
+    and the calls to each node pass its circuit breaker (see connectors/resilience.py). Pass the
+    resilient_dataset_connectors to share the breakers with, e.g., the harvester. By default, the
+    connectors.dataset_connectors are wrapped by breakers of their own.
+
+    The latency of the requests and of the database are exported by the /metrics endpoint.
+    """
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_engine(engine)
+    if resilient_dataset_connectors is None:
+        resilient_dataset_connectors = _resilient_dataset_connectors()
+    resilient = resilient_dataset_connectors
+    dataset_connectors = dict(resilient)  # type: Dict[NodeName, DatasetConnector]
+    if dataset_cache is not None:
+        dataset_connectors = {
+            node: CachingDatasetConnector(connector, dataset_cache)
+            for node, connector in dataset_connectors.items()
+        }
+    dataset_connectors = {
+        node: SingleFlightDatasetConnector(connector)
+        for node, connector in dataset_connectors.items()
+    }
+
+    export_yield_per = config_section("export").get("yield_per", 1000)
+
+    def _retrieve_dataset_detached(identifier, node=None) -> DatasetDescription:
+        """Retrieve the dataset in a session of its own. Blocking, so used in a threadpool by the
+        async routes."""
+        with Session(engine) as session:
+            return _retrieve_dataset(session, identifier, node)
+
+    def _retrieve_datasets_detached(identifiers: List[int]) -> Dict[int, DatasetDescription]:
+        """Retrieve the datasets that exist, by identifier, in a single query."""
+        with Session(engine) as session:
+            query = select(DatasetDescription).where(DatasetDescription.id.in_(identifiers))
+            return {dataset.id: dataset for dataset in session.scalars(query)}
+
+    def _invalidate_cache(dataset: DatasetDescription):
+        if dataset_cache is not None:
+            dataset_cache.invalidate(dataset.node, dataset.node_specific_identifier)
 
     @app.get(url_prefix + "/", response_class=HTMLResponse)
     def home() -> str:
@@ -173,44 +533,140 @@ def add_routes(app: FastAPI, engine: Engine, url_prefix=""):
     # Multiple endpoints share the same set of parameters, we define a class for easy re-use of
     # dependencies:
     # https://fastapi.tiangolo.com/tutorial/dependencies/classes-as-dependencies/?h=depends#classes-as-dependencies # noqa
+    # Pass the X-Next-Cursor header of a response as cursor to retrieve the next page. Offset
+    # pagination is kept for backwards compatibility, but is slow for deep pages.
     class Pagination(BaseModel):
         offset: int = 0
         limit: int = 100
+        cursor: str | None = None
 
-    @app.get(url_prefix + "/datasets/")
+    @app.get(url_prefix + "/datasets/", response_class=ORJSONResponse)
     def list_datasets(
+        request: Request,
         pagination: Pagination = Depends(Pagination),
-    ) -> list[dict]:
+        expand: list[str] = Query(default=[]),
+    ) -> Response:
         """Lists all datasets registered with AIoD.
 
         Query Parameter
         ------
          * nodes, list[str], optional: if provided, list only datasets from the given node.
+         * expand, list[str], optional: relationships to include, e.g., "publications".
+
+        Use the Accept header to request MessagePack or an Arrow IPC stream instead of JSON.
         """
         # For additional information on querying through SQLAlchemy's ORM:
         # https://docs.sqlalchemy.org/en/20/orm/queryguide/index.html
         try:
             with Session(engine) as session:
-                query = select(DatasetDescription).offset(pagination.offset).limit(pagination.limit)
-                return [dataset.to_dict(depth=0) for dataset in session.scalars(query).all()]
+                return _list_response(
+                    session, DatasetDescription, [], expand, pagination, request, "list_datasets"
+                )
+        except Exception as e:
+            raise _wrap_as_http_exception(e)
+
+    # Declared before the endpoints of a single dataset, which would otherwise match this path
+    @app.get(url_prefix + "/datasets/export", response_class=StreamingResponse)
+    def export_datasets(
+        request: Request, nodes: list[str] = Query(default=[])
+    ) -> StreamingResponse:
+        """Export all datasets as newline-delimited JSON, one dataset per line. MessagePack or
+        an Arrow IPC stream can be requested using the Accept header instead.
+
+        Query Parameter
+        ------
+         * nodes, list[str], optional: if provided, export only datasets from the given nodes.
+        """
+        media_type = negotiate(request.headers.get("accept", None), [NDJSON] + binary_formats())
+        conditions = [DatasetDescription.node.in_(nodes)] if nodes else []
+        partitions = _export_partitions(engine, DatasetDescription, conditions, export_yield_per)
+        body = encode_stream(media_type, DatasetDescription, partitions)
+        return StreamingResponse(body, media_type=media_type)
+
+    @app.get(url_prefix + "/datasets/search", response_class=ORJSONResponse)
+    def search_datasets(
+        q: str = Query(min_length=1), pagination: Pagination = Depends(Pagination)
+    ) -> ORJSONResponse:
+        """Search datasets by name, most relevant first."""
+        try:
+            with Session(engine) as session:
+                return _search_response(session, DatasetDescription, q, pagination)
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
     @app.get(url_prefix + "/datasets/{identifier}")
-    def get_dataset(identifier: str) -> dict:
+    async def get_dataset(request: Request, identifier: str) -> Response:
         """Retrieve all meta-data for a specific dataset."""
         try:
-            with Session(engine) as session:
-                dataset = _retrieve_dataset(session, identifier)
+            dataset = await run_in_threadpool(_retrieve_dataset_detached, identifier)
             node = dataset.node
-            connector = connectors.dataset_connectors.get(node, None)
+            connector = dataset_connectors.get(node, None)
             if connector is None:
                 raise HTTPException(
                     status_code=501,
                     detail=f"No connector for node '{node}' available.",
                 )
-            dataset_meta = connector.fetch(dataset)
-            return dataset_meta.dict()
+            return await _dataset_meta_response(
+                request, "get_dataset", connector, dataset, metadata_store
+            )
+        except Exception as e:
+            raise _wrap_as_http_exception(e)
+
+    @app.post(url_prefix + "/datasets/batch")
+    async def get_datasets_batch(identifiers: List[int] = Body(...)) -> list[dict]:
+        """Retrieve all meta-data for many datasets at once.
+
+        The response contains an item per identifier, in the same order. Each item contains
+        either the meta-data of the dataset, or the error that occurred while retrieving it.
+        """
+        batch_config = config_section("batch")
+        max_identifiers = batch_config.get("max_identifiers", 500)
+        if len(identifiers) > max_identifiers:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {max_identifiers} identifiers can be retrieved at once.",
+            )
+        try:
+            unique_identifiers = list(dict.fromkeys(identifiers))
+            datasets = await run_in_threadpool(_retrieve_datasets_detached, unique_identifiers)
+            results = {}  # type: Dict[int, Any]
+            datasets_per_node = {}  # type: Dict[str, List[DatasetDescription]]
+            for identifier in unique_identifiers:
+                if identifier not in datasets:
+                    results[identifier] = HTTPException(
+                        status_code=404,
+                        detail=f"Dataset '{identifier}' not found in the database.",
+                    )
+                else:
+                    dataset = datasets[identifier]
+                    datasets_per_node.setdefault(dataset.node, []).append(dataset)
+
+            connectors_by_node = {node.value: c for node, c in dataset_connectors.items()}
+
+            async def fetch_node(node: str, node_datasets: List[DatasetDescription]) -> list:
+                connector = connectors_by_node.get(node, None)
+                if connector is None:
+                    error = HTTPException(
+                        status_code=501, detail=f"No connector for node '{node}' available."
+                    )
+                    return [error] * len(node_datasets)
+                try:
+                    return await connector.fetch_many_async(
+                        node_datasets, batch_config.get("concurrency", 16)
+                    )
+                except Exception as e:
+                    return [e] * len(node_datasets)
+
+            node_results = await asyncio.gather(
+                *(
+                    fetch_node(node, node_datasets)
+                    for node, node_datasets in datasets_per_node.items()
+                )
+            )
+            for node_datasets, fetched in zip(datasets_per_node.values(), node_results):
+                for dataset, result in zip(node_datasets, fetched):
+                    results[dataset.id] = result
+            return [_batch_item(identifier, results[identifier]) for identifier in identifiers]
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
@@ -219,39 +675,68 @@ def add_routes(app: FastAPI, engine: Engine, url_prefix=""):
         """Retrieve information about all known nodes"""
         return list(NodeName)
 
-    @app.get(url_prefix + "/nodes/{node}/datasets")
-    def get_node_datasets(node: str, pagination: Pagination = Depends(Pagination)) -> list[dict]:
+    @app.get(url_prefix + "/nodes/health")
+    def get_nodes_health() -> dict:
+        """Retrieve the state of the circuit breaker of each node: "closed" if the node is
+        healthy, "open" while calls to the node fail immediately, and "half_open" while a
+        trial call is made."""
+        return {node.value: connector.breaker.status() for node, connector in resilient.items()}
+
+    @app.get(url_prefix + "/metrics")
+    def get_metrics() -> Response:
+        """Retrieve the metrics of this worker, in the Prometheus text format."""
+        return Response(prometheus_client.generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+    @app.get(url_prefix + "/harvest")
+    def get_harvest_status() -> dict:
+        """Retrieve the progress of the harvester, which populates the database using the
+        connectors."""
+        if harvest_scheduler is None:
+            return {"state": "disabled"}
+        return harvest_scheduler.status()
+
+    @app.get(url_prefix + "/nodes/{node}/datasets", response_class=ORJSONResponse)
+    def get_node_datasets(
+        request: Request,
+        node: str,
+        pagination: Pagination = Depends(Pagination),
+        expand: list[str] = Query(default=[]),
+    ) -> Response:
         """Retrieve all meta-data of the datasets of a single node."""
         try:
             with Session(engine) as session:
-                query = (
-                    select(DatasetDescription)
-                    .where(DatasetDescription.node == node)
-                    .offset(pagination.offset)
-                    .limit(pagination.limit)
+                conditions = [DatasetDescription.node == node]
+                return _list_response(
+                    session,
+                    DatasetDescription,
+                    conditions,
+                    expand,
+                    pagination,
+                    request,
+                    "get_node_datasets",
                 )
-                return [dataset.to_dict(depth=0) for dataset in session.scalars(query).all()]
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
     @app.get(url_prefix + "/nodes/{node}/datasets/{identifier}")
-    def get_node_dataset(node: str, identifier: str) -> dict:
+    async def get_node_dataset(request: Request, node: str, identifier: str) -> Response:
         """Retrieve all meta-data for a specific dataset identified by the
         node-specific-identifier."""
         try:
-            connector = _connector_from_node_name("dataset", connectors.dataset_connectors, node)
-            with Session(engine) as session:
-                dataset = _retrieve_dataset(session, identifier, node)
-            dataset_meta = connector.fetch(dataset)
-            return dataset_meta.dict()
+            connector = _connector_from_node_name("dataset", dataset_connectors, node)
+            dataset = await run_in_threadpool(_retrieve_dataset_detached, identifier, node)
+            return await _dataset_meta_response(
+                request, "get_node_dataset", connector, dataset, metadata_store
+            )
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
-    @app.post(url_prefix + "/datasets/")
-    def register_dataset(dataset: schemas.Dataset) -> dict:
+    @app.post(url_prefix + "/datasets/", response_class=ORJSONResponse)
+    def register_dataset(dataset: schemas.Dataset) -> ORJSONResponse:
         """Register a dataset with AIoD."""
         try:
-            with Session(engine) as session:
+            # The new dataset is serialized after the commit, without reloading it
+            with Session(engine, expire_on_commit=False) as session:
                 new_dataset = DatasetDescription(
                     name=dataset.name,
                     node=dataset.node,
@@ -274,16 +759,55 @@ def add_routes(app: FastAPI, engine: Engine, url_prefix=""):
                         detail="There already exists a dataset with the same "
                         f"node and name, with id={existing_dataset.id}.",
                     )
-                return new_dataset.to_dict(depth=1)
+                _invalidate_cache(new_dataset)  # The node may have been asked for it before
+                return ORJSONResponse(new_dataset.to_dict(depth=1))
+        except Exception as e:
+            raise _wrap_as_http_exception(e)
+
+    @app.post(url_prefix + "/datasets/bulk", response_class=ORJSONResponse)
+    def bulk_datasets(changes: schemas.DatasetBulk) -> ORJSONResponse:
+        """Delete, update and create many datasets, in that order, in a single transaction.
+
+        The response contains the result of each item, by kind of change, in the same order as
+        the request: a status_code, and either the id of the dataset or the detail of the error.
+        """
+        try:
+            _check_bulk_size(changes.create, changes.update, changes.delete)
+            _check_ids(changes.update)
+            with Session(engine) as session:
+                results, changed_keys = bulk_write(
+                    session,
+                    DatasetDescription,
+                    create=[dataset.dict() for dataset in changes.create],
+                    update_=[dataset.dict() for dataset in changes.update],
+                    delete_=changes.delete,
+                )
+                try:
+                    session.commit()
+                except IntegrityError:
+                    session.rollback()
+                    raise HTTPException(
+                        status_code=409,
+                        detail="The datasets conflict with a concurrent change, please retry.",
+                    )
+            if dataset_cache is not None:
+                for node, node_specific_identifier in changed_keys:
+                    dataset_cache.invalidate(node, node_specific_identifier)
+            return ORJSONResponse(results)
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
-    @app.put(url_prefix + "/datasets/{identifier}")
-    def put_dataset(identifier: str, dataset: schemas.Dataset) -> dict:
+    @app.put(url_prefix + "/datasets/{identifier}", response_class=ORJSONResponse)
+    def put_dataset(
+        identifier: str, dataset: schemas.Dataset, expand: list[str] | None = Query(default=None)
+    ) -> ORJSONResponse:
         """Update an existing dataset."""
         try:
             with Session(engine) as session:
-                _retrieve_dataset(session, identifier)  # Raise error if dataset does not exist
+                # Raise error if dataset does not exist
+                existing_dataset = _retrieve_dataset(session, identifier)
+                _invalidate_cache(existing_dataset)
+                delete_metadata(session, [existing_dataset.id])
                 statement = (
                     update(DatasetDescription)
                     .values(
@@ -295,7 +819,11 @@ def add_routes(app: FastAPI, engine: Engine, url_prefix=""):
                 )
                 session.execute(statement)
                 session.commit()
-                return _retrieve_dataset(session, identifier).to_dict(depth=1)
+                updated_dataset = _retrieve_dataset(
+                    session, identifier, options=_expand(DatasetDescription, expand)
+                )
+                _invalidate_cache(updated_dataset)
+                return ORJSONResponse(updated_dataset.to_dict(depth=1))
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
@@ -303,7 +831,10 @@ def add_routes(app: FastAPI, engine: Engine, url_prefix=""):
     def delete_dataset(identifier: str):
         try:
             with Session(engine) as session:
-                _retrieve_dataset(session, identifier)  # Raise error if it does not exist
+                # Raise error if it does not exist
+                existing_dataset = _retrieve_dataset(session, identifier)
+                _invalidate_cache(existing_dataset)
+                delete_metadata(session, [existing_dataset.id])
 
                 statement = delete(DatasetDescription).where(DatasetDescription.id == identifier)
                 session.execute(statement)
@@ -311,44 +842,114 @@ def add_routes(app: FastAPI, engine: Engine, url_prefix=""):
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
-    @app.get(url_prefix + "/publications")
-    def list_publications(pagination: Pagination = Depends(Pagination)) -> list[dict]:
+    @app.get(url_prefix + "/publications", response_class=ORJSONResponse)
+    def list_publications(
+        request: Request,
+        pagination: Pagination = Depends(Pagination),
+        expand: list[str] = Query(default=[]),
+    ) -> Response:
         """Lists all publications registered with AIoD."""
         try:
             with Session(engine) as session:
-                return [
-                    publication.to_dict(depth=0)
-                    for publication in session.scalars(
-                        select(Publication).offset(pagination.offset).limit(pagination.limit)
-                    ).all()
-                ]
+                return _list_response(
+                    session, Publication, [], expand, pagination, request, "list_publications"
+                )
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
-    @app.post(url_prefix + "/publications")
-    def register_publication(publication: schemas.Publication) -> dict:
+    @app.post(url_prefix + "/publications", response_class=ORJSONResponse)
+    def register_publication(publication: schemas.Publication) -> ORJSONResponse:
         """Add a publication."""
         try:
-            with Session(engine) as session:
+            # The new publication is serialized after the commit, without reloading it
+            with Session(engine, expire_on_commit=False) as session:
                 new_publication = Publication(title=publication.title, url=publication.url)
                 session.add(new_publication)
                 session.commit()
-                return new_publication.to_dict(depth=1)
+                return ORJSONResponse(new_publication.to_dict(depth=1))
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
-    @app.get(url_prefix + "/publications/{identifier}")
-    def get_publication(identifier: str) -> dict:
-        """Retrieves all information for a specific publication registered with AIoD."""
+    @app.post(url_prefix + "/publications/bulk", response_class=ORJSONResponse)
+    def bulk_publications(changes: schemas.PublicationBulk) -> ORJSONResponse:
+        """Delete, update and create many publications, in that order, in a single transaction.
+
+        The response contains the result of each item, by kind of change, in the same order as
+        the request: a status_code, and either the id of the publication or the detail of the
+        error.
+        """
+        try:
+            _check_bulk_size(changes.create, changes.update, changes.delete)
+            _check_ids(changes.update)
+            with Session(engine) as session:
+                results, _ = bulk_write(
+                    session,
+                    Publication,
+                    create=[publication.dict() for publication in changes.create],
+                    update_=[publication.dict() for publication in changes.update],
+                    delete_=changes.delete,
+                )
+                try:
+                    session.commit()
+                except IntegrityError:
+                    session.rollback()
+                    raise HTTPException(
+                        status_code=409,
+                        detail="The publications conflict with a concurrent change, please retry.",
+                    )
+            return ORJSONResponse(results)
+        except Exception as e:
+            raise _wrap_as_http_exception(e)
+
+    @app.get(url_prefix + "/publications/search", response_class=ORJSONResponse)
+    def search_publications(
+        q: str = Query(min_length=1), pagination: Pagination = Depends(Pagination)
+    ) -> ORJSONResponse:
+        """Search publications by title, most relevant first."""
+        try:
+            with Session(engine) as session:
+                return _search_response(session, Publication, q, pagination)
+        except Exception as e:
+            raise _wrap_as_http_exception(e)
+
+    @app.get(url_prefix + "/publications/export", response_class=StreamingResponse)
+    def export_publications(request: Request) -> StreamingResponse:
+        """Export all publications as newline-delimited JSON, one publication per line.
+        MessagePack or an Arrow IPC stream can be requested using the Accept header instead."""
+        media_type = negotiate(request.headers.get("accept", None), [NDJSON] + binary_formats())
+        partitions = _export_partitions(engine, Publication, [], export_yield_per)
+        body = encode_stream(media_type, Publication, partitions)
+        return StreamingResponse(body, media_type=media_type)
+
+    @app.get(url_prefix + "/publications/{identifier}", response_class=ORJSONResponse)
+    def get_publication(
+        request: Request, identifier: str, expand: list[str] | None = Query(default=None)
+    ) -> Response:
+        """Retrieves all information for a specific publication registered with AIoD.
+
+        All relationships are included, unless specific relationships are given to expand (an
+        empty `expand=` includes none).
+        """
         try:
             with Session(engine) as session:
-                publication = _retrieve_publication(session, identifier)
-                return publication.to_dict(depth=1)
+                publication = _retrieve_publication(
+                    session, identifier, options=_expand(Publication, expand)
+                )
+                return _conditional_response(
+                    request,
+                    "get_publication",
+                    etag(repr(_row_values(publication))),
+                    lambda: ORJSONResponse(publication.to_dict(depth=1)),
+                )
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
-    @app.put(url_prefix + "/publications/{identifier}")
-    def update_publication(identifier: str, publication: schemas.Publication) -> dict:
+    @app.put(url_prefix + "/publications/{identifier}", response_class=ORJSONResponse)
+    def update_publication(
+        identifier: str,
+        publication: schemas.Publication,
+        expand: list[str] | None = Query(default=None),
+    ) -> ORJSONResponse:
         """Update this publication"""
         try:
             with Session(engine) as session:
@@ -363,7 +964,10 @@ def add_routes(app: FastAPI, engine: Engine, url_prefix=""):
                 )
                 session.execute(statement)
                 session.commit()
-                return _retrieve_publication(session, identifier).to_dict(depth=1)
+                updated_publication = _retrieve_publication(
+                    session, identifier, options=_expand(Publication, expand)
+                )
+                return ORJSONResponse(updated_publication.to_dict(depth=1))
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
@@ -380,13 +984,48 @@ def add_routes(app: FastAPI, engine: Engine, url_prefix=""):
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
-    @app.get(url_prefix + "/datasets/{identifier}/publications")
-    def list_publications_related_to_dataset(identifier: str) -> list[dict]:
+    @app.get(url_prefix + "/datasets/{identifier}/publications", response_class=ORJSONResponse)
+    def list_publications_related_to_dataset(identifier: str) -> ORJSONResponse:
         """Lists all publications registered with AIoD that use this dataset."""
         try:
             with Session(engine) as session:
-                dataset = _retrieve_dataset(session, identifier)
-                return [publication.to_dict(depth=0) for publication in dataset.publications]
+                dataset = _retrieve_dataset(
+                    session, identifier, options=[selectinload(DatasetDescription.publications)]
+                )
+                return ORJSONResponse(
+                    [publication.to_dict(depth=0) for publication in dataset.publications]
+                )
+        except Exception as e:
+            raise _wrap_as_http_exception(e)
+
+    # Declared before the endpoints of a single link, which would otherwise match this path
+    @app.post(url_prefix + "/datasets/publications/bulk", response_class=ORJSONResponse)
+    def bulk_link_publications_to_datasets(
+        changes: schemas.DatasetPublicationBulk,
+    ) -> ORJSONResponse:
+        """Remove and add many links between datasets and publications, in that order, in a single
+        transaction.
+
+        The response contains the result of each item, by kind of change, in the same order as
+        the request: a status_code, and possibly the detail of the error.
+        """
+        try:
+            _check_bulk_size(changes.link, changes.unlink)
+            with Session(engine) as session:
+                results = bulk_link(
+                    session,
+                    link=[(item.dataset_id, item.publication_id) for item in changes.link],
+                    unlink=[(item.dataset_id, item.publication_id) for item in changes.unlink],
+                )
+                try:
+                    session.commit()
+                except IntegrityError:
+                    session.rollback()
+                    raise HTTPException(
+                        status_code=409,
+                        detail="The links conflict with a concurrent change, please retry.",
+                    )
+            return ORJSONResponse(results)
         except Exception as e:
             raise _wrap_as_http_exception(e)
 
@@ -427,11 +1066,14 @@ def add_routes(app: FastAPI, engine: Engine, url_prefix=""):
 
 def create_app() -> FastAPI:
     """Create the FastAPI application, complete with routes."""
+    logging_setup.configure_logging(config_section("logging"))
     app = FastAPI()
     args = _parse_args()
 
+    # The API and the harvester share the breakers and rate limits of the nodes
+    resilient_dataset_connectors = _resilient_dataset_connectors()
     dataset_connectors = [
-        _connector_from_node_name("dataset", connectors.dataset_connectors, node_name)
+        _connector_from_node_name("dataset", resilient_dataset_connectors, node_name)
         for node_name in args.populate_datasets
     ]
     publication_connectors = [
@@ -439,16 +1081,37 @@ def create_app() -> FastAPI:
         for node_name in args.populate_publications
     ]
     engine = _engine(args.rebuild_db)
+    metadata_store = _metadata_store(engine)
+    harvest_scheduler = None
     if len(dataset_connectors) + len(publication_connectors) > 0:
-        populate_database(
+        # Harvesting runs in the background, so that the API starts serving the current contents
+        # of the database immediately.
+        harvest_scheduler = HarvestScheduler(
             engine,
             dataset_connectors=dataset_connectors,
-            publications_connectors=publication_connectors,
-            only_if_empty=True,
+            publication_connectors=publication_connectors,
+            interval=config_section("harvest").get("interval_seconds", 86400),
+            mode=args.populate_mode,
             limit_datasets=args.limit_number_of_datasets,
             limit_publications=args.limit_number_of_publications,
+            metadata_store=metadata_store,
+            refresh_metadata_after=config_section("materialized_metadata").get(
+                "refresh_after_seconds", 86400
+            ),
         )
-    add_routes(app, engine, url_prefix=args.url_prefix)
+        app.add_event_handler("startup", harvest_scheduler.start)
+        app.add_event_handler("shutdown", harvest_scheduler.stop)
+    add_routes(
+        app,
+        engine,
+        url_prefix=args.url_prefix,
+        dataset_cache=_dataset_cache(),
+        harvest_scheduler=harvest_scheduler,
+        metadata_store=metadata_store,
+        resilient_dataset_connectors=resilient_dataset_connectors,
+    )
+    app.add_event_handler("shutdown", http_session.close_async_client)
+    app.add_event_handler("shutdown", logging_setup.stop_logging)
     return app
 
 
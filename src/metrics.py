@@ -0,0 +1,225 @@
+"""
+Prometheus metrics, exported in the text format by the /metrics endpoint.
+
+ * the latency of the requests to the API, per route template (see MetricsMiddleware);
+ * the latency, status codes and errors of the requests to the nodes, per node and endpoint of
+   the node (see connectors/http_session.py);
+ * the time waiting for a connection of the database pool, the size of the pool and its
+   overflow, and the duration of the SQL statements (see instrument_engine);
+ * the lookups in the DatasetCache, per node and result (see connectors/cache.py). The hit ratio
+   is, e.g., `rate(dataset_cache_lookups_total{result="hit"}[5m])` divided by the rate of all
+   lookups.
+
+The metrics are kept per process. When the API runs with multiple workers, each worker exports
+its own metrics.
+"""
+import contextvars
+import re
+import time
+import typing
+import urllib.parse
+import weakref
+
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import Engine, Pool, event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Latency of the requests to the API, per route template.",
+    ["method", "route", "status_code"],
+)
+upstream_request_duration = Histogram(
+    "upstream_request_duration_seconds",
+    "Latency of the requests to the nodes, including retries.",
+    ["node", "endpoint"],
+)
+upstream_responses = Counter(
+    "upstream_responses_total",
+    "Responses of the nodes, per status code.",
+    ["node", "endpoint", "status_code"],
+)
+upstream_errors = Counter(
+    "upstream_errors_total",
+    "Requests to the nodes that did not result in a response, e.g., because of a timeout.",
+    ["node", "endpoint", "error"],
+)
+pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time waiting for a connection of the database pool.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
+statement_duration = Histogram(
+    "db_statement_duration_seconds",
+    "Duration of the SQL statements, per operation (SELECT, INSERT, ...).",
+    ["operation"],
+)
+dataset_cache_lookups = Counter(
+    "dataset_cache_lookups_total",
+    'Lookups in the DatasetCache, per result: "hit", "miss" or "not_found" (a cached 404).',
+    ["node", "result"],
+)
+dataset_cache_stale = Counter(
+    "dataset_cache_stale_total",
+    "Misses served from an expired entry of the DatasetCache, because the node is degraded.",
+    ["node"],
+)
+
+# The scope of the request that is being handled, if any (see MetricsMiddleware)
+_current_scope = contextvars.ContextVar(
+    "current_scope", default=None
+)  # type: contextvars.ContextVar[Scope | None]
+# The route template of each endpoint (see _route_template)
+_route_templates = (
+    weakref.WeakKeyDictionary()
+)  # type: weakref.WeakKeyDictionary[typing.Callable, str]
+
+# The base URLs of the nodes, by node name, so that requests are labelled with their node
+_node_urls = {}  # type: typing.Dict[str, str]
+_IDENTIFIER_SEGMENT = re.compile(r"^[0-9][0-9,]*$")
+
+
+def register_node_url(node: str, base_url: str):
+    """Label the requests to URLs starting with this base URL with this node."""
+    _node_urls[node] = base_url
+
+
+def upstream_labels(url: str) -> typing.Tuple[str, str]:
+    """The (node, endpoint) of a request to a node. Segments of the path that are identifiers
+    (e.g., "/data/61" or "/data_id/1,2,3") are replaced by "{id}", so that the number of
+    endpoints is bounded. Nodes that are not registered are labelled with their host."""
+    split_url = urllib.parse.urlsplit(url)
+    node, path = split_url.netloc, split_url.path
+    for name, base_url in _node_urls.items():
+        if url.startswith(base_url):
+            node, path = name, urllib.parse.urlsplit(url.removeprefix(base_url)).path
+            break
+    segments = ["{id}" if _IDENTIFIER_SEGMENT.match(s) else s for s in path.split("/")]
+    return node, "/".join(segments)
+
+
+class MetricsMiddleware:
+    """Observes the latency of every request (until its response is sent), labelled with the
+    template of its route (e.g., "/datasets/{identifier}") rather than its path, so that the
+    number of labels is bounded. The template is also available to the code handling the request,
+    as current_route().
+
+    A plain ASGI middleware, so that the response (e.g., a streaming export) is passed on as is.
+    The route is not matched again: the router stores the endpoint of the matched route in the
+    scope, whose template is looked up once per endpoint."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_scope.reset(token)
+            request_duration.labels(
+                scope["method"], _route_template(scope), str(status_code)
+            ).observe(time.perf_counter() - start)
+
+
+def current_route() -> str | None:
+    """The route template of the request that is being handled, if any."""
+    scope = _current_scope.get()
+    return None if scope is None else _route_template(scope)
+
+
+def _route_template(scope: Scope) -> str:
+    """The template of the route that the router matched, or "unmatched"."""
+    endpoint = scope.get("endpoint", None)
+    if endpoint is None:
+        return "unmatched"
+    template = _route_templates.get(endpoint, None)
+    if template is None:
+        for route in scope["app"].router.routes:
+            if getattr(route, "endpoint", None) is not None and hasattr(route, "path"):
+                _route_templates.setdefault(route.endpoint, route.path)
+        template = _route_templates.setdefault(endpoint, "unmatched")
+    return template
+
+
+class _PoolCollector:
+    """Reports the size, checked out connections and overflow of the pools of the instrumented
+    engines, when the metrics are collected."""
+
+    def __init__(self):
+        self.engines = weakref.WeakValueDictionary()  # type: weakref.WeakValueDictionary
+
+    def collect(self):
+        gauges = {
+            name: GaugeMetricFamily(f"db_pool_{name}", description, labels=["database"])
+            for name, description in [
+                ("size", "Number of connections the pool keeps."),
+                ("checked_out", "Number of connections in use."),
+                ("overflow", "Number of connections beyond the size of the pool."),
+            ]
+        }
+        for database, engine in list(self.engines.items()):
+            pool = engine.pool
+            if not hasattr(pool, "overflow"):  # E.g., a NullPool
+                continue
+            gauges["size"].add_metric([database], pool.size())
+            gauges["checked_out"].add_metric([database], pool.checkedout())
+            gauges["overflow"].add_metric([database], max(0, pool.overflow()))
+        yield from gauges.values()
+
+
+_pool_collector = _PoolCollector()
+REGISTRY.register(_pool_collector)
+_instrumented_engines = weakref.WeakSet()  # type: weakref.WeakSet[Engine]
+
+
+def _time_checkouts(pool: Pool):
+    """Observe the time that getting a connection from the pool takes, including the time
+    waiting for one to be returned. The pool offers no event before a checkout, so its (public)
+    connect method, which the engine calls to get a connection, is wrapped instead."""
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - start)
+
+    pool.connect = timed_connect  # type: ignore[method-assign]
+
+
+def instrument_engine(engine: Engine):
+    """Observe the checkouts of the pool and the statements of this engine."""
+    if engine in _instrumented_engines:
+        return
+    _instrumented_engines.add(engine)
+    _pool_collector.engines[str(engine.url.database)] = engine
+
+    _time_checkouts(engine.pool)
+
+    @event.listens_for(engine, "engine_disposed")
+    def engine_disposed(engine):
+        _time_checkouts(engine.pool)  # Disposing replaces the pool by a new one
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        operation = statement.split(None, 1)[0].upper() if statement.strip() else ""
+        statement_duration.labels(operation).observe(time.perf_counter() - context.metrics_start)
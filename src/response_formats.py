@@ -0,0 +1,178 @@
+"""
+Binary response formats for the list and export endpoints, chosen using the Accept header.
+
+Besides JSON, rows can be returned as MessagePack or as an Arrow IPC stream. Arrow is columnar:
+the row tuples of a query are transposed into a record batch, with a schema derived from the
+column types of the model, so that clients can load them into a dataframe without parsing.
+
+Both libraries are optional (`pip install .[formats]`). A format whose library is not installed
+is not offered, so that requesting only that format results in a 406 Not Acceptable.
+"""
+import datetime
+import io
+import typing
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+import orjson
+from fastapi import HTTPException
+
+from database.models import Base
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# The values of the columns of a row, e.g., a tuple or a sqlalchemy Row
+RowValues = Sequence[Any]
+
+# Other names that clients use for the same formats
+_ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.apache.arrow.stream+ipc": ARROW}
+
+
+def binary_formats() -> List[str]:
+    """The binary formats whose library is installed."""
+    formats = []
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    if pyarrow is not None:
+        formats.append(ARROW)
+    return formats
+
+
+def negotiate(accept: str | None, offered: List[str]) -> str:
+    """The offered media type that the Accept header prefers, the first one if there is no
+    preference. Raises a 406 if none of the offered media types is acceptable."""
+    if accept is None or not accept.strip():
+        return offered[0]
+    best, best_quality = None, 0.0
+    for media_range in accept.split(","):
+        media_type, *params = (part.strip() for part in media_range.split(";"))
+        media_type = _ALIASES.get(media_type.lower(), media_type.lower())
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        for candidate in offered:
+            if _matches(media_type, candidate) and quality > best_quality:
+                best, best_quality = candidate, quality
+                break
+    if best is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"None of the requested media types is available. Possible values: {offered}",
+        )
+    return best
+
+
+def _matches(media_range: str, media_type: str) -> bool:
+    if media_range in ("*/*", media_type):
+        return True
+    return media_range.endswith("/*") and media_type.startswith(media_range[:-1])
+
+
+def encode_page(
+    media_type: str,
+    model: typing.Type[Base],
+    rows: Sequence[RowValues] | None,
+    dicts: List[Dict[str, Any]],
+) -> bytes:
+    """The body of a page of rows of this model. The rows are the tuples of the columns (see
+    Base.column_names), or None if the dicts contain relationships as well."""
+    if media_type == MSGPACK:
+        return msgpack.packb(dicts)
+    if media_type == ARROW:
+        schema = arrow_schema(model)
+        if rows is not None:
+            table = pyarrow.Table.from_batches([arrow_batch(schema, rows)], schema=schema)
+        elif dicts:
+            table = pyarrow.Table.from_pylist(dicts)
+        else:
+            table = schema.empty_table()
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return orjson.dumps(dicts)
+
+
+def encode_stream(
+    media_type: str, model: typing.Type[Base], partitions: Iterable[Sequence[RowValues]]
+) -> Iterator[bytes]:
+    """The body of an export, a chunk per partition of the rows of this model (the tuples of the
+    columns). NDJSON and MessagePack contain an object per row, Arrow a record batch per
+    partition."""
+    names = model.column_names()
+    if media_type == ARROW:
+        yield from _arrow_stream(arrow_schema(model), partitions)
+    elif media_type == MSGPACK:
+        packer = msgpack.Packer()
+        for rows in partitions:
+            yield b"".join(packer.pack(dict(zip(names, row))) for row in rows)
+    else:
+        for rows in partitions:
+            yield b"".join(orjson.dumps(dict(zip(names, row))) + b"\n" for row in rows)
+
+
+def arrow_schema(model: typing.Type[Base]) -> "pyarrow.Schema":
+    """The Arrow schema of the columns of this model, in the order of Base.column_names."""
+    table = model.__table__  # type: ignore
+    return pyarrow.schema(
+        [
+            pyarrow.field(name, _arrow_type(table.c[name].type.python_type))
+            for name in model.column_names()
+        ]
+    )
+
+
+def _arrow_type(python_type: type) -> "pyarrow.DataType":
+    arrow_types = {
+        bool: pyarrow.bool_(),
+        int: pyarrow.int64(),
+        float: pyarrow.float64(),
+        str: pyarrow.string(),
+        datetime.datetime: pyarrow.timestamp("us"),
+    }
+    return arrow_types[python_type]
+
+
+def arrow_batch(schema: "pyarrow.Schema", rows: Sequence[RowValues]) -> "pyarrow.RecordBatch":
+    """A record batch of the row tuples, transposed into columns."""
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    return pyarrow.record_batch(
+        [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def _arrow_stream(
+    schema: "pyarrow.Schema", partitions: Iterable[Sequence[RowValues]]
+) -> Iterator[bytes]:
+    """An Arrow IPC stream of a record batch per partition, yielded as soon as it is written."""
+    sink = io.BytesIO()
+
+    def drain() -> bytes:
+        chunk = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return chunk
+
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        for rows in partitions:
+            writer.write_batch(arrow_batch(schema, rows))
+            yield drain()
+    yield drain()  # The schema of an empty stream, and the end-of-stream marker
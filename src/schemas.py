@@ -18,3 +18,31 @@ class Publication(BaseModel):
     title: str = Field(max_length=250)
     url: str = Field(max_length=250)
     id: int | None
+
+
+class DatasetBulk(BaseModel):
+    """Datasets to create, update (identified by their id) and delete at once."""
+
+    create: list[Dataset] = []
+    update: list[Dataset] = []
+    delete: list[int] = []
+
+
+class PublicationBulk(BaseModel):
+    """Publications to create, update (identified by their id) and delete at once."""
+
+    create: list[Publication] = []
+    update: list[Publication] = []
+    delete: list[int] = []
+
+
+class DatasetPublicationLink(BaseModel):
+    dataset_id: int
+    publication_id: int
+
+
+class DatasetPublicationBulk(BaseModel):
+    """Links between datasets and publications to add and remove at once."""
+
+    link: list[DatasetPublicationLink] = []
+    unlink: list[DatasetPublicationLink] = []
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import pickle
+import sqlite3
+import threading
+import typing  # noqa:F401 (flake8 raises incorrect 'Module imported but unused' error)
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from pydantic_schemaorg.Dataset import Dataset
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from connectors import CachingDatasetConnector, DatasetCache, ExampleDatasetConnector, NodeName
+from connectors.cache import CachedNotFound
+from database.models import DatasetDescription
+from main import add_routes
+
+
+class CountingDatasetConnector(ExampleDatasetConnector):
+    """Counts the number of calls to fetch"""
+
+    node_name = NodeName.example
+
+    def __init__(self):
+        self.n_fetches = 0
+
+    def fetch(self, dataset: DatasetDescription) -> Dataset:
+        self.n_fetches += 1
+        if dataset.node_specific_identifier == "missing":
+            raise HTTPException(status_code=404, detail="Not found on the node")
+        if dataset.node_specific_identifier == "error":
+            raise HTTPException(status_code=502, detail="Node unavailable")
+        return super().fetch(dataset)
+
+
+class Clock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+def _dataset(identifier: str) -> DatasetDescription:
+    return DatasetDescription(name="dset", node="example", node_specific_identifier=identifier)
+
+
+def test_caching_connector_fetches_once():
+    inner = CountingDatasetConnector()
+    connector = CachingDatasetConnector(inner, DatasetCache())
+    first = connector.fetch(_dataset("1"))
+    second = connector.fetch(_dataset("1"))
+    assert first == second
+    assert inner.n_fetches == 1
+    connector.fetch(_dataset("2"))
+    assert inner.n_fetches == 2
+    assert connector.node_name == inner.node_name
+
+
+def test_ttl_per_node():
+    clock = Clock()
+    cache = DatasetCache(ttl=10, ttl_per_node={"openml": 100}, clock=clock)
+    cache.put("example", "1", "value example")
+    cache.put("openml", "1", "value openml")
+    clock.time += 50
+    assert cache.get("example", "1") is None
+    assert cache.get("openml", "1") == "value openml"
+    clock.time += 50
+    assert cache.get("openml", "1") is None
+
+
+def test_lru_eviction():
+    cache = DatasetCache(max_size=2)
+    cache.put("example", "1", 1)
+    cache.put("example", "2", 2)
+    cache.get("example", "1")  # 2 is now the least recently used
+    cache.put("example", "3", 3)
+    assert cache.get("example", "1") == 1
+    assert cache.get("example", "2") is None
+    assert cache.get("example", "3") == 3
+
+
+def test_disk_tier_is_shared(tmp_path):
+    inner = CountingDatasetConnector()
+    worker_1 = CachingDatasetConnector(inner, DatasetCache(directory=tmp_path))
+    worker_2 = CachingDatasetConnector(inner, DatasetCache(directory=tmp_path))
+    expected = worker_1.fetch(_dataset("1"))
+    assert worker_2.fetch(_dataset("1")) == expected
+    assert inner.n_fetches == 1
+
+    worker_1.cache.invalidate("example", "1")
+    worker_2.cache.memory.invalidate(("example", "1"))
+    worker_2.fetch(_dataset("1"))
+    assert inner.n_fetches == 2
+
+
+def test_put_dataset_invalidates(engine: Engine):
+    app = FastAPI()
+    add_routes(app, engine, dataset_cache=DatasetCache())
+    client = TestClient(app)
+    with Session(engine) as session:
+        session.add(_dataset("1"))
+        session.commit()
+
+    assert client.get("/datasets/1").json()["name"] == "dset"
+    body = {
+        "name": "new name",
+        "node": "example",
+        "node_specific_identifier": "1",
+    }  # type: typing.Dict[str, typing.Any]
+    assert client.put("/datasets/1", json=body).status_code == 200
+    assert client.get("/datasets/1").json()["name"] == "new name"
+
+
+def test_fetch_many_serves_cached_datasets():
+    inner = CountingDatasetConnector()
+    connector = CachingDatasetConnector(inner, DatasetCache())
+    first = connector.fetch(_dataset("1"))
+    results = asyncio.run(connector.fetch_many_async([_dataset("1"), _dataset("2")]))
+    assert results[0] == first
+    assert results[1] == connector.fetch(_dataset("2"))
+    assert inner.n_fetches == 2
+
+
+def test_not_found_is_cached_with_negative_ttl():
+    clock = Clock()
+    inner = CountingDatasetConnector()
+    connector = CachingDatasetConnector(inner, DatasetCache(ttl=100, negative_ttl=10, clock=clock))
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            connector.fetch(_dataset("missing"))
+        assert exc_info.value.status_code == 404
+        assert exc_info.value.detail == "Not found on the node"
+    with pytest.raises(HTTPException):
+        asyncio.run(connector.fetch_async(_dataset("missing")))
+    assert inner.n_fetches == 1
+    assert isinstance(connector.cache.get("example", "missing"), CachedNotFound)
+    clock.time += 10
+    with pytest.raises(HTTPException):
+        connector.fetch(_dataset("missing"))
+    assert inner.n_fetches == 2
+
+
+def test_other_errors_are_not_cached():
+    inner = CountingDatasetConnector()
+    connector = CachingDatasetConnector(inner, DatasetCache())
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            connector.fetch(_dataset("error"))
+    assert inner.n_fetches == 2
+
+
+def test_fetch_many_serves_cached_not_found():
+    inner = CountingDatasetConnector()
+    connector = CachingDatasetConnector(inner, DatasetCache())
+    datasets = [_dataset("missing"), _dataset("1")]
+    for _ in range(2):
+        results = asyncio.run(connector.fetch_many_async(datasets))
+        assert isinstance(results[0], HTTPException) and results[0].status_code == 404
+        assert results[1].name == "dset"
+    assert inner.n_fetches == 2
+
+
+def test_disk_tier_is_not_used_on_the_event_loop(tmp_path, monkeypatch):
+    inner = CountingDatasetConnector()
+    connector = CachingDatasetConnector(inner, DatasetCache(directory=tmp_path))
+    disk = connector.cache.disk
+    assert disk is not None
+    threads = set()
+    for method in ("get", "put"):
+
+        def record(*args, _original=getattr(disk, method)):
+            threads.add(threading.get_ident())
+            return _original(*args)
+
+        monkeypatch.setattr(disk, method, record)
+
+    async def fetch():
+        await connector.fetch_async(_dataset("1"))
+        await connector.fetch_many_async([_dataset("2"), _dataset("missing")])
+        connector.cache.memory.invalidate(("example", "1"))
+        return await connector.fetch_async(_dataset("1"))
+
+    assert asyncio.run(fetch()).name == "dset"
+    assert inner.n_fetches == 3
+    assert threads and threading.get_ident() not in threads
+
+
+def test_disk_tier_stores_json(tmp_path):
+    directory = tmp_path / "cache"
+    inner = CountingDatasetConnector()
+    connector = CachingDatasetConnector(inner, DatasetCache(directory=directory))
+    expected = connector.fetch(_dataset("1"))
+    with pytest.raises(HTTPException):
+        connector.fetch(_dataset("missing"))
+    assert (directory.stat().st_mode & 0o777) == 0o700
+    assert ((directory / "cache.db").stat().st_mode & 0o777) == 0o600
+
+    with sqlite3.connect(directory / "cache.db") as connection:
+        values = dict(connection.execute("SELECT identifier, value FROM entries"))
+        assert json.loads(values["1"])["dataset"] == expected.json()
+        assert json.loads(values["missing"])["not_found"] == "Not found on the node"
+        connection.execute(
+            "INSERT INTO entries VALUES ('example', '2', ?, 1e12)", (pickle.dumps("old"),)
+        )
+
+    other_worker = CachingDatasetConnector(inner, DatasetCache(directory=directory))
+    assert other_worker.fetch(_dataset("1")) == expected
+    with pytest.raises(HTTPException):
+        other_worker.fetch(_dataset("missing"))
+    assert inner.n_fetches == 2
+    other_worker.fetch(_dataset("2"))  # The pickled entry is not loaded, but fetched again
+    assert inner.n_fetches == 3
+
+
+def test_disk_tier_refuses_a_directory_writable_by_all(tmp_path):
+    directory = tmp_path / "shared"
+    directory.mkdir()
+    directory.chmod(0o777)
+    with pytest.raises(ValueError):
+        DatasetCache(directory=directory)
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import responses
+from fastapi import HTTPException
+
+from connectors import OpenMlDatasetConnector, concurrency
+from database.models import DatasetDescription
+
+OPENML_URL = "https://www.openml.org/api/v1/json"
+
+
+def test_gather_is_concurrent():
+    """Both calls wait for each other, which would block forever if they ran sequentially"""
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait_and_return(value):
+        barrier.wait()
+        return value
+
+    assert concurrency.gather(lambda: wait_and_return(1), lambda: wait_and_return(2)) == [1, 2]
+
+
+def test_gather_async_is_concurrent():
+    async def wait_for_each_other():
+        first_started, second_started = asyncio.Event(), asyncio.Event()
+
+        async def first():
+            first_started.set()
+            await second_started.wait()
+            return 1
+
+        async def second():
+            second_started.set()
+            await first_started.wait()
+            return 2
+
+        return await asyncio.wait_for(concurrency.gather_async(first(), second()), timeout=5)
+
+    assert asyncio.run(wait_for_each_other()) == [1, 2]
+
+
+def test_gather_raises_first_error_in_argument_order():
+    def fail(msg):
+        raise ValueError(msg)
+
+    with pytest.raises(ValueError, match="first"):
+        concurrency.gather(lambda: fail("first"), lambda: fail("second"))
+
+
+def test_openml_fetch_maps_error_of_data_call():
+    dataset = DatasetDescription(name="anneal", node="openml", node_specific_identifier="1")
+    with responses.RequestsMock() as mocked_requests:
+        mocked_requests.add(
+            responses.GET,
+            f"{OPENML_URL}/data/1",
+            json={"error": {"code": "111", "message": "Unknown dataset"}},
+            status=412,
+        )
+        mocked_requests.add(
+            responses.GET,
+            f"{OPENML_URL}/data/qualities/1",
+            json={"error": {"code": "362", "message": "No qualities found"}},
+            status=412,
+        )
+        with pytest.raises(HTTPException) as exception_info:
+            OpenMlDatasetConnector().fetch(dataset)
+    assert exception_info.value.status_code == 404
+    assert exception_info.value.detail == "Error while fetching data from OpenML: 'Unknown dataset'"
+
+
+def test_map_ordered_keeps_order_and_bounds_concurrency():
+    lock = threading.Lock()
+    in_flight = [0]
+    max_in_flight = [0]
+
+    def slow_square(i):
+        with lock:
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        time.sleep(0.01 * (i % 3))
+        with lock:
+            in_flight[0] -= 1
+        return i * i
+
+    results = list(concurrency.map_ordered(slow_square, range(20), max_concurrency=4))
+    assert results == [i * i for i in range(20)]
+    assert max_in_flight[0] <= 4
+
+
+def test_map_async_returns_errors_in_place_and_bounds_concurrency():
+    running = []
+    max_running = []
+
+    async def function(item: int) -> int:
+        running.append(item)
+        max_running.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(item)
+        if item == 3:
+            raise ValueError("three")
+        return item * 2
+
+    results = asyncio.run(concurrency.map_async(function, range(6), max_concurrency=2))
+    assert results[:3] == [0, 2, 4]
+    assert isinstance(results[3], ValueError)
+    assert results[4:] == [8, 10]
+    assert max(max_running) == 2
@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+import respx
+
+from connectors import ExampleDatasetConnector, OpenMlDatasetConnector
+from database.models import DatasetDescription
+from tests.testutils.paths import path_test_resources
+
+OPENML_URL = "https://www.openml.org/api/v1/json"
+
+
+def test_default_fetch_async():
+    """Connectors without an asynchronous implementation run the blocking one in a thread"""
+    connector = ExampleDatasetConnector()
+    dataset = DatasetDescription(name="dset", node="example", node_specific_identifier="1")
+    assert asyncio.run(connector.fetch_async(dataset)) == connector.fetch(dataset)
+
+
+def test_default_fetch_all_async():
+    connector = ExampleDatasetConnector()
+
+    async def fetch_all():
+        return [d async for d in connector.fetch_all_async(limit=3)]
+
+    datasets = asyncio.run(fetch_all())
+    assert [d.name for d in datasets] == [d.name for d in connector.fetch_all(limit=3)]
+
+
+def test_openml_fetch_all_async():
+    with open(path_test_resources() / "connectors" / "openml" / "data_list.json", "r") as f:
+        response = json.load(f)
+
+    async def fetch_all():
+        return [d async for d in OpenMlDatasetConnector().fetch_all_async(limit=None)]
+
+    with respx.mock() as mocked_requests:
+        mocked_requests.get(f"{OPENML_URL}/data/list").respond(json=response, status_code=200)
+        datasets = asyncio.run(fetch_all())
+    assert len(datasets) == 5
+    assert {d.node for d in datasets} == {"openml"}
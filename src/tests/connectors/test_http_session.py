@@ -0,0 +1,35 @@
+import responses
+
+from connectors import http_session
+
+URL = "https://www.openml.org/api/v1/json/data/1"
+
+
+def test_shared_session():
+    assert http_session.session() is http_session.session()
+
+
+def test_pool_configuration():
+    session = http_session.create_session({"pool_maxsize": 5, "max_retries": 2})
+    adapter = session.get_adapter(URL)
+    assert adapter._pool_maxsize == 5
+    assert adapter.max_retries.total == 2
+
+
+def test_retry_on_server_error():
+    session = http_session.create_session({"backoff_factor": 0})
+    with responses.RequestsMock() as mocked_requests:
+        mocked_requests.add(responses.GET, URL, json={}, status=503)
+        mocked_requests.add(responses.GET, URL, json={"data": "ok"}, status=200)
+        response = session.get(URL)
+    assert response.status_code == 200
+    assert response.json() == {"data": "ok"}
+
+
+def test_no_retry_on_client_error():
+    session = http_session.create_session({"backoff_factor": 0})
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as mocked_requests:
+        mocked_requests.add(responses.GET, URL, json={}, status=412)
+        mocked_requests.add(responses.GET, URL, json={}, status=200)
+        response = session.get(URL)
+    assert response.status_code == 412
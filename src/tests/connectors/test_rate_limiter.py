@@ -0,0 +1,48 @@
+from connectors.rate_limiter import RateLimiter
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_burst_then_rate():
+    time = FakeTime()
+    rate_limiter = RateLimiter(rate=2, burst=3, clock=time.clock, sleep=time.sleep)
+    for _ in range(3):
+        rate_limiter.acquire()
+    assert time.sleeps == []
+    rate_limiter.acquire()
+    rate_limiter.acquire()
+    assert time.sleeps == [0.5, 0.5]
+
+
+def test_refill_is_capped_at_burst():
+    time = FakeTime()
+    rate_limiter = RateLimiter(rate=1, burst=2, clock=time.clock, sleep=time.sleep)
+    time.now += 100
+    for _ in range(3):
+        rate_limiter.acquire()
+    assert time.sleeps == [1]
+
+
+def test_max_wait():
+    time = FakeTime()
+    rate_limiter = RateLimiter(
+        rate=1, burst=1, clock=time.clock, sleep=time.sleeps.append, max_wait=1
+    )
+    assert rate_limiter.acquire()
+    assert rate_limiter.acquire()  # Reserves the token of the next second
+    assert not rate_limiter.acquire()  # Would have to wait two seconds
+    assert time.sleeps == [1]
+    time.now += 1
+    assert rate_limiter.acquire()  # The rejected call did not take a token
+    assert time.sleeps == [1, 1]
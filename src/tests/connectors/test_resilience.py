@@ -0,0 +1,237 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from pydantic_schemaorg.Dataset import Dataset
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+import connectors
+from connectors import (
+    CachingDatasetConnector,
+    CircuitBreaker,
+    DatasetCache,
+    ExampleDatasetConnector,
+    NodeName,
+    ResilientDatasetConnector,
+)
+from connectors.rate_limiter import RateLimiter
+from database.models import DatasetDescription
+from main import add_routes
+
+
+class FlakyDatasetConnector(ExampleDatasetConnector):
+    """Fails with the given error while it is set, counting the calls to fetch"""
+
+    node_name = NodeName.example
+
+    def __init__(self):
+        self.n_fetches = 0
+        self.error = None  # type: Exception | None
+
+    def fetch(self, dataset: DatasetDescription) -> Dataset:
+        self.n_fetches += 1
+        if self.error is not None:
+            raise self.error
+        return super().fetch(dataset)
+
+
+class BulkDatasetConnector(FlakyDatasetConnector):
+    """Offers a bulk API, counting the calls to it"""
+
+    def __init__(self):
+        super().__init__()
+        self.n_bulk_fetches = 0
+
+    @property
+    def has_bulk_api(self) -> bool:
+        return True
+
+    async def fetch_bulk_async(self, datasets: list) -> None:
+        self.n_bulk_fetches += 1
+
+
+class Clock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+def _dataset(identifier: str) -> DatasetDescription:
+    return DatasetDescription(name="dset", node="example", node_specific_identifier=identifier)
+
+
+def test_breaker_opens_on_failure_rate():
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, window_size=4, minimum_calls=4)
+    for failed in [False, True, False]:
+        assert breaker.allow()
+        breaker.record(0.1, failed)
+    assert breaker.state == "closed"
+    breaker.record(0.1, failed=True)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_opens_on_slow_calls():
+    breaker = CircuitBreaker(slow_call_seconds=1, minimum_calls=2)
+    breaker.record(5, failed=False)
+    breaker.record(5, failed=False)
+    assert breaker.state == "open"
+
+
+def test_breaker_half_open_trial():
+    clock = Clock()
+    breaker = CircuitBreaker(minimum_calls=1, open_seconds=30, clock=clock)
+    breaker.record(0.1, failed=True)
+    clock.time += 30
+    assert breaker.allow()  # The trial call
+    assert not breaker.allow()  # Only a single trial at a time
+    assert breaker.status()["state"] == "half_open"
+    breaker.record(0.1, failed=True)
+    assert breaker.state == "open"
+    clock.time += 30
+    assert breaker.allow()
+    breaker.record(0.1, failed=False)
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_open_breaker_fails_fast():
+    inner = FlakyDatasetConnector()
+    inner.error = HTTPException(status_code=502, detail="Bad gateway")
+    connector = ResilientDatasetConnector(inner, CircuitBreaker(minimum_calls=2))
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            connector.fetch(_dataset("1"))
+        assert exc_info.value.status_code == 502
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(connector.fetch_async(_dataset("1")))
+        assert exc_info.value.status_code == 503
+    results = asyncio.run(connector.fetch_many_async([_dataset("1"), _dataset("2")]))
+    assert [result.status_code for result in results] == [503, 503]
+    assert inner.n_fetches == 2
+
+
+def test_not_found_is_not_a_failure():
+    inner = FlakyDatasetConnector()
+    inner.error = HTTPException(status_code=404, detail="Not found")
+    connector = ResilientDatasetConnector(inner, CircuitBreaker(minimum_calls=1))
+    for _ in range(3):
+        with pytest.raises(HTTPException):
+            connector.fetch(_dataset("1"))
+    assert connector.breaker.state == "closed"
+    assert inner.n_fetches == 3
+
+
+def test_rate_limiter_spaces_calls():
+    sleeps = []
+    rate_limiter = RateLimiter(rate=1, burst=1, clock=lambda: 0.0, sleep=sleeps.append)
+    connector = ResilientDatasetConnector(
+        FlakyDatasetConnector(), CircuitBreaker(), rate_limiter=rate_limiter
+    )
+    connector.fetch(_dataset("1"))
+    connector.fetch(_dataset("1"))
+    assert sleeps == [1]
+
+
+def test_rate_limiter_fails_fast_beyond_max_wait():
+    rate_limiter = RateLimiter(rate=1, burst=1, clock=lambda: 0.0, sleep=lambda _: None, max_wait=1)
+    inner = FlakyDatasetConnector()
+    clock = Clock()
+    breaker = CircuitBreaker(minimum_calls=1, open_seconds=30, clock=clock)
+    connector = ResilientDatasetConnector(inner, breaker, rate_limiter=rate_limiter)
+    connector.fetch(_dataset("1"))
+    connector.fetch(_dataset("1"))  # Waits a second
+    with pytest.raises(HTTPException) as exc_info:
+        connector.fetch(_dataset("1"))  # Would wait two seconds
+    assert exc_info.value.status_code == 503
+    assert "Too many requests" in exc_info.value.detail
+    results = asyncio.run(connector.fetch_many_async([_dataset("1"), _dataset("2")]))
+    assert [result.status_code for result in results] == [503, 503]
+    assert inner.n_fetches == 2
+
+    breaker.record(0.1, failed=True)
+    clock.time += 30  # Half-open, but the bucket is empty
+    with pytest.raises(HTTPException):
+        connector.fetch(_dataset("1"))
+    assert breaker.allow()  # The trial call was not made
+
+
+def test_fetch_many_admits_each_call():
+    datasets = [_dataset(str(i)) for i in range(50)]
+    inner = FlakyDatasetConnector()
+    rate_limiter = RateLimiter(rate=1, burst=1, clock=lambda: 0.0, max_wait=0.01)
+    connector = ResilientDatasetConnector(inner, CircuitBreaker(), rate_limiter=rate_limiter)
+    results = asyncio.run(connector.fetch_many_async(datasets))
+    assert inner.n_fetches == 1
+    assert sum(isinstance(r, HTTPException) and r.status_code == 503 for r in results) == 49
+
+    inner = BulkDatasetConnector()
+    rate_limiter = RateLimiter(rate=1, burst=3, clock=lambda: 0.0, max_wait=0.01)
+    connector = ResilientDatasetConnector(inner, CircuitBreaker(), rate_limiter=rate_limiter)
+    results = asyncio.run(connector.fetch_many_async(datasets[:3]))
+    assert inner.n_bulk_fetches == 1
+    assert inner.n_fetches == 2  # The bulk call took the token of the third dataset
+    assert sum(isinstance(r, HTTPException) for r in results) == 1
+
+
+def test_fetch_many_records_each_call():
+    inner = FlakyDatasetConnector()
+    inner.error = HTTPException(status_code=502, detail="Bad gateway")
+    connector = ResilientDatasetConnector(inner, CircuitBreaker(minimum_calls=5))
+    datasets = [_dataset(str(i)) for i in range(10)]
+    results = asyncio.run(connector.fetch_many_async(datasets, max_concurrency=1))
+    assert [r.status_code for r in results] == [502] * 5 + [503] * 5
+    assert connector.breaker.state == "open"
+    assert inner.n_fetches == 5
+
+
+def test_stale_metadata_is_served_while_node_is_degraded():
+    clock = Clock()
+    inner = FlakyDatasetConnector()
+    resilient = ResilientDatasetConnector(inner, CircuitBreaker(minimum_calls=1))
+    cache = DatasetCache(ttl=10, stale_ttl=100, clock=clock)
+    connector = CachingDatasetConnector(resilient, cache)
+    fresh = connector.fetch(_dataset("1"))
+
+    clock.time += 50  # Expired, but within the stale_ttl
+    inner.error = ConnectionError("Node is down")
+    assert connector.fetch(_dataset("1")) == fresh
+    assert resilient.breaker.state == "open"
+    assert asyncio.run(connector.fetch_async(_dataset("1"))) == fresh  # Without calling the node
+    assert asyncio.run(connector.fetch_many_async([_dataset("1")])) == [fresh]
+    assert inner.n_fetches == 2
+    with pytest.raises(HTTPException) as exc_info:
+        connector.fetch(_dataset("2"))  # Nothing stale to serve
+    assert exc_info.value.status_code == 503
+
+    clock.time += 100  # Beyond the stale_ttl
+    with pytest.raises(HTTPException):
+        connector.fetch(_dataset("1"))
+
+
+def test_nodes_health(engine: Engine, monkeypatch):
+    inner = FlakyDatasetConnector()
+    inner.error = HTTPException(status_code=500, detail="Internal server error")
+    monkeypatch.setitem(connectors.dataset_connectors, NodeName.example, inner)
+    monkeypatch.setattr(
+        "main.config_section",
+        lambda section: {"minimum_calls": 2} if section == "resilience" else {},
+    )
+    app = FastAPI()
+    add_routes(app, engine)
+    client = TestClient(app)
+    with Session(engine) as session:
+        session.add(_dataset("1"))
+        session.commit()
+
+    assert client.get("/nodes/health").json()["example"]["state"] == "closed"
+    assert [client.get("/datasets/1").status_code for _ in range(3)] == [500, 500, 503]
+    health = client.get("/nodes/health").json()
+    assert health["example"]["state"] == "open"
+    assert health["openml"]["state"] == "closed"
+    assert inner.n_fetches == 2
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from pydantic_schemaorg.Dataset import Dataset
+
+from connectors import ExampleDatasetConnector, NodeName, SingleFlightDatasetConnector
+from database.models import DatasetDescription
+
+
+class BlockingDatasetConnector(ExampleDatasetConnector):
+    """Counts the calls to fetch, which block until released"""
+
+    node_name = NodeName.example
+
+    def __init__(self, error: Exception | None = None):
+        self.n_fetches = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.error = error
+
+    def fetch(self, dataset: DatasetDescription) -> Dataset:
+        self.n_fetches += 1
+        self.started.set()
+        self.release.wait(timeout=5)
+        if self.error is not None:
+            raise self.error
+        return super().fetch(dataset)
+
+
+class SlowAsyncDatasetConnector(ExampleDatasetConnector):
+    """Counts the calls to fetch_async, which take a while"""
+
+    node_name = NodeName.example
+
+    def __init__(self):
+        self.n_fetches = 0
+
+    async def fetch_async(self, dataset: DatasetDescription) -> Dataset:
+        self.n_fetches += 1
+        await asyncio.sleep(0.05)
+        if dataset.node_specific_identifier == "missing":
+            raise HTTPException(status_code=404, detail="Not found")
+        return self.fetch(dataset)
+
+
+def _dataset(identifier: str) -> DatasetDescription:
+    return DatasetDescription(name="dset", node="example", node_specific_identifier=identifier)
+
+
+def _fetch_concurrently(connector: SingleFlightDatasetConnector, inner, n: int) -> list:
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        leader = executor.submit(connector.fetch, _dataset("1"))
+        inner.started.wait(timeout=5)
+        followers = [executor.submit(connector.fetch, _dataset("1")) for _ in range(n - 1)]
+        time.sleep(0.1)  # Gives the followers the time to start waiting for the leader
+        inner.release.set()
+        return [leader] + followers
+
+
+def test_threads_share_a_single_fetch():
+    inner = BlockingDatasetConnector()
+    connector = SingleFlightDatasetConnector(inner)
+    futures = _fetch_concurrently(connector, inner, 4)
+    results = [future.result() for future in futures]
+    assert inner.n_fetches == 1
+    assert all(result == results[0] for result in results)
+    assert connector._calls == {}
+
+    connector.fetch(_dataset("1"))  # The call is finished, so this fetches again
+    assert inner.n_fetches == 2
+
+
+def test_threads_share_the_error():
+    inner = BlockingDatasetConnector(error=HTTPException(status_code=502, detail="Unavailable"))
+    connector = SingleFlightDatasetConnector(inner)
+    for future in _fetch_concurrently(connector, inner, 3):
+        with pytest.raises(HTTPException):
+            future.result()
+    assert inner.n_fetches == 1
+
+
+def test_tasks_share_a_single_fetch():
+    inner = SlowAsyncDatasetConnector()
+    connector = SingleFlightDatasetConnector(inner)
+
+    async def fetch_concurrently():
+        return await asyncio.gather(
+            *(connector.fetch_async(_dataset(identifier)) for identifier in ["1", "1", "2", "1"]),
+            *(connector.fetch_async(_dataset("missing")) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(fetch_concurrently())
+    assert inner.n_fetches == 3
+    assert results[0] == results[1] == results[3]
+    assert results[2].identifier == "2"
+    assert all(isinstance(error, HTTPException) for error in results[4:])
+    assert connector._tasks == {}
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    inner = SlowAsyncDatasetConnector()
+    connector = SingleFlightDatasetConnector(inner)
+
+    async def cancel_one():
+        first = asyncio.ensure_future(connector.fetch_async(_dataset("1")))
+        second = asyncio.ensure_future(connector.fetch_async(_dataset("1")))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(cancel_one()).identifier == "1"
+    assert inner.n_fetches == 1
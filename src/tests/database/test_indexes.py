@@ -0,0 +1,139 @@
+"""
+Asserts that the queries of the REST API and the harvester are served by indexes, by inspecting
+the query plans of SQLite. This catches regressions in the index design, e.g., when a model or a
+query changes.
+"""
+import datetime
+import typing
+
+from sqlalchemy import Engine, event, select
+from sqlalchemy.orm import Session
+
+from database.models import DatasetDescription, HarvestRun, Publication
+
+
+def _query_plan(engine: Engine, statement: str, parameters: typing.Any = ()) -> list[str]:
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[3] for row in rows]
+
+
+def _compiled_query_plan(engine: Engine, query) -> list[str]:
+    compiled = query.compile(engine)
+    return _query_plan(engine, str(compiled), tuple(compiled.params.values()))
+
+
+def _captured_query_plans(engine: Engine, function: typing.Callable[[], None]) -> list[list[str]]:
+    """The query plans of all statements that are executed by the function."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        function()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return [_query_plan(engine, statement, parameters) for statement, parameters in statements]
+
+
+def _populate(engine: Engine):
+    with Session(engine) as session:
+        publication = Publication(title="Title", url="https://test.test")
+        session.add_all(
+            [
+                DatasetDescription(
+                    name="dset",
+                    node="openml",
+                    node_specific_identifier="1",
+                    publications=[publication],
+                ),
+                DatasetDescription(name="dset", node="openml", node_specific_identifier="2"),
+                HarvestRun(started_at=datetime.datetime(2023, 1, 1), state="finished"),
+            ]
+        )
+        session.commit()
+
+
+def _assert_no_scans(plans: list[list[str]]):
+    for plan in plans:
+        for step in plan:
+            assert not step.startswith("SCAN"), plan
+            assert "TEMP B-TREE" not in step, plan
+
+
+def test_publications_of_dataset_use_primary_key(engine: Engine):
+    _populate(engine)
+
+    def load():
+        with Session(engine) as session:
+            session.get(DatasetDescription, 1).publications
+
+    plans = _captured_query_plans(engine, load)
+    _assert_no_scans(plans)
+    assert any(
+        "dataset_publication USING COVERING INDEX sqlite_autoindex_dataset_publication_1" in step
+        for plan in plans
+        for step in plan
+    )
+
+
+def test_datasets_of_publication_use_reverse_index(engine: Engine):
+    _populate(engine)
+
+    def load():
+        with Session(engine) as session:
+            session.get(Publication, 1).datasets
+
+    plans = _captured_query_plans(engine, load)
+    _assert_no_scans(plans)
+    assert any(
+        "USING COVERING INDEX dataset_publication_publication_id_dataset_id" in step
+        for plan in plans
+        for step in plan
+    )
+
+
+def test_deleting_a_dataset_uses_indexes(engine: Engine):
+    _populate(engine)
+
+    def delete():
+        with Session(engine) as session:
+            session.delete(session.get(DatasetDescription, 1))
+            session.commit()
+
+    _assert_no_scans(_captured_query_plans(engine, delete))
+
+
+def test_node_datasets_use_node_id_index(engine: Engine):
+    _populate(engine)
+    query = (
+        select(DatasetDescription)
+        .where(DatasetDescription.node == "openml")
+        .where(DatasetDescription.id > 1)
+        .order_by(DatasetDescription.id)
+        .limit(10)
+    )
+    plan = _compiled_query_plan(engine, query)
+    _assert_no_scans([plan])
+    assert any("USING INDEX dataset_node_id" in step for step in plan)
+
+
+def test_dataset_by_node_specific_identifier_uses_unique_index(engine: Engine):
+    _populate(engine)
+    query = select(DatasetDescription).where(
+        DatasetDescription.node == "openml", DatasetDescription.node_specific_identifier == "1"
+    )
+    plan = _compiled_query_plan(engine, query)
+    _assert_no_scans([plan])
+    # SQLite names the index of a unique constraint itself
+    assert any("USING INDEX sqlite_autoindex_datasets_1" in step for step in plan), plan
+
+
+def test_last_harvest_run_uses_index(engine: Engine):
+    _populate(engine)
+    query = select(HarvestRun.started_at).order_by(HarvestRun.started_at.desc()).limit(1)
+    plan = _compiled_query_plan(engine, query)
+    assert any("USING COVERING INDEX ix_harvest_runs_started_at" in step for step in plan), plan
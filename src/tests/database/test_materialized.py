@@ -0,0 +1,191 @@
+import asyncio
+import datetime
+import typing  # noqa:F401 (flake8 raises incorrect 'Module imported but unused' error)
+
+from fastapi import FastAPI, HTTPException
+from sqlalchemy import Engine, func, select
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+import connectors
+from connectors import CircuitBreaker, NodeName, ResilientDatasetConnector, http_session
+from database.materialized import MetadataStore, StoredMetadata, refresh_metadata
+from database.models import DatasetDescription, DatasetMetadata
+from harvester import HarvestScheduler
+from main import add_routes
+from tests.connectors.test_cache import CountingDatasetConnector
+
+
+class Clock:
+    def __init__(self):
+        self.time = datetime.datetime(2023, 1, 1)
+
+    def __call__(self) -> datetime.datetime:
+        return self.time
+
+
+def _populate(engine: Engine, n: int = 3):
+    with Session(engine) as session:
+        session.add_all(
+            [
+                DatasetDescription(name=f"dset{i}", node="example", node_specific_identifier=str(i))
+                for i in range(1, n + 1)
+            ]
+        )
+        session.commit()
+
+
+def _load(store: MetadataStore, dataset_id: int) -> StoredMetadata:
+    stored = store.load(dataset_id)
+    assert stored is not None
+    return stored
+
+
+def _client(engine: Engine, store: MetadataStore) -> TestClient:
+    app = FastAPI()
+    add_routes(app, engine, metadata_store=store)
+    return TestClient(app)
+
+
+def test_store_and_load(engine: Engine):
+    _populate(engine)
+    store = MetadataStore(engine)
+    dataset = CountingDatasetConnector().fetch(DatasetDescription("dset1", "example", "1"))
+    store.store({1: dataset})
+    stored = _load(store, 1)
+    assert stored.json == dataset.json().encode()
+    assert store.is_fresh(stored)
+    with Session(engine) as session:
+        assert len(session.scalars(select(DatasetMetadata.document)).one()) < len(stored.json)
+
+    store.store({1: dataset.copy(update={"name": "new name"})})
+    assert b"new name" in _load(store, 1).json
+    assert store.load(2) is None
+
+
+def test_refresh_metadata(engine: Engine):
+    _populate(engine)
+    clock = Clock()
+    store = MetadataStore(engine, clock=clock)
+    connector = CountingDatasetConnector()
+    refresh_metadata(store, [connector], refresh_after=100, batch_size=2)
+    assert connector.n_fetches == 3
+
+    clock.time += datetime.timedelta(seconds=50)
+    with Session(engine) as session:
+        session.add(DatasetDescription(name="dset4", node="example", node_specific_identifier="4"))
+        session.add(
+            DatasetDescription(name="dset5", node="example", node_specific_identifier="missing")
+        )
+        session.commit()
+    refresh_metadata(store, [connector], refresh_after=100)
+    assert connector.n_fetches == 5  # Only the new datasets, of which one is not found
+    with Session(engine) as session:
+        assert session.scalar(select(func.count()).select_from(DatasetMetadata)) == 4
+
+    clock.time += datetime.timedelta(seconds=50)
+    refresh_metadata(store, [connector], refresh_after=100)
+    assert connector.n_fetches == 9  # The first three are refreshed, the missing one is retried
+    assert _load(store, 1).fetched_at == clock.time
+
+
+def test_harvest_stores_metadata(engine: Engine):
+    _populate(engine)  # The example connector harvests datasets of other nodes
+    scheduler = HarvestScheduler(
+        engine,
+        dataset_connectors=[CountingDatasetConnector()],
+        publication_connectors=[],
+        metadata_store=MetadataStore(engine),
+    )
+    scheduler.run_once()
+    assert scheduler.status()["rows_processed"]["dataset_metadata"] == 3
+
+
+def test_detail_endpoints_serve_fresh_metadata(engine: Engine, monkeypatch):
+    inner = CountingDatasetConnector()
+    monkeypatch.setitem(connectors.dataset_connectors, NodeName.example, inner)
+    _populate(engine)
+    clock = Clock()
+    client = _client(engine, MetadataStore(engine, max_age=100, clock=clock))
+
+    response = client.get("/datasets/1")
+    assert response.status_code == 200
+    for url in ["/datasets/1", "/nodes/example/datasets/1"]:
+        stored_response = client.get(url)
+        assert stored_response.status_code == 200
+        assert stored_response.json() == response.json()
+        assert stored_response.headers["etag"] == response.headers["etag"]
+        etag = response.headers["etag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert inner.n_fetches == 1
+
+    clock.time += datetime.timedelta(seconds=100)  # No longer fresh
+    assert client.get("/datasets/1").status_code == 200
+    assert inner.n_fetches == 2
+    assert client.get("/datasets/1").status_code == 200
+    assert inner.n_fetches == 2  # Stored again
+
+
+def test_stored_metadata_is_served_while_node_is_degraded(engine: Engine, monkeypatch):
+    inner = CountingDatasetConnector()
+    monkeypatch.setitem(connectors.dataset_connectors, NodeName.example, inner)
+    _populate(engine)
+    clock = Clock()
+    client = _client(engine, MetadataStore(engine, max_age=100, clock=clock))
+    expected = client.get("/datasets/1").json()
+
+    clock.time += datetime.timedelta(seconds=100)
+
+    def fail(dataset):
+        raise HTTPException(status_code=502, detail="Node unavailable")
+
+    monkeypatch.setattr(inner, "fetch", fail)
+    assert client.get("/datasets/1").json() == expected
+    assert client.get("/datasets/2").status_code == 502
+
+
+def test_changed_datasets_lose_their_metadata(client: TestClient, engine: Engine):
+    _populate(engine)
+    store = MetadataStore(engine)
+    dataset = CountingDatasetConnector().fetch(DatasetDescription("dset1", "example", "1"))
+    store.store({i: dataset for i in (1, 2, 3)})
+
+    body = {"name": "dset1", "node": "example", "node_specific_identifier": "other"}
+    assert client.put("/datasets/1", json=body).status_code == 200
+    assert client.delete("/datasets/2").status_code == 200
+    response = client.post("/datasets/bulk", json={"delete": [3]})
+    assert response.status_code == 200
+    with Session(engine) as session:
+        assert session.scalar(select(func.count()).select_from(DatasetMetadata)) == 0
+
+
+class LoopRecordingConnector(CountingDatasetConnector):
+    """Records the event loops in which it fetches, using their AsyncClient."""
+
+    def __init__(self):
+        super().__init__()
+        self.loops = set()  # type: typing.Set[asyncio.AbstractEventLoop]
+
+    async def fetch_many_async(self, datasets, max_concurrency=10):
+        self.loops.add(asyncio.get_running_loop())
+        http_session.async_client()
+        return await super().fetch_many_async(datasets, max_concurrency)
+
+
+def test_refresh_metadata_uses_a_single_event_loop(engine: Engine):
+    _populate(engine, n=5)
+    connector = LoopRecordingConnector()
+    refresh_metadata(MetadataStore(engine), [connector], refresh_after=100, batch_size=2)
+    assert connector.n_fetches == 5
+    assert len(connector.loops) == 1
+    assert len(http_session._async_clients) == 0  # Closed after the refresh
+
+
+def test_refresh_metadata_respects_the_breaker(engine: Engine):
+    _populate(engine)
+    breaker = CircuitBreaker()
+    breaker._open()
+    inner = CountingDatasetConnector()
+    connector = ResilientDatasetConnector(inner, breaker)
+    refresh_metadata(MetadataStore(engine), [connector], refresh_after=100)
+    assert inner.n_fetches == 0
@@ -1,7 +1,8 @@
 import json
+import typing
 
 import responses
-from sqlalchemy import Engine, select
+from sqlalchemy import Engine, select, func
 from sqlalchemy.orm import Session
 
 from connectors import (
@@ -9,6 +10,7 @@ from connectors import (
     ExamplePublicationConnector,
     OpenMlDatasetConnector,
     HuggingFaceDatasetConnector,
+    NodeName,
 )
 from database.models import Publication, DatasetDescription
 from database.setup import populate_database
@@ -82,6 +84,44 @@ def test_huggingface_happy_path(engine: Engine):
         assert {len(p.datasets) for p in publications} == {0}
 
 
+class GeneratedDatasetConnector(ExampleDatasetConnector):
+    """Generates datasets, checking how many are stored in the database while yielding them."""
+
+    node_name = NodeName.openml
+
+    def __init__(self, engine: Engine, identifiers: typing.List[str]):
+        self.engine = engine
+        self.identifiers = identifiers
+        self.n_stored_while_yielding = []  # type: typing.List[int]
+
+    def fetch_all(self, limit: int | None) -> typing.Iterator[DatasetDescription]:
+        for identifier in self.identifiers[:limit]:
+            self.n_stored_while_yielding.append(_n_datasets(self.engine))
+            yield DatasetDescription(
+                name=f"dset{identifier}", node="openml", node_specific_identifier=identifier
+            )
+
+
+def test_batches_are_written_while_streaming(engine: Engine):
+    connector = GeneratedDatasetConnector(engine, [str(i) for i in range(7)])
+    populate_database(engine, dataset_connectors=[connector], batch_size=3)
+    assert _n_datasets(engine) == 7
+    assert connector.n_stored_while_yielding == [0, 0, 0, 3, 3, 3, 6]
+
+
+def test_invalid_rows_are_skipped(engine: Engine):
+    connector = GeneratedDatasetConnector(engine, ["1", "2", "1", "3", "4"])
+    populate_database(engine, dataset_connectors=[connector], batch_size=2)
+    with Session(engine) as session:
+        identifiers = session.scalars(select(DatasetDescription.node_specific_identifier)).all()
+    assert sorted(identifiers) == ["1", "2", "3", "4"]
+
+
+def _n_datasets(engine: Engine) -> int:
+    with Session(engine) as session:
+        return session.scalars(select(func.count()).select_from(DatasetDescription)).one()
+
+
 def mock_split(mocked_requests: responses.RequestsMock, split_name: str):
     filename = f"splits_{split_name.replace('/', '|')}.json"
     path_split = path_test_resources() / "connectors" / "huggingface" / filename
@@ -0,0 +1,85 @@
+import fastapi.routing
+import pytest
+from sqlalchemy import Engine, event, select
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from database.models import DatasetDescription, HarvestRun, Publication, _serializers
+
+
+def test_serializers_compiled_at_import():
+    assert {DatasetDescription, Publication, HarvestRun} <= set(_serializers)
+
+
+def test_to_dict_depth():
+    publication = Publication(title="Title", url="https://test.test")
+    dataset = DatasetDescription(
+        name="dset", node="openml", node_specific_identifier="1", publications=[publication]
+    )
+    assert dataset.to_dict(depth=0) == {
+        "name": "dset",
+        "node": "openml",
+        "node_specific_identifier": "1",
+        "id": None,
+    }
+    assert dataset.to_dict(depth=1)["publications"] == [
+        {"title": "Title", "url": "https://test.test", "id": None}
+    ]
+    assert dataset.to_dict(depth=2)["publications"][0]["datasets"][0]["name"] == "dset"
+
+
+def test_to_dict_omits_unloaded_relationships(engine: Engine):
+    with Session(engine) as session:
+        session.add(DatasetDescription(name="dset", node="openml", node_specific_identifier="1"))
+        session.commit()
+        dataset = session.scalars(select(DatasetDescription)).one()
+        assert "publications" not in dataset.to_dict(depth=1)
+        dataset.publications  # Loading the relationship
+        assert dataset.to_dict(depth=1)["publications"] == []
+
+
+def test_list_bypasses_jsonable_encoder(
+    client: TestClient, engine: Engine, monkeypatch: pytest.MonkeyPatch
+):
+    def fail(*args, **kwargs):
+        raise AssertionError("The rows should be encoded only once, by the response class.")
+
+    monkeypatch.setattr(fastapi.routing, "jsonable_encoder", fail)
+    with Session(engine) as session:
+        session.add(DatasetDescription(name="dset", node="openml", node_specific_identifier="1"))
+        session.commit()
+    response = client.get("/datasets")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == [
+        {"name": "dset", "node": "openml", "node_specific_identifier": "1", "id": 1}
+    ]
+
+
+def test_column_names():
+    assert DatasetDescription.column_names() == ["name", "node", "node_specific_identifier", "id"]
+    assert Publication.column_names() == ["title", "url", "id"]
+
+
+@pytest.mark.parametrize("url", ["/datasets", "/nodes/openml/datasets"])
+def test_list_selects_columns_only(client: TestClient, engine: Engine, url: str):
+    loaded = []
+
+    def listener(instance, context):
+        loaded.append(instance)
+
+    with Session(engine) as session:
+        session.add(DatasetDescription(name="dset", node="openml", node_specific_identifier="1"))
+        session.commit()
+    event.listen(DatasetDescription, "load", listener)
+    try:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.json() == [
+            {"name": "dset", "node": "openml", "node_specific_identifier": "1", "id": 1}
+        ]
+        assert loaded == []  # No ORM instances were created
+        client.get(url, params={"expand": "publications"})
+        assert len(loaded) == 1
+    finally:
+        event.remove(DatasetDescription, "load", listener)
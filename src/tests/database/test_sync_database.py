@@ -0,0 +1,74 @@
+import typing
+
+from sqlalchemy import Engine, event, select
+from sqlalchemy.orm import Session
+
+from connectors import ExampleDatasetConnector, ExamplePublicationConnector, NodeName
+from database.models import DatasetDescription, Publication
+from database.setup import populate_database, sync_database
+
+
+class DictDatasetConnector(ExampleDatasetConnector):
+    """Yields an openml dataset for each (identifier, name) in the dictionary"""
+
+    node_name = NodeName.openml
+
+    def __init__(self, names: typing.Dict[str, str]):
+        self.names = names
+
+    def fetch_all(self, limit: int | None) -> typing.Iterator[DatasetDescription]:
+        for identifier, name in self.names.items():
+            yield DatasetDescription(name=name, node="openml", node_specific_identifier=identifier)
+
+
+def test_only_new_and_changed_rows_are_upserted(engine: Engine):
+    populate_database(
+        engine,
+        dataset_connectors=[DictDatasetConnector({"42769": "Higgs", "42742": "porto-seguro"})],
+        publications_connectors=[ExamplePublicationConnector()],
+    )
+    ids_before = _ids(engine)
+    upserted_rows = _track_upserted_rows(engine)
+
+    connector = DictDatasetConnector({"42769": "Higgs", "42742": "porto", "1": "anneal"})
+    sync_database(
+        engine,
+        dataset_connectors=[connector],
+        publications_connectors=[ExamplePublicationConnector()],
+    )
+
+    assert sorted(row["node_specific_identifier"] for row in upserted_rows) == ["1", "42742"]
+    ids_after = _ids(engine)
+    assert {i: ids_after[i] for i in ids_before} == ids_before
+    with Session(engine) as session:
+        datasets = {
+            d.node_specific_identifier: d for d in session.scalars(select(DatasetDescription))
+        }
+        assert {nsi: d.name for nsi, d in datasets.items()} == connector.names
+        assert len(datasets["42769"].publications) == 2
+        assert len(datasets["42742"].publications) == 1
+        assert len(datasets["1"].publications) == 0
+        assert len(session.scalars(select(Publication)).all()) == 2
+
+
+def test_sync_empty_database(engine: Engine):
+    sync_database(engine, dataset_connectors=[DictDatasetConnector({"1": "anneal"})])
+    assert list(_ids(engine)) == ["1"]
+
+
+def _ids(engine: Engine) -> typing.Dict[str, int]:
+    with Session(engine) as session:
+        query = select(DatasetDescription.node_specific_identifier, DatasetDescription.id)
+        return {nsi: identifier for nsi, identifier in session.execute(query)}
+
+
+def _track_upserted_rows(engine: Engine) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Return a list that will contain every row inserted (or upserted) into the datasets"""
+    rows = []  # type: typing.List[typing.Dict[str, typing.Any]]
+
+    @event.listens_for(engine, "before_execute")
+    def track(connection, clause, multiparams, params, execution_options):
+        if clause.is_insert and clause.table.name == "datasets":
+            rows.extend(multiparams if multiparams else [params])
+
+    return rows
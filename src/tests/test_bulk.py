@@ -0,0 +1,160 @@
+import typing
+
+import pytest
+from sqlalchemy import Engine, event, select
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from database.models import DatasetDescription, Publication, dataset_publication_relationship
+
+
+def _dataset(identifier: str, **kwargs) -> dict:
+    dataset = {
+        "name": f"dset{identifier}",
+        "node": "openml",
+        "node_specific_identifier": identifier,
+    }
+    return dataset | kwargs
+
+
+@pytest.fixture
+def populated(engine: Engine) -> Engine:
+    with Session(engine) as session:
+        publication = Publication(title="Title", url="https://test.test")
+        session.add_all(
+            [
+                DatasetDescription(
+                    name="dset1",
+                    node="openml",
+                    node_specific_identifier="1",
+                    publications=[publication],
+                ),
+                DatasetDescription(name="dset2", node="openml", node_specific_identifier="2"),
+            ]
+        )
+        session.commit()
+    return engine
+
+
+def _capture_statements(engine: Engine) -> typing.List[str]:
+    statements = []  # type: typing.List[str]
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    return statements
+
+
+def test_bulk_datasets(client: TestClient, populated: Engine):
+    statements = _capture_statements(populated)
+    response = client.post(
+        "/datasets/bulk",
+        json={
+            "create": [_dataset(str(i)) for i in range(3, 103)] + [_dataset("2"), _dataset("3")],
+            "update": [_dataset("1b", id=1), _dataset("2", id=9), _dataset("4", id=2)],
+            "delete": [2, 5],
+        },
+    )
+    assert response.status_code == 200
+    response_json = response.json()
+    assert response_json["delete"] == [
+        {"status_code": 200, "id": 2},
+        {"status_code": 404, "detail": "Dataset '5' not found."},
+    ]
+    assert response_json["update"] == [
+        {"status_code": 200, "id": 1},
+        {"status_code": 404, "detail": "Dataset '9' not found."},
+        {"status_code": 404, "detail": "Dataset '2' not found."},
+    ]
+    created = response_json["create"]
+    assert [item["status_code"] for item in created[:100]] == [201] * 100
+    assert len({item["id"] for item in created[:100]}) == 100
+    assert created[100] == {"status_code": 201, "id": created[100]["id"]}  # Key of deleted dataset
+    assert created[101] == {
+        "status_code": 409,
+        "detail": "Another dataset in this request has the same node and node_specific_identifier.",
+    }
+    assert len(statements) < 15  # Independent of the number of items
+
+    with Session(populated) as session:
+        query = select(DatasetDescription.node_specific_identifier)
+        assert session.scalars(query.where(DatasetDescription.id == 1)).one() == "1b"
+        assert len(session.scalars(select(DatasetDescription)).all()) == 102
+        links = session.execute(select(dataset_publication_relationship)).all()
+        assert [(link.dataset_id, link.publication_id) for link in links] == [(1, 1)]
+
+
+def test_bulk_datasets_conflict_with_existing(client: TestClient, populated: Engine):
+    response = client.post(
+        "/datasets/bulk",
+        json={"create": [_dataset("2")], "update": [_dataset("2", id=1)]},
+    )
+    assert response.status_code == 200
+    detail = (
+        "There already exists a dataset with the same node and node_specific_identifier, with id=2."
+    )
+    assert response.json()["update"] == [{"status_code": 409, "detail": detail}]
+    assert response.json()["create"] == [{"status_code": 409, "detail": detail}]
+
+
+def test_bulk_datasets_requires_ids_for_update(client: TestClient, populated: Engine):
+    response = client.post("/datasets/bulk", json={"update": [_dataset("1")]})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Every item to update should have an id."
+
+
+def test_bulk_publications(client: TestClient, populated: Engine):
+    response = client.post(
+        "/publications/bulk",
+        json={
+            "create": [
+                {"title": "Title", "url": "https://test.test"},
+                {"title": "Title", "url": "https://other.test"},
+            ],
+            "delete": [1],
+        },
+    )
+    assert response.status_code == 200
+    response_json = response.json()
+    assert response_json["delete"] == [{"status_code": 200, "id": 1}]
+    assert response_json["update"] == []
+    assert [item["status_code"] for item in response_json["create"]] == [201, 201]
+    with Session(populated) as session:
+        publications = session.scalars(select(Publication)).all()
+        assert {p.url for p in publications} == {"https://test.test", "https://other.test"}
+        assert session.execute(select(dataset_publication_relationship)).all() == []
+
+
+def test_bulk_links(client: TestClient, populated: Engine):
+    response = client.post(
+        "/datasets/publications/bulk",
+        json={
+            "link": [
+                {"dataset_id": 2, "publication_id": 1},
+                {"dataset_id": 2, "publication_id": 1},
+                {"dataset_id": 3, "publication_id": 1},
+                {"dataset_id": 2, "publication_id": 3},
+            ],
+            "unlink": [
+                {"dataset_id": 1, "publication_id": 1},
+                {"dataset_id": 2, "publication_id": 2},
+            ],
+        },
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "unlink": [
+            {"status_code": 200},
+            {"status_code": 404, "detail": "Dataset 2 is not linked to publication 2."},
+        ],
+        "link": [
+            {"status_code": 201},
+            {"status_code": 409, "detail": "Dataset 2 is already linked to publication 1."},
+            {"status_code": 404, "detail": "Dataset '3' not found."},
+            {"status_code": 404, "detail": "Publication '3' not found."},
+        ],
+    }
+    with Session(populated) as session:
+        links = session.execute(select(dataset_publication_relationship)).all()
+        assert [(link.dataset_id, link.publication_id) for link in links] == [(2, 1)]
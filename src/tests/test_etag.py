@@ -0,0 +1,138 @@
+import asyncio
+import typing  # noqa:F401 (flake8 raises incorrect 'Module imported but unused' error)
+
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+import connectors
+from connectors import DatasetCache, NodeName
+from connectors.cache import DiskCacheTier
+from database.models import DatasetDescription, Publication
+from main import add_routes
+from tests.connectors.test_cache import CountingDatasetConnector
+
+
+def _populate(engine: Engine):
+    with Session(engine) as session:
+        session.add_all(
+            [
+                DatasetDescription(name="dset1", node="example", node_specific_identifier="1"),
+                Publication(title="Title 1", url="https://test.test"),
+            ]
+        )
+        session.commit()
+
+
+@pytest.mark.parametrize("url", ["/datasets/", "/nodes/example/datasets", "/publications/1"])
+def test_not_modified(client: TestClient, engine: Engine, url: str):
+    _populate(engine)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    response = client.get(url, headers={"If-None-Match": 'W/"other", ' + etag})
+    assert response.status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_etag_changes_after_update(client: TestClient, engine: Engine):
+    _populate(engine)
+    etag = client.get("/datasets/").headers["etag"]
+    body = {
+        "name": "new name",
+        "node": "example",
+        "node_specific_identifier": "1",
+    }  # type: typing.Dict[str, typing.Any]
+    assert client.put("/datasets/1", json=body).status_code == 200
+    response = client.get("/datasets/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()[0]["name"] == "new name"
+
+
+def test_publication_not_modified_without_serializing(
+    client: TestClient, engine: Engine, monkeypatch
+):
+    _populate(engine)
+    assert client.post("/datasets/1/publications/1").status_code == 200
+    etag = client.get("/publications/1").headers["etag"]
+
+    def fail(self, depth=1):
+        raise AssertionError("Serialized")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(Publication, "to_dict", fail)
+        response = client.get("/publications/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    body = {"name": "new name", "node": "example", "node_specific_identifier": "1"}
+    assert client.put("/datasets/1", json=body).status_code == 200
+    response = client.get("/publications/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["datasets"][0]["name"] == "new name"
+
+
+def test_cached_dataset_not_modified_without_fetching(engine: Engine, monkeypatch):
+    inner = CountingDatasetConnector()
+    monkeypatch.setitem(connectors.dataset_connectors, NodeName.example, inner)
+    app = FastAPI()
+    add_routes(app, engine, dataset_cache=DatasetCache())
+    client = TestClient(app)
+    _populate(engine)
+
+    response = client.get("/datasets/1")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=3600"
+    etag = response.headers["etag"]
+    assert inner.n_fetches == 1
+
+    for url in ["/datasets/1", "/nodes/example/datasets/1"]:
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+    assert inner.n_fetches == 1
+
+
+def test_cached_etag_is_read_once_off_the_event_loop(engine: Engine, monkeypatch, tmp_path):
+    inner = CountingDatasetConnector()
+    monkeypatch.setitem(connectors.dataset_connectors, NodeName.example, inner)
+    dataset_cache = DatasetCache(directory=tmp_path)
+    app = FastAPI()
+    add_routes(app, engine, dataset_cache=dataset_cache)
+    client = TestClient(app)
+    _populate(engine)
+    etag = client.get("/datasets/1").headers["etag"]
+    dataset_cache.memory.invalidate(("example", "1"))  # As if served by another worker
+
+    on_event_loop = []
+    original_get = DiskCacheTier.get
+
+    def get(self, *args):
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return original_get(self, *args)
+
+    monkeypatch.setattr(DiskCacheTier, "get", get)
+    assert client.get("/datasets/1", headers={"If-None-Match": etag}).status_code == 304
+    assert on_event_loop == [False]
+    assert inner.n_fetches == 1
+
+
+def test_dataset_etag_without_cache(client: TestClient, engine: Engine):
+    _populate(engine)
+    response = client.get("/datasets/1")
+    assert response.status_code == 200
+    assert response.json()["name"] == "dset1"
+    etag = response.headers["etag"]
+    assert client.get("/datasets/1", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,97 @@
+import typing
+
+import pytest
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from database.models import DatasetDescription, Publication
+
+
+@pytest.fixture
+def statements(engine: Engine) -> typing.Iterator[list[str]]:
+    """The SQL statements executed on the engine during the test."""
+    executed = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    yield executed
+    event.remove(engine, "before_cursor_execute", capture)
+
+
+def _populate(engine: Engine, n_datasets: int):
+    with Session(engine) as session:
+        publications = [Publication(title=f"Title {i}", url=f"https://{i}.test") for i in range(2)]
+        session.add_all(
+            [
+                DatasetDescription(
+                    name=f"dset{i}",
+                    node="openml",
+                    node_specific_identifier=str(i),
+                    publications=publications[: i % 3],
+                )
+                for i in range(n_datasets)
+            ]
+        )
+        session.commit()
+
+
+@pytest.mark.parametrize("n_datasets", [3, 30])
+def test_list_datasets_expand_publications(
+    client: TestClient, engine: Engine, statements: list[str], n_datasets: int
+):
+    _populate(engine, n_datasets)
+    statements.clear()
+    response = client.get("/datasets", params={"expand": "publications"})
+    assert response.status_code == 200
+    response_json = response.json()
+    assert len(response_json) == n_datasets
+    assert [len(dataset["publications"]) for dataset in response_json[:3]] == [0, 1, 2]
+    assert set(response_json[2]["publications"][0]) == {"title", "url", "id"}
+    assert len(statements) == 2  # The datasets, and the publications of all datasets
+
+
+def test_list_without_expand(client: TestClient, engine: Engine, statements: list[str]):
+    _populate(engine, 3)
+    statements.clear()
+    response = client.get("/datasets")
+    assert response.status_code == 200
+    assert all("publications" not in dataset for dataset in response.json())
+    assert len(statements) == 1
+
+
+def test_list_publications_expand_datasets(client: TestClient, engine: Engine):
+    _populate(engine, 5)
+    response = client.get("/publications", params={"expand": "datasets"})
+    assert response.status_code == 200
+    assert [len(publication["datasets"]) for publication in response.json()] == [3, 1]
+
+
+def test_list_node_datasets_expand(client: TestClient, engine: Engine):
+    _populate(engine, 3)
+    response = client.get("/nodes/openml/datasets", params={"expand": "publications"})
+    assert response.status_code == 200
+    assert [len(dataset["publications"]) for dataset in response.json()] == [0, 1, 2]
+
+
+def test_get_publication_expands_by_default(
+    client: TestClient, engine: Engine, statements: list[str]
+):
+    _populate(engine, 5)
+    statements.clear()
+    response = client.get("/publications/1")
+    assert response.status_code == 200
+    assert len(response.json()["datasets"]) == 3
+    assert len(statements) == 2
+
+    response = client.get("/publications/1", params={"expand": ""})
+    assert response.status_code == 200
+    assert "datasets" not in response.json()
+
+
+def test_unknown_expand(client: TestClient, engine: Engine):
+    response = client.get("/datasets", params={"expand": "publications,authors"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cannot expand authors. Possible values: ['publications']"
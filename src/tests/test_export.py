@@ -0,0 +1,65 @@
+import json
+
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from database.models import DatasetDescription, Publication
+from main import _export_partitions
+from response_formats import NDJSON, encode_stream
+
+
+def _populate(engine: Engine):
+    with Session(engine) as session:
+        session.add_all(
+            [
+                DatasetDescription(name=f"dset{i}", node=node, node_specific_identifier=str(i))
+                for i, node in enumerate(["openml", "huggingface", "openml", "example", "openml"])
+            ]
+            + [Publication(title="Title", url="https://test.test")]
+        )
+        session.commit()
+
+
+def test_export_datasets(client: TestClient, engine: Engine):
+    _populate(engine)
+    response = client.get("/datasets/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2, 3, 4, 5]
+    assert json.loads(lines[0]) == {
+        "name": "dset0",
+        "node": "openml",
+        "node_specific_identifier": "0",
+        "id": 1,
+    }
+
+
+def test_export_datasets_of_nodes(client: TestClient, engine: Engine):
+    _populate(engine)
+    response = client.get("/datasets/export", params={"nodes": ["huggingface", "example"]})
+    assert response.status_code == 200
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [2, 4]
+
+
+def test_export_publications(client: TestClient, engine: Engine):
+    _populate(engine)
+    response = client.get("/publications/export")
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"title": "Title", "url": "https://test.test", "id": 1}
+    ]
+
+
+def test_export_is_chunked(engine: Engine):
+    _populate(engine)
+    partitions = _export_partitions(engine, DatasetDescription, [], yield_per=2)
+    chunks = list(encode_stream(NDJSON, DatasetDescription, partitions))
+    assert [chunk.count(b"\n") for chunk in chunks] == [2, 2, 1]
+
+
+def test_export_empty(client: TestClient, engine: Engine):
+    response = client.get("/datasets/export")
+    assert response.status_code == 200
+    assert response.text == ""
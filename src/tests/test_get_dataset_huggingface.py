@@ -1,6 +1,6 @@
 import json
 
-import responses
+import respx
 from sqlalchemy import Engine
 from sqlalchemy.orm import Session
 from starlette.testclient import TestClient
@@ -21,7 +21,7 @@ def test_happy_path(client: TestClient, engine: Engine):
         # Populate database.
         session.add(dataset_description)
         session.commit()
-    with responses.RequestsMock() as mocked_requests:
+    with respx.mock() as mocked_requests:
         _mock_normal_responses(mocked_requests)
         response = client.get("/nodes/huggingface/datasets/rotten_tomatoes|default|train")
 
@@ -68,23 +68,20 @@ def test_dataset_not_found_in_openml(client: TestClient, engine: Engine):
         # Populate database
         session.add(dataset_description)
         session.commit()
-    with responses.RequestsMock() as mocked_requests:
+    with respx.mock() as mocked_requests:
         msg = (
             "The dataset does not exist, or is not accessible without authentication (private or "
             "gated). Please retry with authentication."
         )
-        mocked_requests.add(
-            responses.GET,
-            "https://datasets-server.huggingface.co/splits?dataset=rotten_tomatoes",
-            json={"error": msg},
-            status=412,
-        )
+        mocked_requests.get(
+            f"{HUGGINGFACE_URL}/splits", params={"dataset": "rotten_tomatoes"}
+        ).respond(json={"error": msg}, status_code=412)
         response = client.get(f"/nodes/huggingface/datasets/{identifier}")
     assert response.status_code == 412
     assert response.json()["detail"] == f"Error while fetching splits from HuggingFace: '{msg}'"
 
 
-def _mock_normal_responses(mocked_requests: responses.RequestsMock):
+def _mock_normal_responses(mocked_requests: respx.MockRouter):
     """
     Mocking requests to the OpenML dependency, so that we test only our own services
     """
@@ -92,18 +89,12 @@ def _mock_normal_responses(mocked_requests: responses.RequestsMock):
     with open(huggingface_path / "splits_rotten_tomatoes.json", "r") as f:
         split_response = json.load(f)
 
-    mocked_requests.add(
-        responses.GET,
-        f"{HUGGINGFACE_URL}/splits?dataset=rotten_tomatoes",
-        json=split_response,
-        status=200,
+    mocked_requests.get(f"{HUGGINGFACE_URL}/splits", params={"dataset": "rotten_tomatoes"}).respond(
+        json=split_response, status_code=200
     )
 
     with open(huggingface_path / "parquet_rotten_tomatoes.json", "r") as f:
         parquet_response = json.load(f)
-    mocked_requests.add(
-        responses.GET,
-        f"{HUGGINGFACE_URL}/parquet?dataset=rotten_tomatoes",
-        json=parquet_response,
-        status=200,
-    )
+    mocked_requests.get(
+        f"{HUGGINGFACE_URL}/parquet", params={"dataset": "rotten_tomatoes"}
+    ).respond(json=parquet_response, status_code=200)
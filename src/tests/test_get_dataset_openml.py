@@ -1,7 +1,7 @@
 import copy
 import json
 
-import responses
+import respx
 from sqlalchemy import Engine
 from sqlalchemy.orm import Session
 from starlette.testclient import TestClient
@@ -22,7 +22,7 @@ def test_happy_path(client: TestClient, engine: Engine):
         # node_specific_identifier is not possible anymore
         session.add(copy.deepcopy(dataset_description))
         session.commit()
-    with responses.RequestsMock() as mocked_requests:
+    with respx.mock() as mocked_requests:
         _mock_normal_responses(mocked_requests, dataset_description)
         response = client.get("/nodes/openml/datasets/1")
     assert response.status_code == 200
@@ -62,20 +62,17 @@ def test_dataset_not_found_in_openml(client: TestClient, engine: Engine):
         # node_specific_identifier is not possible anymore
         session.add(copy.deepcopy(dataset_description))
         session.commit()
-    with responses.RequestsMock() as mocked_requests:
-        mocked_requests.add(
-            responses.GET,
+    with respx.mock() as mocked_requests:
+        mocked_requests.get(
             f"{OPENML_URL}/data/{dataset_description.node_specific_identifier}",
-            json={"error": {"code": "111", "message": "Unknown dataset"}},
-            status=412,
-        )
+        ).respond(json={"error": {"code": "111", "message": "Unknown dataset"}}, status_code=412)
         response = client.get("/nodes/openml/datasets/1")
     assert response.status_code == 404
     assert response.json()["detail"] == "Error while fetching data from OpenML: 'Unknown dataset'"
 
 
 def _mock_normal_responses(
-    mocked_requests: responses.RequestsMock, dataset_description: DatasetDescription
+    mocked_requests: respx.MockRouter, dataset_description: DatasetDescription
 ):
     """
     Mocking requests to the OpenML dependency, so that we test only our own services
@@ -84,15 +81,9 @@ def _mock_normal_responses(
         data_response = json.load(f)
     with open(path_test_resources() / "connectors" / "openml" / "data_1_qualities.json", "r") as f:
         data_qualities_response = json.load(f)
-    mocked_requests.add(
-        responses.GET,
+    mocked_requests.get(
         f"{OPENML_URL}/data/{dataset_description.node_specific_identifier}",
-        json=data_response,
-        status=200,
-    )
-    mocked_requests.add(
-        responses.GET,
+    ).respond(json=data_response, status_code=200)
+    mocked_requests.get(
         f"{OPENML_URL}/data/qualities/{dataset_description.node_specific_identifier}",
-        json=data_qualities_response,
-        status=200,
-    )
+    ).respond(json=data_qualities_response, status_code=200)
@@ -0,0 +1,72 @@
+import json
+
+import respx
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from database.models import DatasetDescription
+from tests.testutils.paths import path_test_resources
+
+OPENML_URL = "https://www.openml.org/api/v1/json"
+
+
+def _populate(engine: Engine):
+    with Session(engine) as session:
+        session.add_all(
+            [
+                DatasetDescription(name="anneal", node="openml", node_specific_identifier="1"),
+                DatasetDescription(name="unknown", node="openml", node_specific_identifier="2"),
+                DatasetDescription(name="other", node="other_node", node_specific_identifier="1"),
+            ]
+        )
+        session.commit()
+
+
+def test_happy_path(client: TestClient, engine: Engine):
+    _populate(engine)
+    with open(path_test_resources() / "connectors" / "openml" / "data_1.json", "r") as f:
+        data_response = json.load(f)
+    unknown_dataset = {"error": {"code": "111", "message": "Unknown dataset"}}
+    data_list_response = {
+        "data": {
+            "dataset": [{"did": 1, "quality": [{"name": "NumberOfInstances", "value": "898.0"}]}]
+        }
+    }
+    with respx.mock() as mocked_requests:
+        data_list = mocked_requests.get(f"{OPENML_URL}/data/list/data_id/1,2/status/all").respond(
+            json=data_list_response
+        )
+        mocked_requests.get(f"{OPENML_URL}/data/1").respond(json=data_response)
+        mocked_requests.get(f"{OPENML_URL}/data/2").respond(json=unknown_dataset, status_code=412)
+        qualities = mocked_requests.get(f"{OPENML_URL}/data/qualities/2").respond(
+            json=unknown_dataset, status_code=412
+        )
+        response = client.post("/datasets/batch", json=[1, 2, 3, 4, 1])
+    assert response.status_code == 200
+    response_json = response.json()
+    assert [item["identifier"] for item in response_json] == [1, 2, 3, 4, 1]
+
+    assert response_json[0]["dataset"]["name"] == data_response["data_set_description"]["name"]
+    assert response_json[0]["dataset"]["size"]["value"] == 898
+    assert response_json[4] == response_json[0]
+    assert response_json[1]["error"] == {
+        "status_code": 404,
+        "detail": "Error while fetching data from OpenML: 'Unknown dataset'",
+    }
+    assert response_json[2]["error"] == {
+        "status_code": 501,
+        "detail": "No connector for node 'other_node' available.",
+    }
+    assert response_json[3]["error"] == {
+        "status_code": 404,
+        "detail": "Dataset '4' not found in the database.",
+    }
+    assert data_list.call_count == 1  # The qualities of all datasets are fetched at once
+    assert qualities.call_count == 1  # Except for dataset 2, which was not in the data list
+
+
+def test_too_many_identifiers(client: TestClient, engine: Engine):
+    response = client.post("/datasets/batch", json=list(range(501)))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "At most 500 identifiers can be retrieved at once."
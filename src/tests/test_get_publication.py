@@ -1,5 +1,3 @@
-import copy
-
 import pytest
 from sqlalchemy import Engine
 from sqlalchemy.orm import Session
@@ -18,11 +16,12 @@ def test_happy_path(client: TestClient, engine: Engine, publication_id: int):
         Publication(title="Title 1", url="https://test.test", datasets=datasets),
         Publication(title="Title 2", url="https://test.test2", datasets=datasets),
     ]
-    with Session(engine) as session:
+    # expire_on_commit=False is necessary because SqlAlchemy otherwise changes the instances so
+    # that accessing the attributes is not possible anymore. A deepcopy would duplicate the links
+    # between the publications and datasets.
+    with Session(engine, expire_on_commit=False) as session:
         # Populate database
-        # Deepcopy necessary because SqlAlchemy changes the instance so that accessing the
-        # attributes is not possible anymore
-        session.add_all(copy.deepcopy(publications))
+        session.add_all(publications)
         session.commit()
 
     response = client.get(f"/publications/{publication_id}")
@@ -0,0 +1,67 @@
+import datetime
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import Engine, select, func
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from connectors import ExampleDatasetConnector, ExamplePublicationConnector
+from database.models import DatasetDescription, HarvestRun
+from harvester import HarvestScheduler
+from main import add_routes
+
+
+def _scheduler(engine: Engine) -> HarvestScheduler:
+    return HarvestScheduler(
+        engine,
+        dataset_connectors=[ExampleDatasetConnector()],
+        publication_connectors=[ExamplePublicationConnector()],
+        interval=3600,
+    )
+
+
+def test_run_once(engine: Engine):
+    scheduler = _scheduler(engine)
+    scheduler.run_once()
+    with Session(engine) as session:
+        assert session.scalar(select(func.count()).select_from(DatasetDescription)) == 5
+        (run,) = session.scalars(select(HarvestRun)).all()
+        assert run.state == "finished"
+        assert run.finished_at is not None and run.finished_at >= run.started_at
+    status = scheduler.status()
+    assert status["rows_processed"] == {"datasets": 5, "publications": 2}
+    assert status["last_run"]["state"] == "finished"
+    assert 3599 < scheduler.seconds_until_next_run() <= 3600
+
+
+def test_background_run(engine: Engine):
+    app = FastAPI()
+    scheduler = _scheduler(engine)
+    add_routes(app, engine, harvest_scheduler=scheduler)
+    client = TestClient(app)
+
+    scheduler.start()
+    try:
+        deadline = time.monotonic() + 5
+        while "last_run" not in scheduler.status() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        response_json = client.get("/harvest").json()
+    finally:
+        scheduler.stop()
+    assert response_json["state"] == "waiting"
+    assert response_json["last_run"]["state"] == "finished"
+    assert client.get("/datasets").json()[0]["name"] == "Higgs"
+    assert scheduler.status()["state"] == "stopped"
+
+
+def test_recent_run_is_not_repeated(engine: Engine):
+    with Session(engine) as session:
+        started_at = datetime.datetime.utcnow() - datetime.timedelta(minutes=10)
+        session.add(HarvestRun(started_at=started_at, state="finished"))
+        session.commit()
+    assert 2900 < _scheduler(engine).seconds_until_next_run() < 3000
+
+
+def test_disabled(client: TestClient):
+    assert client.get("/harvest").json() == {"state": "disabled"}
@@ -0,0 +1,90 @@
+import json
+import logging
+import logging.handlers
+
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import Engine, select, text
+from starlette.testclient import TestClient
+
+import logging_setup
+from database.models import DatasetDescription
+from main import _wrap_as_http_exception, add_routes
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers, root.level
+    yield root
+    logging_setup.stop_logging()
+    root.handlers, root.level = handlers, level
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.NOTSET)
+
+
+def _slow_queries(caplog) -> list:
+    return [json.loads(r.getMessage()) for r in caplog.records if r.name == "slow_query"]
+
+
+def test_records_are_written_by_the_listener(root_logger, capsys):
+    logging_setup.configure_logging({"level": "INFO", "sql_echo": "INFO"})
+    assert isinstance(root_logger.handlers[0], logging.handlers.QueueHandler)
+    assert logging.getLogger("sqlalchemy.engine").getEffectiveLevel() == logging.INFO
+    logging.getLogger("test").info("A message")
+    logging.getLogger("test").debug("Not logged")
+    logging_setup.stop_logging()
+    err = capsys.readouterr().err
+    assert "INFO test: A message" in err
+    assert "Not logged" not in err
+
+
+def test_slow_queries(engine: Engine, caplog):
+    logging_setup.log_slow_queries(engine, {"slow_query_seconds": 0, "slow_query_parameters": True})
+    with engine.connect() as connection:
+        connection.execute(select(DatasetDescription).where(DatasetDescription.name == "secret"))
+    (entry,) = _slow_queries(caplog)
+    assert entry["statement"].startswith("SELECT")
+    assert "secret" in entry["parameters"]
+    assert entry["route"] is None
+    assert entry["duration_ms"] >= 0
+
+
+def test_slow_queries_without_parameters_or_sampled_out(engine: Engine, caplog):
+    logging_setup.log_slow_queries(engine, {"slow_query_seconds": 0})  # No parameters by default
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    (entry,) = _slow_queries(caplog)
+    assert "parameters" not in entry
+
+    caplog.clear()
+    logging_setup.log_slow_queries(engine, {"slow_query_seconds": 1000})
+    logging_setup.log_slow_queries(engine, {"slow_query_seconds": 0, "slow_query_sample_rate": 0})
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    assert len(_slow_queries(caplog)) == 1  # Only by the first listener
+
+
+def test_slow_queries_contain_the_route(engine: Engine, caplog):
+    app = FastAPI()
+    add_routes(app, engine)
+    logging_setup.log_slow_queries(engine, {"slow_query_seconds": 0})
+    assert TestClient(app).get("/datasets/1").status_code == 404
+    assert {entry["route"] for entry in _slow_queries(caplog)} == {"/datasets/{identifier}"}
+
+
+def test_unexpected_exceptions_are_logged(caplog):
+    try:
+        raise ValueError("A bug")
+    except ValueError as e:
+        exception = _wrap_as_http_exception(e)
+    assert exception.status_code == 500
+    (record,) = [r for r in caplog.records if r.name == "main"]
+    assert record.exc_info[1].args == ("A bug",)
+
+
+def test_unexpected_exceptions_are_logged_outside_an_except_block(caplog):
+    exception = _wrap_as_http_exception(ValueError("A bug in a batch item"))
+    assert exception.status_code == 500
+    (record,) = [r for r in caplog.records if r.name == "main"]
+    assert record.exc_info[1].args == ("A bug in a batch item",)
+    assert "ValueError: A bug in a batch item" in caplog.text
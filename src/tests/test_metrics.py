@@ -0,0 +1,109 @@
+import pytest
+import responses
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+from sqlalchemy import Engine, text
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+import metrics
+from connectors import CachingDatasetConnector, DatasetCache, http_session
+from database.models import DatasetDescription
+from tests.connectors.test_cache import CountingDatasetConnector
+
+OPENML_URL = "https://www.openml.org/api/v1/json"
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        (OPENML_URL + "/data/61", ("openml", "/data/{id}")),
+        (OPENML_URL + "/data/qualities/61?x=1", ("openml", "/data/qualities/{id}")),
+        (OPENML_URL + "/data/list/data_id/1,2,3", ("openml", "/data/list/data_id/{id}")),
+        ("https://unknown.test/rows/5", ("unknown.test", "/rows/{id}")),
+    ],
+)
+def test_upstream_labels(url: str, expected: tuple):
+    assert metrics.upstream_labels(url) == expected
+
+
+def test_request_duration_is_labelled_with_route_template(client: TestClient, engine: Engine):
+    with Session(engine) as session:
+        session.add(DatasetDescription(name="dset1", node="example", node_specific_identifier="1"))
+        session.commit()
+    route = "/nodes/{node}/datasets/{identifier}"
+    labels = {"method": "GET", "route": route, "status_code": "404"}
+    before = _sample("http_request_duration_seconds_count", **labels)
+    assert client.get("/nodes/example/datasets/2").status_code == 404
+    assert client.get("/nodes/example/datasets/3").status_code == 404
+    assert _sample("http_request_duration_seconds_count", **labels) == before + 2
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert f'route="{route}"' in response.text
+    assert "/nodes/example/datasets/2" not in response.text
+    assert "db_pool_checked_out{" in response.text
+    assert 'db_statement_duration_seconds_count{operation="SELECT"}' in response.text
+    assert "db_pool_checkout_wait_seconds_count" in response.text
+
+
+def test_upstream_requests():
+    labels = {"node": "openml", "endpoint": "/data/{id}"}
+    before_count = _sample("upstream_request_duration_seconds_count", **labels)
+    before_404 = _sample("upstream_responses_total", status_code="404", **labels)
+    with responses.RequestsMock() as mocked_requests:
+        mocked_requests.add(responses.GET, OPENML_URL + "/data/1", json={}, status=200)
+        mocked_requests.add(responses.GET, OPENML_URL + "/data/2", json={}, status=404)
+        http_session.get(OPENML_URL + "/data/1")
+        http_session.get(OPENML_URL + "/data/2")
+    assert _sample("upstream_request_duration_seconds_count", **labels) == before_count + 2
+    assert _sample("upstream_responses_total", status_code="404", **labels) == before_404 + 1
+
+
+def test_dataset_cache_lookups():
+    connector = CachingDatasetConnector(CountingDatasetConnector(), DatasetCache())
+    before = {
+        result: _sample("dataset_cache_lookups_total", node="example", result=result)
+        for result in ("hit", "miss", "not_found")
+    }
+    dataset = DatasetDescription(name="dset1", node="example", node_specific_identifier="1")
+    missing = DatasetDescription(name="dset2", node="example", node_specific_identifier="missing")
+    connector.fetch(dataset)
+    connector.fetch(dataset)
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            connector.fetch(missing)
+    after = {
+        result: _sample("dataset_cache_lookups_total", node="example", result=result)
+        for result in ("hit", "miss", "not_found")
+    }
+    assert after["miss"] - before["miss"] == 2
+    assert after["hit"] - before["hit"] == 1
+    assert after["not_found"] - before["not_found"] == 1
+
+
+def test_request_duration_of_unmatched_and_streaming_routes(client: TestClient):
+    unmatched = {"method": "GET", "route": "unmatched", "status_code": "404"}
+    export = {"method": "GET", "route": "/datasets/export", "status_code": "200"}
+    before_unmatched = _sample("http_request_duration_seconds_count", **unmatched)
+    before_export = _sample("http_request_duration_seconds_count", **export)
+    assert client.get("/no/such/path").status_code == 404
+    assert client.get("/datasets/export").status_code == 200
+    assert _sample("http_request_duration_seconds_count", **unmatched) == before_unmatched + 1
+    assert _sample("http_request_duration_seconds_count", **export) == before_export + 1
+    assert metrics.current_route() is None  # Outside of a request
+
+
+def test_pool_checkouts_are_timed_after_dispose(engine: Engine):
+    metrics.instrument_engine(engine)
+    for _ in range(2):
+        before = _sample("db_pool_checkout_wait_seconds_count")
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        assert _sample("db_pool_checkout_wait_seconds_count") == before + 1
+        engine.dispose()
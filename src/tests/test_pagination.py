@@ -0,0 +1,81 @@
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from database.models import DatasetDescription, Publication
+
+
+def _add_datasets(engine: Engine):
+    with Session(engine) as session:
+        session.add_all(
+            [
+                DatasetDescription(name=f"dset{i}", node=node, node_specific_identifier=str(i))
+                for i, node in enumerate(["openml", "huggingface"] * 3)
+            ]
+        )
+        session.commit()
+
+
+def _walk(client: TestClient, url: str, limit: int) -> list[list[int]]:
+    pages = []
+    response = client.get(url, params={"limit": limit})
+    while True:
+        assert response.status_code == 200
+        pages.append([item["id"] for item in response.json()])
+        cursor = response.headers.get("X-Next-Cursor", None)
+        if cursor is None:
+            return pages
+        response = client.get(url, params={"limit": limit, "cursor": cursor})
+
+
+def test_cursor_walks_all_datasets(client: TestClient, engine: Engine):
+    _add_datasets(engine)
+    assert _walk(client, "/datasets", limit=4) == [[1, 2, 3, 4], [5, 6]]
+    assert _walk(client, "/datasets", limit=3) == [[1, 2, 3], [4, 5, 6], []]
+
+
+def test_cursor_walks_node_datasets(client: TestClient, engine: Engine):
+    _add_datasets(engine)
+    assert _walk(client, "/nodes/openml/datasets", limit=2) == [[1, 3], [5]]
+
+
+def test_cursor_is_not_affected_by_inserts(client: TestClient, engine: Engine):
+    _add_datasets(engine)
+    response = client.get("/datasets", params={"limit": 2})
+    cursor = response.headers["X-Next-Cursor"]
+    with Session(engine) as session:
+        session.add(DatasetDescription(name="new", node="openml", node_specific_identifier="new"))
+        session.delete(session.get(DatasetDescription, 1))
+        session.commit()
+    response = client.get("/datasets", params={"limit": 2, "cursor": cursor})
+    assert [dataset["id"] for dataset in response.json()] == [3, 4]
+
+
+def test_cursor_walks_publications(client: TestClient, engine: Engine):
+    with Session(engine) as session:
+        session.add_all(
+            [Publication(title=f"Title {i}", url=f"https://{i}.test") for i in range(3)]
+        )
+        session.commit()
+    assert _walk(client, "/publications", limit=2) == [[1, 2], [3]]
+
+
+def test_offset_still_supported(client: TestClient, engine: Engine):
+    _add_datasets(engine)
+    response = client.get("/datasets", params={"offset": 2, "limit": 2})
+    assert response.status_code == 200
+    assert [dataset["id"] for dataset in response.json()] == [3, 4]
+    assert "X-Next-Cursor" in response.headers
+
+
+def test_invalid_cursor(client: TestClient, engine: Engine):
+    response = client.get("/datasets", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor 'not-a-cursor'."
+
+
+def test_offset_and_cursor_combined(client: TestClient, engine: Engine):
+    _add_datasets(engine)
+    cursor = client.get("/datasets", params={"limit": 2}).headers["X-Next-Cursor"]
+    response = client.get("/datasets", params={"offset": 1, "cursor": cursor})
+    assert response.status_code == 400
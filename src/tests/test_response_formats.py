@@ -0,0 +1,129 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from database.models import DatasetDescription, Publication
+from main import _export_partitions
+from response_formats import ARROW, JSON, MSGPACK, NDJSON, encode_stream, negotiate
+
+msgpack = pytest.importorskip("msgpack")
+pytest.importorskip("pyarrow")
+import pyarrow.ipc  # noqa:E402
+
+
+def _populate(engine: Engine):
+    with Session(engine) as session:
+        datasets = [
+            DatasetDescription(name=f"dset{i}", node=node, node_specific_identifier=str(i))
+            for i, node in enumerate(["openml", "huggingface", "openml"])
+        ]
+        session.add_all(datasets + [Publication(title="T", url="u", datasets=datasets[:1])])
+        session.commit()
+
+
+@pytest.mark.parametrize(
+    "accept,expected",
+    [
+        (None, JSON),
+        ("*/*", JSON),
+        ("application/msgpack", MSGPACK),
+        ("application/x-msgpack", MSGPACK),
+        ("application/json;q=0.5, application/vnd.apache.arrow.stream", ARROW),
+        ("application/msgpack;q=0.2, application/*;q=0.9", JSON),
+    ],
+)
+def test_negotiate(accept: str | None, expected: str):
+    assert negotiate(accept, [JSON, MSGPACK, ARROW]) == expected
+
+
+def test_negotiate_not_acceptable():
+    with pytest.raises(HTTPException) as exc_info:
+        negotiate("text/html", [JSON, MSGPACK])
+    assert exc_info.value.status_code == 406
+
+
+@pytest.mark.parametrize("url", ["/datasets/", "/nodes/openml/datasets"])
+def test_list_msgpack(client: TestClient, engine: Engine, url: str):
+    _populate(engine)
+    response = client.get(url, headers={"Accept": MSGPACK})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MSGPACK
+    assert response.headers["vary"] == "Accept"
+    assert msgpack.unpackb(response.content) == client.get(url).json()
+
+
+def test_list_arrow(client: TestClient, engine: Engine):
+    _populate(engine)
+    response = client.get("/datasets/", headers={"Accept": ARROW}, params={"limit": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == ARROW
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert table.column_names == ["name", "node", "node_specific_identifier", "id"]
+    assert table.schema.field("id").type == pyarrow.int64()
+    assert table.to_pylist() == client.get("/datasets/", params={"limit": 2}).json()
+    assert "x-next-cursor" in response.headers
+
+
+def test_list_arrow_expanded(client: TestClient, engine: Engine):
+    _populate(engine)
+    response = client.get("/publications", headers={"Accept": ARROW}, params={"expand": "datasets"})
+    assert response.status_code == 200
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert table.to_pylist()[0]["datasets"][0]["name"] == "dset0"
+
+
+def test_list_arrow_empty(client: TestClient, engine: Engine):
+    response = client.get("/publications", headers={"Accept": ARROW})
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert table.num_rows == 0
+    assert table.column_names == ["title", "url", "id"]
+
+
+def test_etag_depends_on_format(client: TestClient, engine: Engine):
+    _populate(engine)
+    json_etag = client.get("/datasets/").headers["etag"]
+    response = client.get("/datasets/", headers={"Accept": MSGPACK, "If-None-Match": json_etag})
+    assert response.status_code == 200
+
+
+def test_list_not_acceptable(client: TestClient, engine: Engine):
+    response = client.get("/datasets/", headers={"Accept": "text/csv"})
+    assert response.status_code == 406
+
+
+def test_export_arrow(client: TestClient, engine: Engine):
+    _populate(engine)
+    response = client.get(
+        "/datasets/export", headers={"Accept": ARROW}, params={"nodes": ["openml"]}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == ARROW
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert table.column("name").to_pylist() == ["dset0", "dset2"]
+
+
+def test_export_arrow_batches(engine: Engine):
+    _populate(engine)
+    partitions = _export_partitions(engine, DatasetDescription, [], yield_per=2)
+    chunks = list(encode_stream(ARROW, DatasetDescription, partitions))
+    assert len(chunks) == 3  # A record batch per partition, and the end-of-stream marker
+    reader = pyarrow.ipc.open_stream(b"".join(chunks))
+    assert [batch.num_rows for batch in reader] == [2, 1]
+
+
+def test_export_arrow_empty(client: TestClient, engine: Engine):
+    response = client.get("/publications/export", headers={"Accept": ARROW})
+    assert pyarrow.ipc.open_stream(response.content).read_all().num_rows == 0
+
+
+def test_export_msgpack(client: TestClient, engine: Engine):
+    _populate(engine)
+    response = client.get("/publications/export", headers={"Accept": MSGPACK})
+    assert response.status_code == 200
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(response.content)
+    assert list(unpacker) == [{"title": "T", "url": "u", "id": 1}]
+    response = client.get("/datasets/export", headers={"Accept": NDJSON})
+    assert response.text.count("\n") == 3
@@ -0,0 +1,85 @@
+from sqlalchemy import Engine
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session
+from starlette.testclient import TestClient
+
+from database.models import DatasetDescription, Publication
+from database.search import search_query
+
+
+def _populate(engine: Engine):
+    names = ["iris", "iris data", "higgs boson", "mnist", "credit-g"]
+    with Session(engine) as session:
+        session.add_all(
+            [
+                DatasetDescription(name=name, node="openml", node_specific_identifier=name)
+                for name in names
+            ]
+            + [
+                Publication(title="AMLB: an AutoML Benchmark", url="https://1.test"),
+                Publication(title="Searching for exotic particles", url="https://2.test"),
+            ]
+        )
+        session.commit()
+
+
+def _search(client: TestClient, url: str, **params) -> list:
+    response = client.get(url, params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_search_datasets_ranked(client: TestClient, engine: Engine):
+    _populate(engine)
+    assert [d["name"] for d in _search(client, "/datasets/search", q="data iris")] == [
+        "iris data",
+        "iris",
+    ]
+    assert _search(client, "/datasets/search", q="credit")[0] == {
+        "name": "credit-g",
+        "node": "openml",
+        "node_specific_identifier": "credit-g",
+        "id": 5,
+    }
+    assert _search(client, "/datasets/search", q="unknown") == []
+    assert _search(client, "/datasets/search", q='"iris') != []  # Not interpreted as syntax
+
+
+def test_search_datasets_paginated(client: TestClient, engine: Engine):
+    _populate(engine)
+    first = _search(client, "/datasets/search", q="iris data", limit=1)
+    second = _search(client, "/datasets/search", q="iris data", limit=1, offset=1)
+    assert [d["name"] for d in first + second] == ["iris data", "iris"]
+
+    response = client.get("/datasets/search", params={"q": "iris", "cursor": "abc"})
+    assert response.status_code == 400
+
+
+def test_search_publications(client: TestClient, engine: Engine):
+    _populate(engine)
+    publications = _search(client, "/publications/search", q="automl")
+    assert [p["title"] for p in publications] == ["AMLB: an AutoML Benchmark"]
+
+
+def test_index_follows_writes(client: TestClient, engine: Engine):
+    _populate(engine)
+    dataset = {"name": "fashion mnist", "node": "openml", "node_specific_identifier": "mnist"}
+    assert client.put("/datasets/4", json=dataset).status_code == 200
+    assert client.delete("/datasets/1").status_code == 200
+    response = client.post(
+        "/datasets/bulk",
+        json={"create": [{"name": "iris2", "node": "other", "node_specific_identifier": "i"}]},
+    )
+    assert response.status_code == 200
+
+    assert [d["name"] for d in _search(client, "/datasets/search", q="fashion")] == [
+        "fashion mnist"
+    ]
+    assert [d["name"] for d in _search(client, "/datasets/search", q="iris")] == ["iris data"]
+    assert [d["name"] for d in _search(client, "/datasets/search", q="iris2")] == ["iris2"]
+
+
+def test_mysql_uses_fulltext_index():
+    query = search_query("mysql", DatasetDescription, "iris")
+    sql = str(query.compile(dialect=mysql.dialect()))
+    assert "MATCH (datasets.name) AGAINST (%s IN NATURAL LANGUAGE MODE)" in sql